@@ -0,0 +1,143 @@
+# alloc_per_call.py
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE
+######################################################
+'''
+Measures how much memory each actuator call allocates.
+
+On a CLUE, copy this file to CIRCUITPY and run it. It disables the garbage
+collector and reads gc.mem_free() before and after each batch of calls.
+
+Under CPython it runs on fake hardware and uses tracemalloc:
+
+    python benchmarks/alloc_per_call.py [library folder]
+
+tracemalloc gives two numbers for each call:
+
+    kept    memory blocks the library allocated and still holds after the call,
+            from a snapshot diff of the library's traces over the second half of
+            the calls (values that just replace the previous call's, like the
+            last write time, cancel out). A call that fills preallocated buffers
+            keeps 0. More means something (a bytes object, a tuple, a float in
+            a list) piles up every call; the lines that made it are printed.
+    peak    the median peak heap growth during one call. This also counts
+            temporaries that are freed before the call returns, and CPython's own
+            bookkeeping (call frames, bound methods, loop iterators and integers
+            above 256, most of which do not allocate in CircuitPython), so
+            compare the rows against the "empty" row.
+
+The device numbers, taken with the garbage collector off, count everything the
+call allocates and are the real figure.
+
+Pass a folder holding another copy of jisforjt_cutebot_clue.py to measure that
+version instead, e.g. an older release:
+
+    git show <commit>:jisforjt_cutebot_clue.py > /tmp/v3/jisforjt_cutebot_clue.py
+    python benchmarks/alloc_per_call.py /tmp/v3
+'''
+
+######################################################
+#   Import
+######################################################
+import gc
+import sys
+
+ON_DEVICE = sys.implementation.name == 'circuitpython'
+
+if not ON_DEVICE:
+    import os
+    import tracemalloc
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(here, '..'))
+    if len(sys.argv) > 1:
+        sys.path.insert(0, sys.argv[1])
+    import fakehw
+    fakehw.I2C_WRITE_TIME = 0
+    fakehw.install()
+    fakehw.bus.record = False
+
+from jisforjt_cutebot_clue import cutebot
+
+
+######################################################
+#   Variables
+######################################################
+CALLS = 200
+cutebot._i2c_rest = 0           # Only measure the call itself
+
+
+######################################################
+#   Calls Under Test
+######################################################
+# Each call alternates between two values so no write is skipped as unchanged.
+def motors(i):
+    cutebot.motors(30 + (i & 1), -30 - (i & 1))
+
+def servos(i):
+    cutebot.servos(3, 90 + (i & 1))
+
+def headlights(i):
+    cutebot.headlights(3, (255, 128, i & 1))
+
+def pixels(i):
+    cutebot.pixels(3, (0, 128, i & 1))
+
+def empty(i):
+    pass
+
+CASES = (('empty', empty), ('motors', motors), ('servos', servos),
+         ('headlights', headlights), ('pixels', pixels))
+
+
+######################################################
+#   Measurement
+######################################################
+def measure_device(call):
+    gc.collect()
+    gc.disable()
+    before = gc.mem_free()
+    for i in range(CALLS):
+        call(i)
+    used = before - gc.mem_free()
+    gc.enable()
+    return used / CALLS
+
+def measure_cpython(call):
+    gc.collect()
+    tracemalloc.start()
+    peaks = []
+    for i in range(CALLS):
+        if i == CALLS // 2:
+            before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        call(i)
+        _, high = tracemalloc.get_traced_memory()
+        peaks.append(high - start)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # Only blocks allocated by the library, not by this script or fakehw
+    library = (tracemalloc.Filter(True, '*jisforjt_cutebot_*'),)
+    stats = after.filter_traces(library).compare_to(before.filter_traces(library), 'lineno')
+    kept = [stat for stat in stats if stat.count_diff > 0]
+    blocks = sum(stat.count_diff for stat in kept)
+    peaks.sort()
+    return blocks / (CALLS - CALLS // 2), peaks[len(peaks) // 2], kept[:3]
+
+
+######################################################
+#   Main Code
+######################################################
+for name, call in CASES:
+    for i in range(10):                 # Warm up caches and dictionaries
+        call(i)
+    if ON_DEVICE:
+        print("{:<11} {:8.1f} bytes allocated per call".format(name, measure_device(call)))
+    else:
+        blocks, peak, kept = measure_cpython(call)
+        print("{:<11} {:6.2f} blocks kept {:6d} bytes peak per call (median)".format(name, blocks, peak))
+        if blocks >= 0.1:                   # Not just a counter passing 256 once
+            for stat in kept:               # Where the kept blocks were allocated
+                print("    {}".format(stat))
@@ -0,0 +1,108 @@
+# async_avoidance.py
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE
+######################################################
+'''
+Compares how many control iterations per second the obstacle avoidance loop gets
+with the blocking Cutebot and with AsyncCutebot. Runs under CPython on fake
+hardware, from the repository folder:
+
+    python benchmarks/async_avoidance.py [seconds]
+
+The synchronous loop is the one in examples/cutebot_simple_avoidance.py without the
+CLUE proximity check. The asyncio loop is examples/cutebot_async_avoidance.py.
+
+tests/test_async_speedup.py runs measure() on the simulator and fails below 3x.
+'''
+
+######################################################
+#   Import
+######################################################
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from jisforjt_cutebot_asyncio import AsyncCutebot
+
+
+######################################################
+#   Variables
+######################################################
+max_speed = 50
+
+
+######################################################
+#   Control Loops
+######################################################
+def steer(distance):
+    if distance >= 50:
+        return max_speed, max_speed, [0, 255, 0]
+    elif distance > 20:
+        alpha = 1 - distance / 200
+        return max_speed / 2 * alpha, max_speed, [255, 255, 0]
+    alpha = -1 + distance / 200
+    return max_speed / 2 * alpha, max_speed / 2, [255, 0, 0]
+
+
+def sync_loop(cutebot, seconds):
+    cutebot.blocking = True
+    iterations = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        left, right, color = steer(cutebot.sonar)
+        cutebot.motors(left, right)
+        cutebot.pixels(3, color)
+        iterations += 1
+    return iterations / seconds
+
+
+async def async_loop(cutebot, seconds):
+    bot = AsyncCutebot(cutebot)
+    distance = [100.0]
+    done = [False]
+
+    async def ranging():
+        while not done[0]:
+            distance[0] = await bot.sonar()
+
+    task = asyncio.create_task(ranging())
+    iterations = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        left, right, color = steer(distance[0])
+        await bot.motors(left, right)
+        bot.pixels(3, color)
+        iterations += 1
+        await asyncio.sleep(0.005)
+    done[0] = True
+    await task
+    await bot.motorsOff()
+    return iterations / seconds
+
+
+def measure(cutebot, seconds):
+    '''
+    Output: iterations per second of the synchronous loop, then of the asyncio loop
+    '''
+    sync_rate = sync_loop(cutebot, seconds)
+    async_rate = asyncio.run(async_loop(cutebot, seconds))
+    return sync_rate, async_rate
+
+
+######################################################
+#   Main Code
+######################################################
+if __name__ == '__main__':
+    import fakehw
+    fakehw.install()
+    from jisforjt_cutebot_clue import cutebot
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    sync_rate, async_rate = measure(cutebot, seconds)
+    print("sync:    {:.1f} iterations/s".format(sync_rate))
+    print("asyncio: {:.1f} iterations/s".format(async_rate))
+    print("speedup: {:.1f}x".format(async_rate / sync_rate))
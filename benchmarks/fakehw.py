@@ -0,0 +1,179 @@
+# fakehw.py
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE
+######################################################
+'''
+Stand-ins for the CircuitPython hardware modules so jisforjt_cutebot_clue can be
+imported and timed under CPython. Call install() before importing the library.
+
+    import fakehw
+    fakehw.install()
+    from jisforjt_cutebot_clue import cutebot
+
+The fake I2C bus counts every frame it is sent and keeps a copy of each one
+in fakehw.bus.frames unless fakehw.bus.record is False. Writes and
+sonar pings take roughly as long as they do on the real hardware.
+'''
+
+######################################################
+#   Import
+######################################################
+import sys
+import time
+import types
+
+
+######################################################
+#   Timing
+######################################################
+I2C_WRITE_TIME = 0.00045        # 4 byte frame + address at 100 kHz
+SONAR_ECHO_TIME = 0.006         # Echo from an object about 1 m away
+
+
+######################################################
+#   Fake Hardware
+######################################################
+class FakeI2C:
+    def __init__(self):
+        self.frames = []
+        self.record = True          # Keep a copy of every frame in self.frames
+        self.writes = 0
+        self.bytesWritten = 0
+        self.locked = False
+
+    def try_lock(self):
+        if self.locked:
+            return False
+        self.locked = True
+        return True
+
+    def unlock(self):
+        self.locked = False
+
+    def writeto(self, address, buffer):
+        if I2C_WRITE_TIME:
+            time.sleep(I2C_WRITE_TIME)
+        self.writes += 1
+        self.bytesWritten += len(buffer)
+        if self.record:
+            self.frames.append((address, bytes(buffer)))
+
+
+class FakePWMOut:
+    def __init__(self, pin, duty_cycle=0, frequency=500, variable_frequency=False):
+        self.duty_cycle = duty_cycle
+        self.frequency = frequency
+
+    def deinit(self):
+        pass
+
+
+def _rgb(color):
+    # NeoPixel accepts a packed 0xRRGGBB integer or an (r, g, b) tuple
+    if isinstance(color, int):
+        return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+    return tuple(color)
+
+
+class FakeNeoPixel:
+    def __init__(self, pin, n, brightness=1.0, auto_write=True, pixel_order=None):
+        self._pixels = [(0, 0, 0)] * n
+        self.auto_write = auto_write
+        self.shows = 0
+
+    def __len__(self):
+        return len(self._pixels)
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, value):
+        self._pixels[index] = _rgb(value)
+        if self.auto_write:
+            self.show()
+
+    def fill(self, color):
+        for i in range(len(self._pixels)):
+            self._pixels[i] = _rgb(color)
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        self.shows += 1
+
+    def deinit(self):
+        pass
+
+
+class FakeDigitalInOut:
+    def __init__(self, pin):
+        self.value = True
+        self.direction = None
+        self.pull = None
+
+    def deinit(self):
+        pass
+
+
+class FakeAnalogIn:
+    def __init__(self, pin):
+        self.value = 32768
+
+    def deinit(self):
+        pass
+
+
+class FakeHCSR04:
+    def __init__(self, trigger_pin, echo_pin, timeout=0.1):
+        self.range = 100.0
+
+    @property
+    def distance(self):
+        if SONAR_ECHO_TIME:
+            time.sleep(SONAR_ECHO_TIME)
+        return self.range
+
+    def deinit(self):
+        pass
+
+
+bus = FakeI2C()
+
+
+def install():
+    '''
+    Puts the fake modules into sys.modules. Safe to call more than once.
+    '''
+    if 'board' in sys.modules:
+        return
+    board = types.ModuleType('board')
+    for name in ('P0', 'P1', 'P2', 'D8', 'D12', 'D13', 'D14', 'D15', 'D16', 'SCL', 'SDA'):
+        setattr(board, name, name)
+    board.I2C = lambda: bus
+
+    pwmio = types.ModuleType('pwmio')
+    pwmio.PWMOut = FakePWMOut
+
+    neopixel = types.ModuleType('neopixel')
+    neopixel.NeoPixel = FakeNeoPixel
+
+    digitalio = types.ModuleType('digitalio')
+    digitalio.DigitalInOut = FakeDigitalInOut
+    digitalio.Direction = types.SimpleNamespace(INPUT=0, OUTPUT=1)
+    digitalio.Pull = types.SimpleNamespace(UP=1, DOWN=2)
+
+    analogio = types.ModuleType('analogio')
+    analogio.AnalogIn = FakeAnalogIn
+
+    hcsr04 = types.ModuleType('adafruit_hcsr04')
+    hcsr04.HCSR04 = FakeHCSR04
+
+    sys.modules['board'] = board
+    sys.modules['busio'] = types.ModuleType('busio')
+    sys.modules['pwmio'] = pwmio
+    sys.modules['neopixel'] = neopixel
+    sys.modules['digitalio'] = digitalio
+    sys.modules['analogio'] = analogio
+    sys.modules['adafruit_hcsr04'] = hcsr04
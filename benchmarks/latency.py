@@ -0,0 +1,328 @@
+# latency.py
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE
+######################################################
+'''
+Calls each public Cutebot method many times and reports, per method, the p50, p95
+and p99 latency, calls per second, memory allocated per call and I2C bytes per call.
+The results are written as JSON so two library versions can be compared.
+
+On a CLUE, copy this file to CIRCUITPY and run it. It uses the real hardware
+(lift the Cutebot off the table, the wheels turn) and prints the JSON at the end.
+
+Under CPython it runs on the simulator (jisforjt_cutebot_sim), where latency is
+the simulated hardware time: I2C transfers, settle delays and sonar echoes.
+
+    python benchmarks/latency.py [-n calls] [-o results.json] [--label name] [--lib folder]
+    python benchmarks/latency.py --compare old.json new.json [--tolerance 0.1]
+
+--lib runs the copy of jisforjt_cutebot_clue.py in another folder instead. Runs can
+only be compared between versions that came with this script: the library has to
+take a backend (Cutebot(backend=...)) to run on the simulator, and older versions
+stop with a message. benchmarks/alloc_per_call.py and startup.py measure any
+version on fake hardware.
+--compare prints both runs side by side and exits with status 1 if a p50 or p99
+latency, the allocation or the I2C bytes of a method grew by more than the
+tolerance (10% by default).
+'''
+
+######################################################
+#   Import
+######################################################
+import gc
+import json
+import sys
+import time
+
+ON_DEVICE = sys.implementation.name == 'circuitpython'
+
+if not ON_DEVICE:
+    import os
+    import tracemalloc
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(here, '..'))
+
+
+######################################################
+#   Variables
+######################################################
+CALLS = 200
+TOLERANCE = 0.1
+EPSILON_MS = 0.01           # Latency changes smaller than this are never regressions
+
+
+######################################################
+#   I2C Byte Counting
+######################################################
+class CountingI2C:
+    # Passes everything to the real bus and counts the bytes written
+    def __init__(self, bus):
+        self.bus = bus
+        self.bytesWritten = 0
+
+    def try_lock(self):
+        return self.bus.try_lock()
+
+    def unlock(self):
+        self.bus.unlock()
+
+    def writeto(self, address, buffer, **kwargs):
+        self.bus.writeto(address, buffer, **kwargs)
+        self.bytesWritten += len(buffer)
+
+
+def makeCutebot():
+    if not ON_DEVICE:
+        try:
+            import jisforjt_cutebot_clue
+        except ImportError as e:
+            # Versions without backends make their cutebot, on the board, when imported
+            raise SystemExit("cannot import jisforjt_cutebot_clue ({}); latency.py needs a "
+                             "version that takes a backend".format(e))
+        if not hasattr(jisforjt_cutebot_clue, 'BoardBackend'):
+            raise SystemExit("{} does not take a backend; latency.py needs a version that "
+                             "does".format(jisforjt_cutebot_clue.__file__))
+    from jisforjt_cutebot_clue import Cutebot
+    if ON_DEVICE:
+        from jisforjt_cutebot_clue import BoardBackend
+        backend = BoardBackend()
+        world = None
+    else:
+        from jisforjt_cutebot_sim import SimBackend, World, Track, Robot
+        # Sitting on a straight line, 50 cm in front of a wall
+        world = World(track=Track([(-100, 0), (100, 0)], closed=False),
+                      walls=[(55, -50, 55, 50)], robot=Robot())
+        backend = SimBackend(world)
+    counter = CountingI2C(backend.i2c())
+    backend.i2c = lambda: counter
+    return Cutebot(backend=backend), counter, world
+
+
+######################################################
+#   Calls Under Test
+######################################################
+def makeCases(bot):
+    # Each actuator call alternates between two values so no write is skipped as
+    # unchanged, except the "repeat" case, which measures the skipped write.
+    def motors(i):
+        bot.motors(30 + (i & 1), -30 - (i & 1))
+
+    def motorsRepeat(i):
+        bot.motors(30, -30)
+
+    def motorsQueued(i):
+        bot.blocking = False
+        bot.motors(30 + (i & 1), -30 - (i & 1))
+        bot.flush()
+        bot.blocking = True
+
+    def servos(i):
+        bot.servos(3, 90 + (i & 1))
+
+    def headlights(i):
+        bot.headlights(3, (255, 128, i & 1))
+
+    def pixels(i):
+        bot.pixels(3, (0, 128, i & 1))
+
+    def sonar(i):
+        return bot.sonar
+
+    def tracking(i):
+        return bot.tracking
+
+    def p1(i):
+        return bot.p1
+
+    def p2(i):
+        return bot.p2
+
+    def empty(i):
+        pass
+
+    return (('empty', empty), ('motors', motors), ('motors repeat', motorsRepeat),
+            ('motors queued', motorsQueued), ('servos', servos),
+            ('headlights', headlights), ('pixels', pixels), ('sonar', sonar),
+            ('tracking', tracking), ('p1', p1), ('p2', p2))
+
+
+######################################################
+#   Measurement
+######################################################
+def percentile(ordered, p):
+    # Nearest rank
+    index = max(int(len(ordered) * p / 100 + 0.999999) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def allocation(bot, world, call, calls):
+    if ON_DEVICE:
+        gc.collect()
+        gc.disable()
+        before = gc.mem_free()
+        for i in range(calls):
+            call(i)
+        used = before - gc.mem_free()
+        gc.enable()
+        return used / calls
+    # Median peak heap growth during one call (see alloc_per_call.py). The world is
+    # stopped so only the library's own allocations are counted; compare with "empty".
+    clock = bot._backend.clock
+    clock.detach(world)
+    gc.collect()
+    tracemalloc.start()
+    peaks = []
+    for i in range(calls):
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        call(i)
+        _, high = tracemalloc.get_traced_memory()
+        peaks.append(high - start)
+    tracemalloc.stop()
+    clock.attach(world)
+    peaks.sort()
+    return peaks[len(peaks) // 2]
+
+
+def measure(bot, counter, world, call, calls):
+    clock = bot._backend.monotonic_ns
+    if world is not None:
+        # Back to the start, standing still, so sensor readings are the same for every case
+        bot.motorsOff()
+        world.robot.x = world.robot.y = world.robot.heading = 0.0
+        world.robot.leftSpeed = world.robot.rightSpeed = 0.0
+    for i in range(4):                  # Warm up caches and dictionaries
+        call(i)
+    times = []
+    host = []
+    startBytes = counter.bytesWritten
+    startTime = clock()
+    for i in range(calls):
+        hostStart = time.monotonic_ns()
+        before = clock()
+        call(i)
+        times.append(clock() - before)
+        host.append(time.monotonic_ns() - hostStart)
+    total = clock() - startTime
+    i2cBytes = (counter.bytesWritten - startBytes) / calls
+    times.sort()
+    host.sort()
+    result = {
+        'p50_ms': percentile(times, 50) / 1e6,
+        'p95_ms': percentile(times, 95) / 1e6,
+        'p99_ms': percentile(times, 99) / 1e6,
+        'calls_per_s': calls * 1e9 / total if total else None,
+        'alloc_bytes': allocation(bot, world, call, calls),
+        'i2c_bytes': i2cBytes,
+    }
+    if not ON_DEVICE:
+        result['host_p50_us'] = percentile(host, 50) / 1e3
+    return result
+
+
+def run(calls, label):
+    bot, counter, world = makeCutebot()
+    results = {}
+    for name, call in makeCases(bot):
+        results[name] = measure(bot, counter, world, call, calls)
+    bot.motorsOff()
+    bot.lightsOff()
+    return {
+        'label': label,
+        'implementation': sys.implementation.name,
+        'backend': 'board' if ON_DEVICE else 'sim',
+        'calls': calls,
+        'results': results,
+    }
+
+
+######################################################
+#   Reports
+######################################################
+def printRun(report):
+    print("{} on {} ({} calls each)".format(report['label'], report['backend'], report['calls']))
+    print("{:<14} {:>9} {:>9} {:>9} {:>10} {:>9} {:>9}".format(
+        'method', 'p50 ms', 'p95 ms', 'p99 ms', 'calls/s', 'alloc B', 'i2c B'))
+    for name, r in report['results'].items():
+        # No calls/s when no time passed at all (a call the simulator makes free)
+        rate = '-' if r['calls_per_s'] is None else "{:.1f}".format(r['calls_per_s'])
+        print("{:<14} {:9.3f} {:9.3f} {:9.3f} {:>10} {:9.1f} {:9.1f}".format(
+            name, r['p50_ms'], r['p95_ms'], r['p99_ms'], rate,
+            r['alloc_bytes'], r['i2c_bytes']))
+
+
+def compare(old, new, tolerance):
+    print("{:<14} {:<9} {:>10} {:>10} {:>8}".format('method', 'metric', 'old', 'new', 'change'))
+    regressions = 0
+    for name, after in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            continue
+        for key in ('p50_ms', 'p99_ms', 'alloc_bytes', 'i2c_bytes'):
+            a = before[key]
+            b = after[key]
+            change = (b - a) / a if a else (0.0 if b == a else float('inf'))
+            worse = b > a * (1 + tolerance) and not (key.endswith('_ms') and b - a < EPSILON_MS)
+            regressions += worse
+            print("{:<14} {:<9} {:10.3f} {:10.3f} {:+7.0%}{}".format(
+                name, key.split('_')[0], a, b, change, '  REGRESSION' if worse else ''))
+    print("{} regression(s)".format(regressions))
+    return regressions
+
+
+######################################################
+#   Main Code
+######################################################
+def parseArgs(args):
+    # CPython only, CircuitPython has no argparse
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Times each public Cutebot method, or compares two runs.")
+    parser.add_argument('-n', dest='calls', type=int, default=CALLS, metavar='calls',
+                        help="calls per method (default {})".format(CALLS))
+    parser.add_argument('-o', '--output', metavar='results.json',
+                        help="write the run as JSON")
+    parser.add_argument('--label', default='cutebot', metavar='name', help="name of the run")
+    parser.add_argument('--lib', metavar='folder',
+                        help="use the jisforjt_cutebot_clue.py in this folder")
+    parser.add_argument('--compare', nargs=2, metavar=('old.json', 'new.json'),
+                        help="compare two runs instead of measuring")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, metavar='fraction',
+                        help="growth that counts as a regression (default {})".format(TOLERANCE))
+    return parser.parse_args(args)
+
+
+def main(args):
+    if ON_DEVICE:
+        calls, output, label, files, tolerance = CALLS, None, 'cutebot', None, TOLERANCE
+    else:
+        options = parseArgs(args)
+        calls = options.calls
+        output = options.output
+        label = options.label
+        files = options.compare
+        tolerance = options.tolerance
+        if options.lib:
+            sys.path.insert(0, options.lib)
+    if files:
+        with open(files[0]) as f:
+            old = json.load(f)
+        with open(files[1]) as f:
+            new = json.load(f)
+        return 1 if compare(old, new, tolerance) else 0
+    report = run(calls, label)
+    printRun(report)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=1)
+    elif ON_DEVICE:
+        print(json.dumps(report))
+    return 0
+
+
+if ON_DEVICE:
+    main([])
+elif __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+# line_follow_laps.py
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE
+######################################################
+'''
+Compares lap times on a simulated oval track for the line following loop in
+examples/cutebot_line_following__better__.py (blocking Cutebot) and for
+LineFollower at 100 Hz. Runs under CPython with jisforjt_cutebot_sim, from the
+repository folder:
+
+    python benchmarks/line_follow_laps.py [simulated seconds] [speed]
+
+Time is simulated, so a minute of driving takes a few seconds to run, and the
+result is the same every time.
+'''
+
+######################################################
+#   Import
+######################################################
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_scenarios import lineWorld, bangBang, lineFollower
+from jisforjt_cutebot_sim import SimBackend
+
+
+######################################################
+#   Controllers
+######################################################
+# The loops and the track are in jisforjt_cutebot_scenarios, shared with tools/sweep.py
+def drive(control, seconds, **settings):
+    world = lineWorld()
+    cutebot = Cutebot(backend=SimBackend(world))
+    lineLosses = control(cutebot, seconds, **settings)
+    cutebot.motorsOff()
+    return world, lineLosses
+
+
+######################################################
+#   Main
+######################################################
+def report(name, world, lineLosses, seconds):
+    laps = world.laps
+    best = '%.2f s' % min(laps) if laps else '-'
+    mean = '%.2f s' % (sum(laps) / len(laps)) if laps else '-'
+    print('%-28s %5d %10s %10s %9.0f cm %11d' % (name, len(laps), best, mean,
+                                                  world.robot.distance, lineLosses))
+    return sum(laps) / len(laps) if laps else None
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 120
+    speed = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    print('%d simulated seconds at speed %d' % (seconds, speed))
+    print('%-28s %5s %10s %10s %12s %11s' % ('loop', 'laps', 'best lap', 'mean lap',
+                                             'driven', 'line losses'))
+    old = report('blocking (better example)', *drive(bangBang, seconds, maxSpeed=speed),
+                 seconds)
+    new = report('LineFollower 100 Hz', *drive(lineFollower, seconds, speed=speed), seconds)
+    if old and new:
+        print('Mean lap time: %.1fx faster' % (old / new))
+
+
+if __name__ == '__main__':
+    main()
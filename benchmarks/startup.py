@@ -0,0 +1,82 @@
+# startup.py
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE
+######################################################
+'''
+Measures how long importing the library takes and how much memory it uses, then
+the same for making the shared cutebot and for the first use of the motors,
+NeoPixels and sensors.
+
+On a CLUE, copy this file to CIRCUITPY and run it (after a fresh reset).
+
+Under CPython it runs on fake hardware:
+
+    python benchmarks/startup.py [library folder]
+
+Pass a folder holding another copy of jisforjt_cutebot_clue.py to measure that
+version instead.
+'''
+
+######################################################
+#   Import
+######################################################
+import gc
+import sys
+import time
+
+ON_DEVICE = sys.implementation.name == 'circuitpython'
+
+if not ON_DEVICE:
+    import os
+    import tracemalloc
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(here, '..'))
+    if len(sys.argv) > 1:
+        sys.path.insert(0, sys.argv[1])
+    import fakehw
+    fakehw.install()
+    fakehw.bus.record = False
+
+
+######################################################
+#   Measurement
+######################################################
+def begin():
+    gc.collect()
+    if ON_DEVICE:
+        return gc.mem_free(), time.monotonic()
+    tracemalloc.start()
+    return 0, time.monotonic()
+
+def end(name, mark):
+    free, start = mark
+    elapsed = time.monotonic() - start
+    if ON_DEVICE:
+        gc.collect()
+        used = free - gc.mem_free()
+    else:
+        used, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print("{:<16} {:8.1f} ms {:8d} bytes".format(name, elapsed * 1000, used))
+
+
+######################################################
+#   Main Code
+######################################################
+mark = begin()
+import jisforjt_cutebot_clue
+end("import", mark)
+
+mark = begin()
+cutebot = jisforjt_cutebot_clue.cutebot     # Made here, or already made by the import
+end("cutebot", mark)
+
+mark = begin()
+cutebot.motors(0, 0)
+cutebot.pixels(0, (0, 0, 0))
+cutebot.tracking
+cutebot.p1
+cutebot.sonar
+end("first use", mark)
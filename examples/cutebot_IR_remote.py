@@ -1,6 +1,6 @@
 # cutebot_IR_remote.py
 # Date: Sep. 27, 2022
-# Version: 3.0
+# Version: 4.0
 # Author(s): James Tobin
 
 ######################################################
@@ -18,7 +18,8 @@ Pro-Tip: Press each button a few times to make sure it wasn't miss decoded.
 
 Afterwards, change the button directions and button_1 below, by default they are = to (None).
 
-Now when you press a button Cutebot will follow your every command... eventually.
+Now when you press a button Cutebot will follow your every command. The remote is
+read in the background, so the loop keeps running while no button is pressed.
 
 '''
 
@@ -26,6 +27,10 @@ Now when you press a button Cutebot will follow your every command... eventually
 #   Version Notes:
 ######################################################
 '''
+v4.0
+ - Uses IRReceiver from jisforjt_cutebot_ir, so the loop no longer stops to wait
+   for a signal and button codes are looked up in a dictionary.
+
 v3.0 
  - Compatible with CircuitPython v7.x
  - Added HOW TO USE section.
@@ -41,18 +46,14 @@ v2.0
 ######################################################
 #   Import
 ######################################################
-import board
-import pulseio
-import adafruit_irremote
 from jisforjt_cutebot_clue import cutebot
+from jisforjt_cutebot_ir import IRReceiver, unpackCode
 from adafruit_clue import clue
 
 
 ######################################################
 #   Global Variables
 ######################################################
-pulsein = pulseio.PulseIn(board.D16, maxlen=120, idle_state=True)       #Set Infrared (IR) pin
-decoder = adafruit_irremote.GenericDecode()                             #Set infrared (IR) decoder to Adafruit's generic decoder
 maxSpeed = 30
 
 #Example:
@@ -73,45 +74,50 @@ button_STOP = (None)                     # Set the stop button code
 button_1 = (None)                        # Set the button 1 code
 
 
+######################################################
+#   Button Actions
+######################################################
+def up():
+    cutebot.motors(maxSpeed,maxSpeed)
+    cutebot.headlights(3,[255,255,255])
+
+def down():
+    cutebot.motors(-maxSpeed,-maxSpeed)
+    cutebot.headlights(3,[0,0,0])
+
+def left():
+    cutebot.motors(int(maxSpeed/2),maxSpeed)
+    cutebot.headlights(1,[150,50,0])
+    cutebot.headlights(2,[0,0,0])
+
+def right():
+    cutebot.motors(maxSpeed,int(maxSpeed/2))
+    cutebot.headlights(1,[0,0,0])
+    cutebot.headlights(2,[150,100,0])
+
+def stop():
+    cutebot.motorsOff()
+    cutebot.lightsOff()
+
+def beep():
+    clue.play_tone(1568, 1)
+
+actions = {button_UP: up, button_DOWN: down, button_LEFT: left,     # Code -> what to do
+           button_RIGHT: right, button_STOP: stop, button_1: beep}
+actions.pop(None, None)                                             # Buttons not set up yet
+ir = IRReceiver(cutebot, actions)                                   # Infrared (IR) receiver on P16
+
+
 ######################################################
 #   Main Code
 ######################################################
+cutebot.blocking = False                                # Motor commands don't wait either
 print("Waiting for remote signal...")
 while True:
-    code = None
-
-    pulses = decoder.read_pulses(pulsein)                   # Stop, wait and listen for an IR signal.
-
-    try:
-        code = decoder.decode_bits(pulses)                  # Try to decode pulses.
-    except:
-        pass                                                # Failed to decode pulses.
-
-    if code == button_UP:                       # Check to see if our code matches.
-        print("Button UP")
-        cutebot.motors(maxSpeed,maxSpeed)                                                           
-        cutebot.headlights(3,[255,255,255])
-    elif code == button_DOWN:                   # Check to see if our code matches.
-        print("Button DOWN")
-        cutebot.motors(-maxSpeed,-maxSpeed)
-        cutebot.headlights(0,[0,0,0])
-    elif code == button_LEFT:                   # Check to see if our code matches.
-        print("Button LEFT")
-        cutebot.motors(int(maxSpeed/2),maxSpeed)
-        cutebot.headlights(1,[150,50,0])
-        cutebot.headlights(2,[0,0,0])
-    elif code == button_RIGHT:                  # Check to see if our code matches.
-        print("Button RIGHT")
-        cutebot.motors(maxSpeed,int(maxSpeed/2))
-        cutebot.headlights(1,[0,0,0])
-        cutebot.headlights(2,[150,100,0])
-    elif code == button_STOP:                   # Check to see if our code matches.
-        print("Button STOP")
-        cutebot.motorsOff()
-        cutebot.lightsOff()
-    elif code == button_1:                      # Check to see if our code matches.
-        print("Button 1")
-        clue.play_tone(1568, 1)
-    else:                                       # It does not match!
-        if code != (None):
-            print("I don't know: ", code)
+    action = ir.update()                                # Decode what has arrived, never waits.
+    if action is not None:                              # A known button was pressed.
+        action()
+    if ir.unknown is not None:                          # It does not match!
+        print("I don't know: ", unpackCode(ir.unknown))
+        ir.unknown = None
+    cutebot.update()                                    # Send the queued motor and light commands.
@@ -0,0 +1,90 @@
+# cutebot_async_avoidance.py
+# Date: Oct. 17, 2026
+# Version: 1.0
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE:
+######################################################
+'''
+The same obstacle avoidance as cutebot_simple_avoidance.py, written with asyncio.
+The sonar is read in its own task, so the driving loop never waits for an echo
+or for the motors to settle.
+
+green = All clear. Going forward!
+yellow = Avoiding an object between 20 to 50 centimeters away.
+red = Avoiding an object 20 centimeters or less away.
+blue = Avoiding an object seen by the proximity sensor.
+
+Needs the asyncio library from the CircuitPython library bundle.
+'''
+
+######################################################
+#   Version Notes
+######################################################
+'''
+v1.0:
+ - First version.
+ - Compatible with CircuitPython v7.x
+'''
+
+######################################################
+#   Imports
+######################################################
+import asyncio
+from jisforjt_cutebot_asyncio import AsyncCutebot
+from adafruit_clue import clue
+
+
+######################################################
+#   Variables
+######################################################
+bot = AsyncCutebot()
+max_speed = 50
+distance = 100          # Latest sonar reading, updated by the ranging task
+running = True
+
+
+######################################################
+#   Tasks
+######################################################
+async def ranging():
+    global distance
+    while running:
+        distance = await bot.sonar()            # Other tasks run between the sonar samples
+
+async def driving():
+    global running
+    while running:
+        if clue.button_a:                                   # Check if Button A is pressed.
+            running = False
+            break
+        if clue.proximity > 5:                              # Avoid object seen from the Clue's proximity sensor.
+            await bot.motors(-max_speed, -max_speed / 2)
+            bot.pixels(3, [0, 0, 255])      # blue
+            await asyncio.sleep(0.2)
+        elif distance >= 50:                                # All clear. No objects less than 50 cm away.
+            await bot.motors(max_speed, max_speed)
+            bot.pixels(3, [0, 255, 0])      # green
+        elif distance > 20:                                 # Avoid object between 20-50 cm away.
+            alpha = 1 - distance / 200
+            await bot.motors(max_speed / 2 * alpha, max_speed)
+            bot.pixels(3, [255, 255, 0])    # yellow
+        else:                                               # Avoid object less than 20 cm away.
+            alpha = -1 + distance / 200
+            await bot.motors(max_speed / 2 * alpha, max_speed / 2)
+            bot.pixels(3, [255, 0, 0])      # red
+        await asyncio.sleep(0.01)
+    await bot.motorsOff()
+    await bot.lightsOff()
+
+
+######################################################
+#   Main Code
+######################################################
+print("Press the Button A to STOP.")
+
+async def main():
+    await asyncio.gather(ranging(), driving())
+
+asyncio.run(main())
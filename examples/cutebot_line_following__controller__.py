@@ -0,0 +1,63 @@
+# cutebot_line_following__controller__.py
+# Date: Oct. 17, 2026
+# Version: 1.0
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE:
+######################################################
+'''
+Draw a black line on a white surface. Place the Cutebot over
+the line and watch it follow it.
+
+This version uses the library's LineFollower, which updates the motors
+100 times a second and steers harder the faster it drifts off the line.
+Press Button A to stop. The loop statistics are printed at the end.
+
+'''
+
+######################################################
+#   Version Notes
+######################################################
+'''
+v1.0
+ - First version.
+ - Compatible with CircuitPython v7.x
+'''
+
+######################################################
+#   Imports
+######################################################
+from jisforjt_cutebot_clue import cutebot
+from jisforjt_cutebot_linefollower import LineFollower
+from adafruit_clue import clue
+
+
+######################################################
+#   Functions
+######################################################
+def buttonPress():
+    '''
+    Why sperate this part out. Well it appears that CircuitPython runs soother
+    when button presses are checked in a function. No more issues since doing 
+    this. This was reccomended by another Adafruit users, username unknown.
+    '''
+    if clue.button_a:
+        return True
+    return False
+
+
+######################################################
+#   Variables
+######################################################
+follower = LineFollower(cutebot, speed=25, rate=100)     # Speed of the robot and updates per second
+
+
+######################################################
+#   Main Code
+######################################################
+print("\nPress the Button A to STOP the Cutebot.")
+print("Looking for line!")
+follower.run(stop=buttonPress)          # Follows the line until Button A is pressed
+cutebot.lightsOff()
+print(follower.stats())
@@ -0,0 +1,216 @@
+# CircuitPython Clue Cutebot - asyncio driver
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+AsyncCutebot wraps a Cutebot and gives it coroutine versions of motors(), servos(),
+headlights(), sonar and playTone(). While one task waits for the sonar echo or for a
+tone to finish, the other tasks keep running.
+
+Works with asyncio on CircuitPython (adafruit_asyncio) and on CPython.
+
+example:
+    import asyncio
+    from jisforjt_cutebot_asyncio import AsyncCutebot
+
+    bot = AsyncCutebot()
+
+    async def main():
+        await bot.motors(30, 30)
+        distance = await bot.sonar()
+        await bot.playTone(440, 0.5)
+
+    asyncio.run(main())
+'''
+
+######################################################
+#   Import
+######################################################
+import asyncio
+from jisforjt_cutebot_clue import getCutebot
+
+
+class AsyncCutebot:
+
+    def __init__(self, bot=None):
+        '''
+        bot = the Cutebot to drive (defaults to the shared cutebot, see getCutebot()).
+            Off the CLUE there is no shared cutebot: pass Cutebot(backend=...).
+
+        The Cutebot is switched to its non-blocking command pipeline.
+        '''
+        if bot is None:
+            try:
+                bot = getCutebot()
+            except ImportError as e:
+                raise RuntimeError("AsyncCutebot could not make the shared cutebot ({}); "
+                                   "off the CLUE pass one: AsyncCutebot(Cutebot(backend=...))"
+                                   .format(e)) from e
+        self.bot = bot
+        self.bot.blocking = False
+
+
+    ######################################################
+    #   I2C Command Pipeline
+    ######################################################
+    async def flush(self):
+        '''
+        Waits, without blocking other tasks, until every queued frame has been sent.
+        While another driver has the I2C bus locked it backs off and lets other tasks
+        run, and raises BusBusyError after cutebot.lockTimeout (see Cutebot.update()).
+        '''
+        while self.bot.update():
+            self.bot.raiseError()
+            await asyncio.sleep(self.bot._nextDue())
+
+    async def run(self):
+        '''
+        Background task that keeps the command pipeline moving. It also takes the
+        sonar samples when cutebot.startSonar() is on.
+
+        example:
+            asyncio.create_task(bot.run())
+        '''
+        while True:
+            self.bot.update()
+            await asyncio.sleep(self.bot._nextDue() if self.bot.pending else 0.005)
+
+    def startSonar(self, interval=0.06, size=16):
+        '''
+        Same as Cutebot.startSonar(). Run run() as a task to keep the samples coming.
+        '''
+        self.bot.startSonar(interval, size)
+
+
+    ######################################################
+    #   Sounds
+    ######################################################
+    async def playTone(self, tone, duration):
+        '''
+        Plays a tone for a set duration. Other tasks keep running while it plays.
+
+        tone (integer) =  the frequency of the tone
+        duration (float) = the number of seconds you want to play the tone
+        '''
+        buzzer = self.bot._buzzer
+        buzzer.frequency = tone
+        buzzer.duty_cycle = 2**15
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            buzzer.duty_cycle = 0
+
+
+    ######################################################
+    #   Lights
+    ######################################################
+    async def headlights(self, whichLight, colors):
+        '''
+        Same as Cutebot.headlights(). Returns once the frames have been sent.
+        '''
+        red, green, blue = colors
+        self.bot._stageHeadlights(whichLight, red, green, blue)
+        await self.flush()
+
+    def pixels(self, whichLight, colors):
+        '''
+        Same as Cutebot.pixels(). NeoPixels are not on the I2C bus, so this never waits.
+        '''
+        self.bot.pixels(whichLight, colors)
+
+    async def lightsOff(self):
+        await self.headlights(0, [0, 0, 0])
+        self.pixels(0, [0, 0, 0])
+
+
+    ######################################################
+    #   Motors
+    ######################################################
+    async def motors(self, leftSpeed, rightSpeed):
+        '''
+        Same as Cutebot.motors(). Returns once the frames have been sent.
+        '''
+        self.bot._stageMotors(leftSpeed, rightSpeed)
+        await self.flush()
+
+    async def motorsOff(self):
+        await self.motors(0, 0)
+
+
+    ######################################################
+    #   Servos
+    ######################################################
+    async def servos(self, whichServo, angleInDegrees):
+        '''
+        Same as Cutebot.servos(). Returns once the frames have been sent.
+        '''
+        self.bot._stageServos(whichServo, angleInDegrees)
+        await self.flush()
+
+    async def centerServos(self):
+        await self.servos(3, self.bot._servoMaxAngleInDegrees // 2)
+
+
+    ######################################################
+    #   Sensors
+    ######################################################
+    @property
+    def p1(self):
+        return self.bot.p1
+
+    @property
+    def p2(self):
+        return self.bot.p2
+
+    @property
+    def tracking(self):
+        return self.bot.tracking
+
+    async def sonar(self):
+        '''
+        Output: the distance in centimeters between the cutebot and an object in front of it
+
+        Takes the same three samples as Cutebot.sonar, but lets other tasks run
+        between them. After startSonar() it returns the latest background value, and
+        with a filter attached (see Cutebot.attachFilter()) it takes one ping and
+        returns the filter's value, just like Cutebot.sonar.
+        '''
+        bot = self.bot
+        if bot._sonarInterval or bot._sonarFilter:
+            return bot.sonar
+        timeoutCount = 0
+        data = []
+        while len(data) < 3:
+            distance = bot._ping()
+            if distance is not None:
+                data.append(distance)
+            else:
+                timeoutCount += 1
+                if timeoutCount > 8:
+                    return bot._sonarLost()
+            await asyncio.sleep(0.025)
+        distance = sum(data) - min(data) - max(data)
+        return distance
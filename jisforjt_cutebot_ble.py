@@ -0,0 +1,330 @@
+# CircuitPython Clue Cutebot - Bluetooth drive receiver
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Drives the Cutebot from the Control Pad in Adafruit's Bluefruit LE Connect app.
+
+Packet.from_stream() waits for a whole packet, and handling every packet with
+blocking motors() calls makes fast taps pile up and play out seconds late.
+BLEDrive reads only the bytes that have already arrived, keeps just the newest
+drive command, and sends it at the next control tick (rate times a second).
+
+The app only sends a button packet when a button goes down or up, so while an
+arrow is held nothing arrives at all. The robot is stopped when:
+    - the held button is let go (holdToDrive)
+    - connected() says the phone is gone (pass connected=lambda: ble.connected)
+    - a drive button has been held for holdDeadline seconds with no packet since.
+      This is the backstop for a release packet that never came; press the
+      button again to keep going.
+    - no packet arrives for deadline seconds and no drive button is being held.
+      This is for holdToDrive=False, where the robot keeps driving on its own:
+      stream a sensor from the app (Controller > Accelerometer) as a keepalive,
+      or set deadline=None.
+
+example:
+    from adafruit_ble import BLERadio
+    from adafruit_ble.advertising.standard import ProvideServicesAdvertisement
+    from adafruit_ble.services.nordic import UARTService
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_ble import BLEDrive
+
+    ble = BLERadio()
+    uart = UARTService()
+    ble.start_advertising(ProvideServicesAdvertisement(uart))
+    drive = BLEDrive(cutebot, uart, maxSpeed=35, connected=lambda: ble.connected)
+    while True:
+        button = drive.update()         # Drives, and returns other buttons pressed
+        if button == '2':
+            cutebot.pixels(3, [0, 0, 255])
+    print(drive.latency())
+
+Buttons are the characters the app sends: '1' to '4' for the number buttons, and
+'5' up, '6' down, '7' left, '8' right. Change drive.drives to choose which buttons
+drive and how fast each wheel turns (as a part of maxSpeed).
+
+Latency is measured from the update() that read a drive packet to the update()
+that sent its motor frames to the Cutebot.
+'''
+
+######################################################
+#   Import
+######################################################
+from array import array
+
+
+######################################################
+#   Packets
+######################################################
+# Bluefruit LE Connect packets are '!', a type letter, data and a checksum
+PACKET_SIZES = {
+    ord('B'): 5,        # Button: number, pressed ('1') or released ('0')
+    ord('C'): 6,        # Color
+    ord('A'): 15,       # Accelerometer
+    ord('G'): 15,       # Gyro
+    ord('M'): 15,       # Magnetometer
+    ord('L'): 15,       # Location
+    ord('Q'): 19,       # Quaternion
+}
+
+
+def buttonPacket(button, pressed=True):
+    '''
+    Output: the bytes the app sends for a button (to test without a phone)
+    '''
+    packet = bytearray(b'!B00\x00')
+    packet[2] = ord(button)
+    packet[3] = ord('1') if pressed else ord('0')
+    packet[4] = ~(packet[0] + packet[1] + packet[2] + packet[3]) & 0xFF
+    return bytes(packet)
+
+
+######################################################
+#   Receiver
+######################################################
+class BLEDrive:
+    '''
+    Latest-command-wins Control Pad driver. With the default arguments a lost
+    connection is NOT noticed right away: connected is None, so a held button (or
+    one whose release packet was lost) keeps the robot driving until holdDeadline
+    runs out. Pass connected=lambda: ble.connected to stop as soon as the phone
+    is gone.
+    '''
+
+    def __init__(self, bot, uart, maxSpeed=35, deadline=1.0, rate=50, holdToDrive=True,
+                 connected=None, holdDeadline=8.0):
+        '''
+        bot = the Cutebot to drive (switched to its non-blocking pipeline)
+        uart = adafruit_ble's UARTService (anything with in_waiting and readinto())
+        maxSpeed (integer) = motor speed for a full speed button
+        deadline (float) = stop if no packet arrives for this many seconds while no
+            drive button is held, None = never
+        rate (float) = control ticks per second
+        holdToDrive (boolean):
+            True  = drive while the button is held, stop when it is let go
+            False = keep driving until another drive button is pressed
+        connected = function that returns False once the phone is gone (such as
+            lambda: ble.connected), checked every control tick. None = not checked.
+        holdDeadline (float) = stop a held drive button after this many seconds
+            without a packet, None = never (only safe together with connected)
+        '''
+        self.bot = bot
+        self.uart = uart
+        self.maxSpeed = maxSpeed
+        self.deadline = deadline
+        self.holdDeadline = holdDeadline
+        self.period = 1 / rate
+        self.holdToDrive = holdToDrive
+        self.connected = connected
+        self.drives = {             # Button -> (left, right), parts of maxSpeed
+            '5': (1.0, 1.0),
+            '6': (-1.0, -1.0),
+            '7': (0.5, 1.0),
+            '8': (1.0, 0.5),
+            '1': (0.0, 0.0),
+        }
+        self._clock = bot._clock
+        self._buffer = bytearray(64)
+        self._view = memoryview(self._buffer)
+        self._length = 0
+        self._button = None         # Drive button currently in charge
+        self._left = 0
+        self._right = 0
+        self._waiting = False       # Newest command not applied yet
+        self._received = 0.0        # When the newest command was read
+        self._sending = False       # Applied, motor frames not sent yet
+        self._lastPacket = self._clock()
+        self._due = 0.0
+        self.stopped = True         # Motors last set to 0 (by a button, stop(), the deadline
+                                    # or the connection dropping)
+        self.packets = 0
+        self.badPackets = 0
+        self.superseded = 0         # Drive commands replaced before they were applied
+        self.deadlineStops = 0
+        self.disconnectStops = 0
+        self._latency = array('f', [0.0, 0.0, 0.0])     # Last, total, longest
+        self.latencyCount = 0
+        bot.blocking = False
+
+    def update(self):
+        '''
+        Reads the packets that have arrived, applies the newest drive command if it
+        is time, and sends the Cutebot's queued frames. Call this every loop.
+
+        Output: the last non-drive button pressed since the last update, or None
+        '''
+        now = self._clock()
+        other = self._read(now)
+        if now >= self._due:
+            self._due = now + self.period
+            if self._waiting:
+                moving = self._left or self._right
+            else:
+                moving = not self.stopped
+            if moving and self.connected is not None and not self.connected():
+                self.stop()
+                self.disconnectStops += 1
+            elif moving and not self._waiting:
+                deadline = self.holdDeadline if self._held() else self.deadline
+                if deadline is not None and now - self._lastPacket > deadline:
+                    self.stop()
+                    self.deadlineStops += 1
+            if self._waiting:
+                self._waiting = False
+                self._sending = True
+                self.stopped = not (self._left or self._right)
+                self.bot._stageMotors(self._left, self._right)
+        self.bot.update()
+        if self._sending and not self.bot._motionPending():
+            self._sending = False
+            self._record(self._clock() - self._received)
+        return other
+
+    def nextDue(self):
+        return max(self._due - self._clock(), 0)
+
+    async def run(self, handler=None):
+        '''
+        asyncio task that keeps driving. handler(button) is called for other buttons.
+        '''
+        import asyncio
+        while True:
+            button = self.update()
+            if button is not None and handler is not None:
+                handler(button)
+            await asyncio.sleep(self.nextDue())
+
+    @property
+    def button(self):
+        '''
+        Output: the drive button in charge now ('5' up, ...), None when stopped
+        '''
+        return self._button
+
+    def stop(self):
+        '''
+        Stops the motors at the next update() and forgets the drive button.
+        '''
+        self._button = None
+        self._command(0, 0, self._clock())
+
+    def latency(self):
+        '''
+        Output: commands measured, last, average and longest packet to motor time
+        in seconds
+        '''
+        count = self.latencyCount
+        return (count, self._latency[0], self._latency[1] / count if count else 0.0,
+                self._latency[2])
+
+    def clearLatency(self):
+        self.latencyCount = 0
+        for i in range(3):
+            self._latency[i] = 0.0
+
+    def _held(self):
+        # A hold-to-drive button is down: its release packet is what stops the robot
+        return self.holdToDrive and self._button is not None
+
+    def _read(self, now):
+        uart = self.uart
+        waiting = uart.in_waiting
+        if waiting:
+            room = len(self._buffer) - self._length
+            if waiting > room:
+                waiting = room
+            got = uart.readinto(self._view[self._length:self._length + waiting])
+            if got:
+                self._length += got
+        return self._parse(now)
+
+    def _parse(self, now):
+        buffer = self._buffer
+        length = self._length
+        other = None
+        i = 0
+        while i < length:
+            if buffer[i] != 0x21:                   # '!'
+                i += 1
+                continue
+            if i + 1 >= length:
+                break
+            size = PACKET_SIZES.get(buffer[i + 1])
+            if size is None:
+                self.badPackets += 1
+                i += 1
+                continue
+            if i + size > length:
+                break                               # The rest has not arrived yet
+            total = 0
+            for j in range(i, i + size - 1):
+                total += buffer[j]
+            if (~total & 0xFF) != buffer[i + size - 1]:
+                self.badPackets += 1
+                i += 1
+                continue
+            self.packets += 1
+            self._lastPacket = now
+            if size == 5:
+                button = chr(buffer[i + 2])
+                pressed = buffer[i + 3] == 0x31     # '1'
+                other = self._buttonPacket(button, pressed, now) or other
+            i += size
+        if i:
+            # Keep what has not been parsed at the start of the buffer
+            buffer[0:length - i] = buffer[i:length]
+            self._length = length - i
+        elif length == len(buffer):
+            self._length = 0                        # Full of noise
+        return other
+
+    def _buttonPacket(self, button, pressed, now):
+        drive = self.drives.get(button)
+        if drive is None:
+            return button if pressed else None
+        if pressed:
+            self._button = button
+            self._command(int(drive[0] * self.maxSpeed), int(drive[1] * self.maxSpeed), now)
+        elif self.holdToDrive and button == self._button:
+            self._button = None
+            self._command(0, 0, now)
+        return None
+
+    def _command(self, left, right, now):
+        if self._waiting:
+            self.superseded += 1                    # Latest command wins
+        self._left = left
+        self._right = right
+        self._received = now
+        self._waiting = True
+
+    def _record(self, seconds):
+        latency = self._latency
+        latency[0] = seconds
+        latency[1] += seconds
+        if seconds > latency[2]:
+            latency[2] = seconds
+        self.latencyCount += 1
@@ -0,0 +1,235 @@
+# CircuitPython Clue Cutebot - shared I2C bus arbiter
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+The Cutebot and the CLUE's own sensors (accelerometer, gyro, magnetometer,
+pressure, humidity, proximity, color) share one I2C bus. BusArbiter takes turns
+between them so motor commands are never stuck behind a slow sensor read:
+
+    - Cutebot frames always go first. Before every sensor read the arbiter sends
+      whatever the Cutebot has queued.
+    - A sensor read is put off if a Cutebot frame will be due before the read is
+      expected to finish (how long it took last time), but at most maxDeferrals
+      times in a row, and not while the Cutebot's writes are failing (lastError is
+      set or a ready frame could not be sent), so a stuck frame never starves the
+      sensors.
+    - Sensors are read at their own interval, in priority order (0 first). Reads that
+      are due in the same update() run back to back, up to budget seconds per update.
+    - The newest value of each sensor is kept in arbiter.values, so the rest of the
+      program never touches the bus to read them.
+
+example:
+    from adafruit_clue import clue
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_bus import BusArbiter
+
+    bus = BusArbiter(cutebot, clue)
+    bus.addSensor('proximity', interval=0.05, priority=0)
+    bus.addSensor('acceleration', interval=0.1)
+    while True:
+        bus.update()
+        if bus.values['proximity'] > 5:
+            cutebot.motors(-20, -10)
+        ...
+    print(bus.usage())
+
+The Cutebot is switched to its non-blocking pipeline, so its frames are sent from
+update().
+'''
+
+
+######################################################
+#   Arbiter
+######################################################
+class _Sensor:
+    # One sensor read the arbiter schedules
+
+    def __init__(self, name, read, interval, priority):
+        self.name = name
+        self.read = read
+        self.interval = interval
+        self.priority = priority
+        self.due = 0.0
+        self.duration = 0.0     # How long the last read took
+        self.reads = 0
+        self.busTime = 0.0
+        self.deferrals = 0      # Times in a row this read was put off
+
+
+class BusArbiter:
+
+    def __init__(self, bot, clue=None, budget=0.005, maxDeferrals=3):
+        '''
+        bot = the Cutebot on the bus (switched to its non-blocking pipeline)
+        clue = adafruit_clue's clue, to read its sensors by name (optional)
+        budget (float) = most seconds of sensor reads to start in one update()
+        maxDeferrals (integer) = most times in a row a sensor read is put off for
+            the Cutebot before it is read anyway
+        '''
+        self.bot = bot
+        self.clue = clue
+        self.budget = budget
+        self.maxDeferrals = maxDeferrals
+        self._failing = False       # The last try to send the Cutebot's frames sent none
+        self._clock = bot._clock
+        self._sensors = []          # Kept in priority order
+        self.values = {}            # Sensor name -> newest value
+        self.times = {}             # Sensor name -> clock time of that value
+        bot.blocking = False
+        self.clearUsage()
+
+    def addSensor(self, name, interval=0.1, priority=1, read=None):
+        '''
+        Reads a sensor every interval seconds.
+
+        name (string) = a clue property ('proximity', 'acceleration', 'gyro', 'magnetic',
+            'pressure', 'temperature', 'humidity', 'color', ...) or any name with read
+        interval (float) = seconds between reads
+        priority (integer) = lower numbers are read first when several are due
+        read = function that reads the sensor (default: the clue property called name)
+
+        example:
+            bus.addSensor('proximity', interval=0.05, priority=0)
+            bus.addSensor('heading', interval=0.2, read=compass.read)
+        '''
+        if read is None:
+            if self.clue is None:
+                raise ValueError("give BusArbiter a clue, or addSensor() a read function")
+            clue = self.clue
+            read = lambda: getattr(clue, name)
+        self.removeSensor(name)
+        sensor = _Sensor(name, read, interval, priority)
+        i = 0
+        while i < len(self._sensors) and self._sensors[i].priority <= priority:
+            i += 1
+        self._sensors.insert(i, sensor)
+        self.values[name] = None
+        self.times[name] = None
+
+    def removeSensor(self, name):
+        for sensor in self._sensors:
+            if sensor.name == name:
+                self._sensors.remove(sensor)
+                return
+
+
+    ######################################################
+    #   Scheduling
+    ######################################################
+    def update(self):
+        '''
+        Sends the Cutebot's queued frames, then reads the sensors that are due.
+        Call this every loop (or run run() as an asyncio task).
+
+        Output: the number of Cutebot frames still waiting to be sent
+        '''
+        clock = self._clock
+        self._sendCutebot()
+        start = clock()
+        for sensor in self._sensors:
+            now = clock()
+            if now < sensor.due:
+                continue
+            if now - start >= self.budget:
+                break                   # The rest wait for the next update()
+            if (self.bot.pending and sensor.deferrals < self.maxDeferrals
+                    and not self._failing and self.bot.lastError is None
+                    and self.bot._nextDue() < sensor.duration):
+                sensor.deferrals += 1
+                self.deferred += 1      # A motor frame would be kept waiting
+                continue
+            sensor.deferrals = 0
+            value = sensor.read()
+            end = clock()
+            self.values[sensor.name] = value
+            self.times[sensor.name] = end
+            sensor.duration = end - now
+            sensor.reads += 1
+            sensor.busTime += sensor.duration
+            sensor.due = now + sensor.interval
+            self._sendCutebot()         # Anything queued during the read goes next
+        return self.bot.pending
+
+    def nextDue(self):
+        '''
+        Output: seconds until update() has something to do
+        '''
+        now = self._clock()
+        wait = self.bot._nextDue() if self.bot.pending else 1.0
+        for sensor in self._sensors:
+            wait = min(wait, sensor.due - now)
+        return max(wait, 0)
+
+    async def run(self):
+        '''
+        asyncio task that calls update() whenever something is due.
+        '''
+        import asyncio
+        while True:
+            self.update()
+            await asyncio.sleep(self.nextDue())
+
+    def _sendCutebot(self):
+        bot = self.bot
+        if not bot.pending:
+            self._failing = False
+            return
+        before = bot.writesIssued
+        start = self._clock()
+        ready = bot._nextDue() == 0
+        bot.update()
+        self._failing = ready and bot.writesIssued == before
+        if bot.writesIssued != before:
+            self._cutebotWrites += bot.writesIssued - before
+            self._cutebotTime += self._clock() - start
+
+
+    ######################################################
+    #   Bus Usage
+    ######################################################
+    def usage(self):
+        '''
+        Output: dictionary of device name -> (transfers, seconds on the bus, share of
+        the bus time), with 'cutebot' for the Cutebot's frames
+        '''
+        total = self._cutebotTime
+        for sensor in self._sensors:
+            total += sensor.busTime
+        report = {'cutebot': (self._cutebotWrites, self._cutebotTime,
+                              self._cutebotTime / total if total else 0.0)}
+        for sensor in self._sensors:
+            report[sensor.name] = (sensor.reads, sensor.busTime,
+                                   sensor.busTime / total if total else 0.0)
+        return report
+
+    def clearUsage(self):
+        self._cutebotWrites = 0
+        self._cutebotTime = 0.0
+        self.deferred = 0       # Sensor reads put off so a Cutebot frame could go first
+        for sensor in self._sensors:
+            sensor.reads = 0
+            sensor.busTime = 0.0
@@ -29,6 +29,34 @@ OR OTHER DEALINGS IN THE SOFTWARE.
 ######################################################
 '''
 cutebot.py:
+v4
+    Actuator writes can be queued instead of blocking. Set blocking to False and call
+    update() in your loop; only a short gap per register (estimated) is enforced.
+    Writes that would not change anything are skipped (see writeStats).
+    transaction() sends several actuator changes under one lock and one settle delay.
+    startSonar() samples the sonar in the background so cutebot.sonar never waits
+    (each background ping waits at most 30 ms for its echo, inside update()).
+    attachFilter() runs sonar, p1 or p2 readings through jisforjt_cutebot_filters.
+    Pins are claimed on first use, and importing no longer waits for the Cutebot.
+    Hardware comes from a backend, so jisforjt_cutebot_sim can stand in for it.
+    jisforjt_cutebot_stats counts bus lock waits, I2C retries and sonar timeouts.
+    Waiting for a busy I2C bus is limited to lockTimeout, and bus problems raise
+    BusBusyError or BusWriteError instead of printing "i2c ERROR".
+    jisforjt_cutebot_bus shares the I2C bus with the CLUE's sensors, motors first.
+    jisforjt_cutebot_melody plays tunes on the buzzer without stopping the robot.
+    jisforjt_cutebot_motion ramps motor speeds with acceleration and jerk limits,
+    and moves the servos smoothly over a set time.
+    centerServos() sends a whole number angle.
+    jisforjt_cutebot_ir reads an IR remote without waiting for it.
+    jisforjt_cutebot_ble drives from the Bluefruit Connect Control Pad, newest
+    command first, and stops when the phone goes quiet.
+    jisforjt_cutebot_telemetry sends compact binary status frames instead of print().
+    jisforjt_cutebot_trace records sensor readings and commands to a log that can be
+    replayed on a computer.
+    Importing no longer makes the Cutebot: getCutebot() (or the cutebot name, which
+    still works) makes it on first use, and hardware errors are no longer hidden.
+    NeoPixels are sent once per change (auto_write off), and
+    jisforjt_cutebot_effects animates them, and fades the headlights, without blocking.
 v3
     Updated to work with Circuit Python 7.x. Adafruit Clue class has been seperated again.
 v2
@@ -67,33 +95,264 @@ Pins
 #   Import
 ######################################################
 import time
-import board
-import busio
-import pwmio
-import neopixel
-from digitalio import DigitalInOut, Direction, Pull
-from analogio import AnalogIn
-import adafruit_hcsr04
+from array import array
+# board, pwmio, neopixel, digitalio, analogio and adafruit_hcsr04 are imported by
+# BoardBackend when the part that needs them is first used.
 
-class Cutebot:
+
+######################################################
+#   Hardware Backend
+######################################################
+class BoardBackend:
+    '''
+    Makes the real CLUE and Cutebot hardware for a Cutebot. Pins are given by their
+    board name ('P0', 'D13', ...).
+
+    Another backend can be passed to Cutebot(backend=...) to run the library without
+    the hardware, for example jisforjt_cutebot_sim.SimBackend. It needs the same
+    methods, returning objects that behave like the CircuitPython ones:
+        i2c()                           busio.I2C (try_lock, unlock, writeto)
+        buzzer(pin)                     pwmio.PWMOut (frequency, duty_cycle)
+        pixels(pin, n)                  neopixel.NeoPixel with auto_write=False
+                                        (item assignment, fill, show)
+        analogIn(pin)                   analogio.AnalogIn (value)
+        digitalIn(pin)                  digitalio.DigitalInOut set as an input (value)
+        rangeSensor(trigger, echo)      adafruit_hcsr04.HCSR04 (distance)
+        pulseIn(pin, maxlen)            pulseio.PulseIn with idle_state=True (len, popleft, clear)
+    and the time functions monotonic(), monotonic_ns() and sleep(seconds).
+
+    monotonic() counts seconds from when the backend was made. time.monotonic() is a
+    float counted from power-up (soft reloads do not reset it), so after a few hours
+    it only moves in steps of several milliseconds, too coarse for the 10 ms register
+    gaps and 100 Hz control loops. Instead whole milliseconds are counted from
+    supervisor.ticks_ms(), which does not allocate, and only the time since start
+    becomes a float.
+    '''
 
     def __init__(self):
+        self.monotonic_ns = time.monotonic_ns
+        self.sleep = time.sleep
+        try:
+            from supervisor import ticks_ms
+        except ImportError:
+            ticks_ms = None                 # Not on CircuitPython (fake hardware)
+        self._ticks_ms = ticks_ms
+        self._start = time.monotonic()      # Without supervisor: CPython floats are fine-grained
+        self._lastTicks = ticks_ms() if ticks_ms else 0
+        self._elapsed = 0                   # Milliseconds since the backend was made
+
+    def monotonic(self):
+        ticks_ms = self._ticks_ms
+        if ticks_ms is None:
+            return time.monotonic() - self._start
+        ticks = ticks_ms()
+        # ticks_ms wraps at 2**29; the difference taken modulo that is the time passed
+        self._elapsed += (ticks - self._lastTicks) & 0x1FFFFFFF
+        self._lastTicks = ticks
+        return self._elapsed / 1000
+
+    def i2c(self):
+        import board
+        #import busio
+        #return busio.I2C(board.SCL, board.SDA, frequency = 100000)
+        return board.I2C()
+
+    def buzzer(self, pin):
+        import board
+        import pwmio
+        return pwmio.PWMOut(getattr(board, pin), variable_frequency=True)
+
+    def pixels(self, pin, n):
+        import board
+        import neopixel
+        return neopixel.NeoPixel(getattr(board, pin), n, auto_write=False)
+
+    def analogIn(self, pin):
+        import board
+        from analogio import AnalogIn
+        return AnalogIn(getattr(board, pin))
+
+    def digitalIn(self, pin):
+        import board
+        from digitalio import DigitalInOut, Direction
+        sensor = DigitalInOut(getattr(board, pin))
+        sensor.direction = Direction.INPUT
+        sensor.pull = None
+        return sensor
+
+    def rangeSensor(self, trigger, echo):
+        import board
+        import adafruit_hcsr04
+        # 30 ms is the echo from about 5 m, past the HC-SR04's 4 m range. The
+        # library's 0.1 s default would hold up a background sample for longer.
+        return adafruit_hcsr04.HCSR04(trigger_pin=getattr(board, trigger),
+                                      echo_pin=getattr(board, echo), timeout=0.03)
+
+    def pulseIn(self, pin, maxlen):
+        import board
+        import pulseio
+        return pulseio.PulseIn(getattr(board, pin), maxlen=maxlen, idle_state=True)
+
+######################################################
+#   Errors
+######################################################
+class CutebotError(Exception):
+    '''
+    Something went wrong talking to the Cutebot. The frames that were not sent stay
+    queued and go out with the next command (or the next update()).
+    '''
+    pass
+
+
+class BusBusyError(CutebotError):
+    '''
+    Another driver (for example adafruit_clue's sensors) kept the I2C bus locked
+    for longer than cutebot.lockTimeout.
+    '''
+    pass
+
+
+class BusWriteError(CutebotError):
+    '''
+    Writes to the Cutebot kept failing. Is it switched on and is the CLUE plugged in?
+    '''
+    pass
+
+
+class _Lazy:
+    # A Cutebot peripheral that is claimed the first time it is used. The first lookup
+    # asks the backend for it and stores it on the Cutebot, which hides this class
+    # attribute, so later lookups are plain attribute reads. Deleting the attribute
+    # (see TrackingMonitor) frees the pins until the next use.
+
+    def __init__(self, name, method, *pins):
+        self._name = name
+        self._method = method       # The backend method that makes it
+        self._pins = pins
+
+    def __get__(self, bot, owner=None):
+        if bot is None:
+            return self
+        part = getattr(bot._backend, self._method)(*self._pins)
+        setattr(bot, self._name, part)
+        return part
+
+
+class _Transaction:
+    # Context manager returned by Cutebot.transaction(). One is made per Cutebot and
+    # reused, so starting a transaction does not allocate. The outermost transaction
+    # keeps a copy of the queued state, put back if the body raises.
+
+    def __init__(self, bot):
+        self._bot = bot
+        self._frames = bytearray(4 * len(bot._registers))
+        self._dirty = bytearray(len(bot._dirty))
+        self._pendingCount = 0
+        self._pixels = [-1, -1]
+        self._pixelsDirty = False
+
+    def __enter__(self):
+        bot = self._bot
+        if not bot._batchDepth:
+            self._save()
+        bot._batchDepth += 1
+        return bot
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        bot = self._bot
+        bot._batchDepth -= 1
+        if not bot._batchDepth:
+            if exc_type is None:
+                bot._commit('TRANSACTION')
+            else:
+                self._restore()
+        return False
+
+    def _save(self):
+        bot = self._bot
+        i = 0
+        for register in bot._registers:
+            self._frames[i:i + 4] = bot._frames[register]
+            i += 4
+        self._dirty[:] = bot._dirty
+        self._pendingCount = bot._pendingCount
+        self._pixels[0] = bot._pixelShadow[0]
+        self._pixels[1] = bot._pixelShadow[1]
+        self._pixelsDirty = bot._pixelsDirty
+
+    def _restore(self):
+        # Throws away what the aborted transaction queued. Frames queued before it
+        # stay queued; nothing the transaction changed is sent.
+        bot = self._bot
+        i = 0
+        for register in bot._registers:
+            bot._frames[register][:] = self._frames[i:i + 4]
+            i += 4
+        bot._dirty[:] = self._dirty
+        bot._pendingCount = self._pendingCount
+        for index in (0, 1):
+            color = self._pixels[index]
+            if bot._pixelShadow[index] != color:
+                if color >= 0:
+                    bot._rainbow_pixels[index] = color
+                bot._pixelShadow[index] = color
+        bot._pixelsDirty = self._pixelsDirty
+
+
+class Cutebot:
+
+    def __init__(self, blocking=True, reset=True, backend=None):
+        '''
+        blocking (boolean):
+            True  = every actuator call waits for the Cutebot to settle (the original behavior)
+            False = actuator calls are queued and return right away; call update() often
+        reset (boolean):
+            True  = stop the motors and turn off the headlights now
+            False = leave the Cutebot as it is until the first command
+        backend = where the hardware comes from (defaults to BoardBackend())
+
+        Pins are only claimed when the part that uses them is first used, so a program
+        that only drives the motors leaves the buzzer, sonar and sensor pins free.
+        '''
+        # Define hardware backend and time source
+        if backend is None:
+            backend = BoardBackend()
+        self._backend = backend
+        self._clock = backend.monotonic
+        self._sleep = backend.sleep
+
         # Define i2c
-        #self._i2c = busio.I2C(board.SCL, board.SDA, frequency = 100000)
-        self._i2c = board.I2C()
+        # The bus and the NeoPixels are used by every actuator call, so they are made
+        # here. The other parts are claimed on first use, see _Lazy.
+        self._i2c = backend.i2c()
         self._cutebot = 0x10
         self._i2c_rest = 0.1
         self._error_thresh = 12
+        self.lockTimeout = 0.05     # Longest wait for a bus another driver has locked
+        self.lastError = None       # Error from update() or reset(), see CutebotError
+        self._busySince = -1.0      # When update() first found the bus locked, -1 = not busy
+        self._busyWait = 0          # Back off before update() tries the locked bus again
+        self._busyTries = 0
 
-        # Define sound
-        self._buzzer = pwmio.PWMOut(board.P0, variable_frequency=True)
+        # Define command pipeline
+        self.blocking = blocking
+        self._dirty = bytearray(9)  # Indexed by register: 1 = a frame is waiting to be sent
+        self._pendingCount = 0
+        self._lastWrite = {}        # Register -> clock time of its last frame
+        self._batchDepth = 0        # > 0 while inside cutebot.transaction()
+        self.writesIssued = 0       # Frames (and NeoPixel updates) actually sent
+        self.writesSuppressed = 0   # Frames skipped because nothing would change
 
         # Define headlights
         self._RGB_RIGHT_HEADLIGHT = 0x04
         self._RGB_LEFT_HEADLIGHT = 0X08
 
         # Define neopixels
-        self._rainbow_pixels = neopixel.NeoPixel(board.D15, 2)
+        # The strip's own buffer is the frame buffer: colors are written into it and
+        # sent with one show() for both pixels.
+        self._rainbow_pixels = backend.pixels('D15', 2)
+        self._pixelShadow = [-1, -1]        # Last color (0xRRGGBB) written to each neopixel, -1 = unknown
+        self._pixelsDirty = False           # Buffer changed inside a transaction, not shown yet
 
         # Define motor states
         self._LEFT_MOTOR = 0x01
@@ -106,26 +365,324 @@ class Cutebot:
         self._SERVO_S1 = 0x05 
         self._SERVO_S2 = 0x06
 
-        # Define expansion pins
-        self._p1 = AnalogIn(board.P1)
-        self._p2 = AnalogIn(board.P2)
-        
-        # Define ultrasound sonar 
-        self._sonar = adafruit_hcsr04.HCSR04(trigger_pin=board.D8, echo_pin=board.D12)
+        # Minimum time (seconds) between two frames sent to the same register.
+        # These are estimates, not measured on the Cutebot's controller: 10 ms is
+        # a tenth of the 0.1 s settle delay the blocking calls have always used,
+        # and 20 ms is one period of the 50 Hz servo signal, so a faster servo
+        # update could not be seen anyway. Raise them if frames get dropped.
+        self._registerGap = {
+            self._LEFT_MOTOR: 0.01,
+            self._RIGHT_MOTOR: 0.01,
+            self._SERVO_S1: 0.02,
+            self._SERVO_S2: 0.02,
+            self._RGB_LEFT_HEADLIGHT: 0.01,
+            self._RGB_RIGHT_HEADLIGHT: 0.01,
+        }
+
+        # Registers in the order queued frames are sent: motion first
+        self._registers = (self._LEFT_MOTOR, self._RIGHT_MOTOR, self._SERVO_S1,
+                           self._SERVO_S2, self._RGB_LEFT_HEADLIGHT, self._RGB_RIGHT_HEADLIGHT)
+
+        # Preallocated frames, filled in place so writes do not allocate
+        # _frames holds the newest value for each register, _shadow the last one sent.
+        # A shadow frame starting with 0 has never been sent.
+        self._frames = {}
+        self._shadow = {}
+        for register in self._registers:
+            self._frames[register] = bytearray(4)
+            self._shadow[register] = bytearray(4)
+            self._lastWrite[register] = -1.0
+        self._transaction = _Transaction(self)
+
+        # Optional filters, see attachFilter()
+        self._p1Filter = None
+        self._p2Filter = None
+        self._sonarFilter = None
         
-        # Define line tracking sensors
-        # Left sensor
-        self._leftLineTracking = DigitalInOut(board.D13)
-        self._leftLineTracking.direction = Direction.INPUT
-        self._leftLineTracking.pull = None
-        # Right sensor
-        self._rightLineTracking = DigitalInOut(board.D14)
-        self._rightLineTracking.direction = Direction.INPUT
-        self._rightLineTracking.pull = None
+        # Define ultrasound sonar background sampling
+        self._sonarInterval = 0     # Seconds between background samples, 0 = off
+        self._sonarDue = 0.0
+        self._sonarSize = 0
+        self._sonarIndex = 0        # Next slot to fill in the ring buffer
+        self._sonarCount = 0
+        self._sonarMisses = 0       # Background pings in a row that timed out
+        self._sonarMissLimit = 3    # After this many the samples are stale and dropped
+        self._sonarEpoch = 0.0      # Sample times are stored relative to this
+        self._sonarTimes = None
+        self._sonarDistances = None
+        self.sonarTimeouts = 0
+
+        # Line tracking can be taken over by a TrackingMonitor (jisforjt_cutebot_tracking)
+        self._trackingMonitor = None
+
+        # Optional instrumentation, see jisforjt_cutebot_stats
+        self._stats = None
 
         # Reset cutebot
-        self.motorsOff()
-        self.lightsOff()
+        if reset:
+            self.reset()
+
+
+    ######################################################
+    #   Hardware
+    ######################################################
+    # Claimed on first use. The I2C bus and NeoPixels are made in __init__() instead,
+    # because every actuator call uses them.
+    _buzzer = _Lazy('_buzzer', 'buzzer', 'P0')
+    _p1 = _Lazy('_p1', 'analogIn', 'P1')
+    _p2 = _Lazy('_p2', 'analogIn', 'P2')
+    _sonar = _Lazy('_sonar', 'rangeSensor', 'D8', 'D12')
+    _leftLineTracking = _Lazy('_leftLineTracking', 'digitalIn', 'D13')
+    _rightLineTracking = _Lazy('_rightLineTracking', 'digitalIn', 'D14')
+
+    def reset(self):
+        '''
+        Stops the motors and turns off the headlights and NeoPixels right away, without
+        the usual settle delay. Called when the Cutebot is made unless reset=False.
+        '''
+        self.clearCache()           # Send even if we think the Cutebot already matches
+        self._rainbow_pixels.fill(0)
+        self._rainbow_pixels.show()
+        self._pixelShadow[0] = 0
+        self._pixelShadow[1] = 0
+        self._stageMotors(0, 0)
+        self._stageHeadlights(0, 0, 0, 0)
+        try:
+            self._send('RESET')
+        except CutebotError as error:
+            self.lastError = error      # Sent with the first command instead
+
+
+    ######################################################
+    #   I2C Command Pipeline
+    ######################################################
+    def update(self):
+        '''
+        Sends every queued frame whose register is ready for it, and takes a sonar
+        sample when background sampling is on and one is due. Call this often
+        (every loop) when blocking is False or startSonar() has been used.
+
+        update() never waits for the bus and never raises. If the bus is locked by
+        another driver the frames are tried again next time; if that goes on for
+        lockTimeout, or writes keep failing, the error is put in cutebot.lastError.
+
+        Output: the number of frames still waiting to be sent
+        '''
+        now = self._clock()
+        if self._sonarInterval and now >= self._sonarDue:
+            self.sampleSonar()
+        if not self._pendingCount:
+            return 0
+        for register in self._registers:
+            if self._dirty[register] and self._isReady(register, now):
+                try:
+                    self._send('I2C', now)
+                except CutebotError as error:
+                    self.lastError = error
+                break
+        return self._pendingCount
+
+    def transaction(self):
+        '''
+        Groups motor, servo and headlight changes so they are sent together: one bus
+        lock, one retry budget and, when blocking, one settle delay.
+
+        example:
+            with cutebot.transaction():
+                cutebot.motors(35, 35)
+                cutebot.headlights(3, [255, 255, 255])
+                cutebot.servos(1, 90)
+
+        If the body raises, everything it changed is thrown away and nothing of it is
+        sent: frames queued before the transaction stay queued as they were, and the
+        NeoPixels keep the colors they show.
+        '''
+        return self._transaction
+
+    def flush(self):
+        '''
+        Waits until every queued frame has been sent.
+
+        Raises BusBusyError or BusWriteError (see update()) instead of waiting forever.
+        '''
+        while self.update():
+            self.raiseError()
+            self._sleep(self._nextDue())
+
+    def raiseError(self):
+        '''
+        Raises, and clears, the error update() stored in lastError, if there is one.
+        '''
+        error = self.lastError
+        if error is not None:
+            self.lastError = None
+            raise error
+
+    def clearCache(self):
+        '''
+        Forgets what was last sent to the Cutebot, so the next call to each actuator
+        is always sent. Use this if the Cutebot was power cycled.
+        '''
+        for register in self._shadow:
+            self._shadow[register][0] = 0
+        self._pixelShadow[0] = -1
+        self._pixelShadow[1] = -1
+
+    @property
+    def pending(self):
+        '''
+        Output: the number of frames waiting to be sent
+        '''
+        return self._pendingCount
+
+    @property
+    def writeStats(self):
+        '''
+        Output: writes issued, writes suppressed
+
+        A write is suppressed when it would not change anything, or when a newer
+        value for the same register replaced it before it was sent.
+        '''
+        return self.writesIssued, self.writesSuppressed
+
+    def _isReady(self, register, now):
+        # Same sum as _nextDue(), so "due in 0 s" always means ready
+        return now >= self._lastWrite[register] + self._registerGap[register]
+
+    def _nextDue(self):
+        # Seconds until the first waiting register may be written again
+        now = self._clock()
+        wait = self._i2c_rest
+        for register in self._registers:
+            if self._dirty[register]:
+                due = self._lastWrite[register] + self._registerGap[register] - now
+                wait = min(wait, due)
+        return max(wait, self._busyWait, 0)
+
+    def _stage(self, register, b1, b2, b3):
+        # Fill the register's frame in place and queue it if it changes anything
+        frame = self._frames[register]
+        frame[0] = register
+        frame[1] = b1
+        frame[2] = b2
+        frame[3] = b3
+        if frame == self._shadow[register]:
+            self.writesSuppressed += 1
+            if self._dirty[register]:
+                self._dirty[register] = 0       # Back to what the Cutebot already has
+                self._pendingCount -= 1
+        elif self._dirty[register]:
+            self.writesSuppressed += 1          # Last value wins: the older frame never goes out
+        else:
+            self._dirty[register] = 1
+            self._pendingCount += 1
+
+    def _commit(self, name):
+        if self._batchDepth:
+            return          # Sent when the transaction ends
+        if self._pixelsDirty:
+            self._pixelsDirty = False
+            self._rainbow_pixels.show()
+        if not self.blocking:
+            self.update()
+        elif self._pendingCount:
+            self._send(name)
+            self._sleep(self._i2c_rest)
+
+    def _send(self, name, now=None):
+        # Write queued frames under one lock with one retry budget for the whole batch.
+        # With now (from update()), only registers past their gap are written and a
+        # locked bus is not waited for. Unsent frames stay queued.
+        stats = self._stats
+        if not self._i2c.try_lock():
+            if now is None:
+                self._waitForBus(name)
+            else:
+                self._busy(name, now)
+                return
+        elif self._busySince >= 0:
+            if stats and self._busyTries:
+                stats.lockWait(self._busyTries, self._clock() - self._busySince)
+            self._busySince = -1.0
+            self._busyWait = 0
+            self._busyTries = 0
+        error_count = 0
+        for register in self._registers:
+            if not self._dirty[register]:
+                continue
+            if now is not None and not self._isReady(register, now):
+                continue
+            while True:
+                try:
+                    self._i2c.writeto(self._cutebot, self._frames[register])
+                    break
+                except:
+                    error_count += 1
+                    if stats:
+                        if error_count == 1:
+                            failedAt = self._clock()
+                        stats.retry()
+                    if error_count > self._error_thresh:
+                        if stats:
+                            stats.failure(self._clock() - failedAt)
+                        self._i2c.unlock()
+                        raise BusWriteError(name + ': i2c ERROR')
+            self._sent(register)
+        if stats and error_count:
+            stats.retried(self._clock() - failedAt)
+        self._i2c.unlock()
+
+    def _waitForBus(self, name):
+        # Another driver has the bus: try again with growing sleeps until lockTimeout
+        stats = self._stats
+        start = self._clock()
+        deadline = start + self.lockTimeout
+        wait = 0.0001
+        tries = 1
+        while not self._i2c.try_lock():
+            tries += 1
+            now = self._clock()
+            if now >= deadline:
+                if stats:
+                    stats.lockWait(tries, now - start)
+                    stats.failure(now - start)
+                raise BusBusyError(name + ': i2c bus busy')
+            self._sleep(min(wait, deadline - now))
+            wait = min(wait * 2, 0.005)
+        if stats:
+            stats.lockWait(tries, self._clock() - start)
+
+    def _busy(self, name, now):
+        # update() found the bus locked: back off, and give up after lockTimeout
+        if self._busySince < 0:
+            self._busySince = now
+            self._busyWait = 0.0001
+        else:
+            self._busyWait = min(self._busyWait * 2, 0.005)
+        self._busyTries += 1
+        if now - self._busySince >= self.lockTimeout:
+            if self._stats:
+                self._stats.lockWait(self._busyTries, now - self._busySince)
+                self._stats.failure(now - self._busySince)
+            self._busySince = now           # Count the next timeout from here
+            self._busyTries = 0
+            raise BusBusyError(name + ': i2c bus busy')
+
+    def _motionPending(self):
+        # True while a motor frame is waiting to be sent
+        return self._dirty[self._LEFT_MOTOR] or self._dirty[self._RIGHT_MOTOR]
+
+    def _sent(self, register):
+        frame = self._frames[register]
+        shadow = self._shadow[register]
+        shadow[0] = frame[0]
+        shadow[1] = frame[1]
+        shadow[2] = frame[2]
+        shadow[3] = frame[3]
+        self._dirty[register] = 0
+        self._pendingCount -= 1
+        self._lastWrite[register] = self._clock()
+        self.writesIssued += 1
 
 
     ######################################################
@@ -154,7 +711,7 @@ class Cutebot:
         '''
         self._buzzer.frequency = tone
         self._buzzer.duty_cycle = 2**15
-        time.sleep(duration)        
+        self._sleep(duration)        
         self._buzzer.duty_cycle = 0
 
 
@@ -186,39 +743,24 @@ class Cutebot:
             headlights(2, red)            # sets the right headlight to red
             headlights(3, [80, 255, 80])  # sets both headlights to a light green color
         '''
-        while not self._i2c.try_lock():
-            pass
-        error_count = 0
-        while True:
-            try:
-                red, green, blue = colors
-                r = int(min(max(red, 0),255))
-                g = int(min(max(green, 0),255))
-                b = int(min(max(blue, 0),255))
-                if whichLight == 0:
-                    data = [self._RGB_LEFT_HEADLIGHT, 0, 0, 0]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                    data[0] = self._RGB_RIGHT_HEADLIGHT    
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                elif whichLight == 1:
-                    data = [self._RGB_RIGHT_HEADLIGHT, r, g, b] 
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                elif whichLight == 2: 
-                    data = [self._RGB_LEFT_HEADLIGHT, r, g, b]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                elif whichLight == 3:
-                    data = [self._RGB_LEFT_HEADLIGHT, r, g, b]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                    data[0] = self._RGB_RIGHT_HEADLIGHT
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                break
-            except:
-                error_count += 1
-                if error_count > self._error_thresh:
-                    print('HEADLIGHTS: i2c ERROR')
-                    break
-        self._i2c.unlock()
-        time.sleep(self._i2c_rest)
+        red, green, blue = colors
+        self._stageHeadlights(whichLight, red, green, blue)
+        self._commit('HEADLIGHTS')
+
+    def _stageHeadlights(self, whichLight, red, green, blue):
+        r = int(min(max(red, 0),255))
+        g = int(min(max(green, 0),255))
+        b = int(min(max(blue, 0),255))
+        if whichLight == 0:
+            self._stage(self._RGB_LEFT_HEADLIGHT, 0, 0, 0)
+            self._stage(self._RGB_RIGHT_HEADLIGHT, 0, 0, 0)
+        elif whichLight == 1:
+            self._stage(self._RGB_RIGHT_HEADLIGHT, r, g, b)
+        elif whichLight == 2:
+            self._stage(self._RGB_LEFT_HEADLIGHT, r, g, b)
+        elif whichLight == 3:
+            self._stage(self._RGB_LEFT_HEADLIGHT, r, g, b)
+            self._stage(self._RGB_RIGHT_HEADLIGHT, r, g, b)
 
     def pixels(self, whichLight, colors):
         '''
@@ -249,16 +791,35 @@ class Cutebot:
         r = int(min(max(red, 0),255))
         g = int(min(max(green, 0),255))
         b = int(min(max(blue, 0),255))
+        color = (r << 16) | (g << 8) | b
         if whichLight == 0: 
-            self._rainbow_pixels[0] = (0, 0, 0)
-            self._rainbow_pixels[1] = (0, 0, 0)
+            self._writePixels(0, 0)
         elif whichLight == 1:
-            self._rainbow_pixels[0] = (r, g, b)
+            self._writePixels(color, self._pixelShadow[1])
         elif whichLight == 2:
-            self._rainbow_pixels[1] = (r, g, b)
+            self._writePixels(self._pixelShadow[0], color)
         elif whichLight == 3:
-            self._rainbow_pixels[0] = (r, g, b)
-            self._rainbow_pixels[1] = (r, g, b)
+            self._writePixels(color, color)
+
+    def _writePixels(self, left, right):
+        # Colors are packed 0xRRGGBB integers, which need no tuples. Both pixels go
+        # out in one show(), and only if one of them changed.
+        changed = self._setPixel(0, left)
+        changed = self._setPixel(1, right) or changed
+        if changed:
+            if self._batchDepth:
+                self._pixelsDirty = True    # Shown when the transaction ends
+            else:
+                self._rainbow_pixels.show()
+
+    def _setPixel(self, index, color):
+        if self._pixelShadow[index] == color or color < 0:
+            self.writesSuppressed += 1
+            return False
+        self._rainbow_pixels[index] = color
+        self._pixelShadow[index] = color
+        self.writesIssued += 1
+        return True
 
     def lightsOff(self):
         self.headlights(0,[0,0,0])
@@ -278,41 +839,22 @@ class Cutebot:
             motors(-100, 100)   # sets cutebot's motors so it spins counter-clockwise
             motors(-50, -50)    # sets cutebot's motors so it backs up at about half speed
         '''
-        while not self._i2c.try_lock():
-            pass
-        error_count = 0
-        while True:
-            try:
-                leftSpeed = int(min(max(leftSpeed, -100),100))
-                rightSpeed = int(min(max(rightSpeed, -100),100))
-                # Stop motors
-                if leftSpeed == 0 and rightSpeed == 0:
-                    data = [self._LEFT_MOTOR, self._FORWARDS, 0, 0]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                    data[0] = self._RIGHT_MOTOR
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                # Left motor
-                if leftSpeed > 0:
-                    data = [self._LEFT_MOTOR, self._FORWARDS, leftSpeed, 0]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                else:
-                    data = [self._LEFT_MOTOR, self._BACKWARDS, (leftSpeed * -1), 0]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                # Right motor
-                if rightSpeed > 0:
-                    data = [self._RIGHT_MOTOR, self._FORWARDS, rightSpeed, 0]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                else:
-                    data = [self._RIGHT_MOTOR, self._BACKWARDS, (rightSpeed * -1), 0]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                break
-            except:
-                error_count += 1
-                if error_count > self._error_thresh:
-                    print('MOTOR: i2c ERROR')
-                    break
-        self._i2c.unlock()
-        time.sleep(self._i2c_rest)
+        self._stageMotors(leftSpeed, rightSpeed)
+        self._commit('MOTOR')
+
+    def _stageMotors(self, leftSpeed, rightSpeed):
+        leftSpeed = int(min(max(leftSpeed, -100),100))
+        rightSpeed = int(min(max(rightSpeed, -100),100))
+        # Left motor
+        if leftSpeed >= 0:
+            self._stage(self._LEFT_MOTOR, self._FORWARDS, leftSpeed, 0)
+        else:
+            self._stage(self._LEFT_MOTOR, self._BACKWARDS, (leftSpeed * -1), 0)
+        # Right motor
+        if rightSpeed >= 0:
+            self._stage(self._RIGHT_MOTOR, self._FORWARDS, rightSpeed, 0)
+        else:
+            self._stage(self._RIGHT_MOTOR, self._BACKWARDS, (rightSpeed * -1), 0)
 
     def motorsOff(self):
         self.motors(0,0)     # stop motors
@@ -333,67 +875,232 @@ class Cutebot:
             servos(2, 120)      #Sets Servo S2 to 120 degrees
             servos(3, 180)      #Sets Servo S1 and S2 to 180 degrees
         '''
-        while not self._i2c.try_lock():
-            pass
-        error_count = 0
-        while True:
-            try:
-                angleInDegrees = int(min(max(angleInDegrees, 0),self._servoMaxAngleInDegrees))
-                if whichServo == 1:
-                    data = [self._SERVO_S1, angleInDegrees, 0, 0]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                elif whichServo == 2:
-                    data = [self._SERVO_S2, angleInDegrees, 0, 0]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                elif whichServo == 3:
-                    data = [self._SERVO_S1, angleInDegrees, 0, 0]
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                    data[0] = self._SERVO_S2
-                    self._i2c.writeto(self._cutebot, bytes(data))
-                break
-            except:
-                error_count += 1
-                if error_count > self._error_thresh:
-                    print('SERVO: i2c ERROR')
-                    break
-        self._i2c.unlock()
-        time.sleep(self._i2c_rest)
+        self._stageServos(whichServo, angleInDegrees)
+        self._commit('SERVO')
+
+    def _stageServos(self, whichServo, angleInDegrees):
+        angleInDegrees = int(min(max(angleInDegrees, 0),self._servoMaxAngleInDegrees))
+        if whichServo == 1 or whichServo == 3:
+            self._stage(self._SERVO_S1, angleInDegrees, 0, 0)
+        if whichServo == 2 or whichServo == 3:
+            self._stage(self._SERVO_S2, angleInDegrees, 0, 0)
 
     def centerServos(self):
-        self.servos(3,(self._servoMaxAngleInDegrees/2))
+        self.servos(3, self._servoMaxAngleInDegrees // 2)
 
 
     ######################################################
     #   Sensors
     ######################################################
+    def attachFilter(self, sensor, sensorFilter):
+        '''
+        Runs every reading of a sensor through a filter from jisforjt_cutebot_filters.
+
+        sensor (string) = 'sonar', 'p1' or 'p2'
+        sensorFilter = the filter (or FilterChain) to use, or None to remove it
+
+        With a sonar filter, cutebot.sonar takes a single ping and lets the filter
+        smooth it, instead of taking three pings in a row.
+
+        example:
+            cutebot.attachFilter('sonar', FilterChain(RangeClamp(2, 400), MedianFilter(3)))
+            cutebot.attachFilter('p1', EMAFilter(0.2))
+        '''
+        if sensor == 'sonar':
+            self._sonarFilter = sensorFilter
+        elif sensor == 'p1':
+            self._p1Filter = sensorFilter
+        elif sensor == 'p2':
+            self._p2Filter = sensorFilter
+        else:
+            raise ValueError("sensor must be 'sonar', 'p1' or 'p2'")
+        if sensorFilter is not None:
+            sensorFilter.reset()
+
     @property
     def p1(self):
+        if self._p1Filter:
+            return self._p1Filter.update(self._p1.value)
         return self._p1.value
 
     @property
     def p2(self):
+        if self._p2Filter:
+            return self._p2Filter.update(self._p2.value)
         return self._p2.value
 
     @property
     def sonar(self):
         '''
         Output: the distance in centimeters between the cutebot and an object in front of it
+
+        After startSonar() this returns right away with the median of the latest three
+        background samples, or 0.00 once three pings in a row have timed out (nothing
+        in range), just like the three-sample read gives up with 0.00. Otherwise it
+        takes three samples, which takes about 75 ms.
+        With a filter attached (see attachFilter()) the filter's value is used instead,
+        and without startSonar() only one ping is taken.
         '''
+        sonarFilter = self._sonarFilter
+        if self._sonarInterval:
+            if (not self._sonarCount and not self._sonarMisses
+                    and (sonarFilter is None or sonarFilter.value is None)):
+                self.sampleSonar()
+            if sonarFilter:
+                return 0.00 if sonarFilter.value is None else sonarFilter.value
+            return self._sonarLatest()
+        if sonarFilter:
+            distance = sonarFilter.update(self._ping())
+            return 0.00 if distance is None else distance
         timeoutCount = 0
         data = []
         while len(data) < 3:
-            try:
-                data.append(self._sonar.distance)
-            except RuntimeError:
+            distance = self._ping()
+            if distance is not None:
+                data.append(distance)
+            else:
                 #print("*** SONAR ERROR ***")
                 timeoutCount += 1
                 if timeoutCount > 8:
-                    print("SONAR: CONNECTION ERROR")
-                    return 0.00
-            time.sleep(0.025)
+                    return self._sonarLost()
+            self._sleep(0.025)
         distance = sum(data) - min(data) - max(data)
         return distance
 
+    def startSonar(self, interval=0.06, size=16):
+        '''
+        Samples the sonar in the background, one ping at a time, from update() or an
+        asyncio task. cutebot.sonar then returns right away. The ping itself still
+        waits for its echo: update() can take up to the 30 ms ping timeout when it
+        takes a sample and nothing is in range.
+
+        interval (float) = seconds between pings (the HC-SR04 needs about 0.06)
+        size (integer) = how many timestamped samples to keep for sonarHistory()
+
+        example:
+            cutebot.startSonar()
+            while True:
+                cutebot.update()
+                if cutebot.sonar < 20 and cutebot.sonarApproach > 10:
+                    cutebot.motorsOff()
+        '''
+        size = max(int(size), 3)
+        if size != self._sonarSize:
+            self._sonarTimes = array('f', [0.0] * size)
+            self._sonarDistances = array('f', [0.0] * size)
+            self._sonarSize = size
+        self._sonarIndex = 0
+        self._sonarCount = 0
+        self._sonarMisses = 0
+        self._sonarDue = 0.0
+        self._sonarEpoch = self._clock()
+        self._sonarInterval = max(interval, 0.01)
+
+    def stopSonar(self):
+        '''
+        Stops background sampling. cutebot.sonar goes back to taking its own samples.
+        '''
+        self._sonarInterval = 0
+
+    def sampleSonar(self):
+        '''
+        Takes one sonar ping and adds it to the ring buffer. update() calls this for you.
+
+        Output: True if a distance was recorded, False if the ping timed out
+        '''
+        now = self._clock()
+        self._sonarDue = now + self._sonarInterval
+        distance = self._ping()
+        if distance is None:
+            if self._sonarFilter:
+                self._sonarFilter.update(None)
+            self._sonarMisses += 1
+            if self._sonarMisses >= self._sonarMissLimit:
+                self._sonarCount = 0        # The object is gone: forget where it was
+            return False
+        self._sonarMisses = 0
+        if self._sonarFilter:
+            self._sonarFilter.update(distance)
+        if self._sonarSize:
+            i = self._sonarIndex
+            self._sonarTimes[i] = now - self._sonarEpoch
+            self._sonarDistances[i] = distance
+            self._sonarIndex = (i + 1) % self._sonarSize
+            self._sonarCount = min(self._sonarCount + 1, self._sonarSize)
+        return True
+
+    def sonarHistory(self):
+        '''
+        Output: list of (timestamp in seconds on the Cutebot's clock, distance in cm),
+        oldest first
+        '''
+        history = []
+        start = self._sonarIndex - self._sonarCount
+        for n in range(self._sonarCount):
+            i = (start + n) % self._sonarSize
+            history.append((self._sonarEpoch + self._sonarTimes[i], self._sonarDistances[i]))
+        return history
+
+    @property
+    def sonarApproach(self):
+        '''
+        Output: how fast the object in front is getting closer, in cm per second
+        (negative when it moves away). Fitted over every sample in the ring buffer.
+        '''
+        count = self._sonarCount
+        if count < 2:
+            return 0.0
+        start = self._sonarIndex - count
+        t0 = self._sonarTimes[start % self._sonarSize]
+        st = sd = stt = std = 0.0
+        for n in range(count):
+            i = (start + n) % self._sonarSize
+            t = self._sonarTimes[i] - t0
+            d = self._sonarDistances[i]
+            st += t
+            sd += d
+            stt += t * t
+            std += t * d
+        spread = count * stt - st * st
+        if spread <= 0:
+            return 0.0
+        return -(count * std - st * sd) / spread
+
+    def _ping(self):
+        # One sonar ping. Output: the distance, or None if it timed out
+        stats = self._stats
+        if stats:
+            start = self._clock()
+        try:
+            distance = self._sonar.distance
+        except RuntimeError:
+            self.sonarTimeouts += 1
+            if stats:
+                stats.ping(self._clock() - start, False)
+            return None
+        if stats:
+            stats.ping(self._clock() - start, True)
+        return distance
+
+    def _sonarLost(self):
+        # Too many pings in a row timed out (shared with AsyncCutebot.sonar())
+        print("SONAR: CONNECTION ERROR")
+        return 0.00
+
+    def _sonarLatest(self):
+        # Median of the newest three samples, without allocating
+        count = self._sonarCount
+        if not count:
+            return 0.00
+        size = self._sonarSize
+        i = self._sonarIndex
+        a = self._sonarDistances[(i - 1) % size]
+        if count < 3:
+            return a
+        b = self._sonarDistances[(i - 2) % size]
+        c = self._sonarDistances[(i - 3) % size]
+        return max(min(a, b), min(max(a, b), c))
+
     @property
     def tracking(self):
         '''
@@ -402,7 +1109,35 @@ class Cutebot:
         True = I see black
         False = I see white
         '''
+        if self._trackingMonitor:
+            return self._trackingMonitor.tracking
         return not self._leftLineTracking.value, not self._rightLineTracking.value
 
 
-cutebot = Cutebot()
\ No newline at end of file
+# The shared Cutebot, made the first time it is asked for. Importing this module does
+# not touch the hardware, so a program can make its own Cutebot(backend=...) instead.
+_shared = None
+
+
+def getCutebot():
+    '''
+    Output: the shared Cutebot on the CLUE, made (and reset) on the first call
+
+    Without CircuitPython's board module (on a computer) this raises ImportError;
+    make a Cutebot(backend=...) there instead.
+
+    example:
+        from jisforjt_cutebot_clue import getCutebot
+        cutebot = getCutebot()
+    '''
+    global _shared
+    if _shared is None:
+        _shared = Cutebot()
+    return _shared
+
+
+def __getattr__(name):
+    # Keeps "from jisforjt_cutebot_clue import cutebot" working: it is getCutebot()
+    if name == 'cutebot':
+        return getCutebot()
+    raise AttributeError(name)
@@ -0,0 +1,301 @@
+# CircuitPython Clue Cutebot - light animations
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Fading, blinking, pulsing and rainbow effects for the Cutebot's two NeoPixels
+(PixelAnimator) and two headlights (HeadlightAnimator) that run while the robot
+does other things. Start an effect, then call update() in your loop (or run run()
+as an asyncio task). Each update works out the colors for the current time and
+sends them only when something visible changed. Nothing is allocated per frame.
+
+whichLight works like cutebot.pixels() and cutebot.headlights(): 1, 2 or 3 = both.
+Colors are [red, green, blue] lists or packed 0xRRGGBB integers.
+
+example:
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_effects import PixelAnimator, HeadlightAnimator
+
+    lights = PixelAnimator(cutebot)
+    lights.blink(1, [255, 128, 0], period=0.5)     # left pixel blinks orange
+    lights.rainbow(2, period=3)                     # right pixel cycles the rainbow
+    headlights = HeadlightAnimator(cutebot)
+    headlights.fade(3, [255, 255, 255], duration=2)
+    cutebot.blocking = False
+    while True:
+        cutebot.motors(20, 20)
+        lights.update()
+        headlights.update()                         # also sends the motor frames
+'''
+
+######################################################
+#   Import
+######################################################
+from array import array
+
+
+######################################################
+#   Colors
+######################################################
+OFF = 0
+SOLID = 1
+BLINK = 2
+PULSE = 3
+RAINBOW = 4
+FADE = 5
+
+
+def packColor(color):
+    '''
+    Output: color as a packed 0xRRGGBB integer
+    '''
+    if isinstance(color, int):
+        return color & 0xFFFFFF
+    red, green, blue = color
+    r = int(min(max(red, 0), 255))
+    g = int(min(max(green, 0), 255))
+    b = int(min(max(blue, 0), 255))
+    return (r << 16) | (g << 8) | b
+
+
+def scaleColor(color, level):
+    '''
+    Output: packed color with every channel multiplied by level / 255
+    '''
+    return ((((color >> 16) & 0xFF) * level // 255) << 16
+            | (((color >> 8) & 0xFF) * level // 255) << 8
+            | (color & 0xFF) * level // 255)
+
+
+def mixColors(start, end, level):
+    '''
+    Output: packed color level / 255 of the way from start to end
+    '''
+    result = 0
+    for shift in (16, 8, 0):
+        a = (start >> shift) & 0xFF
+        b = (end >> shift) & 0xFF
+        result |= (a + (b - a) * level // 255) << shift
+    return result
+
+
+def wheel(position):
+    '''
+    position (integer) = place on the color wheel, 0 to 255
+
+    Output: packed color going red, green, blue and back to red
+    '''
+    position &= 0xFF
+    if position < 85:
+        return ((255 - position * 3) << 16) | ((position * 3) << 8)
+    if position < 170:
+        position -= 85
+        return ((255 - position * 3) << 8) | (position * 3)
+    position -= 170
+    return ((position * 3) << 16) | (255 - position * 3)
+
+
+######################################################
+#   Animators
+######################################################
+class _Animator:
+    # Effect state for two lights. Subclasses send the colors in _write().
+
+    def __init__(self, bot, rate):
+        self.bot = bot
+        self.period = 1 / rate
+        self._clock = bot._clock
+        self._mode = bytearray(2)
+        self._color = array('L', [0, 0])
+        self._from = array('L', [0, 0])         # Fade start color
+        self._shown = array('L', [0, 0])        # Color of the last frame
+        self._effectPeriod = array('f', [1.0, 1.0])
+        self._duty = array('f', [0.5, 0.5])
+        self._start = [0.0, 0.0]                # Clock times, kept at full precision
+        self._due = 0.0
+        self.frames = 0
+
+    def _set(self, whichLight, mode, color, period, duty):
+        now = self._clock()
+        for index in (0, 1):
+            if whichLight == 3 or whichLight == index + 1:
+                self._mode[index] = mode
+                self._from[index] = self._shown[index]
+                self._color[index] = packColor(color)
+                self._effectPeriod[index] = max(period, 0.02)
+                self._duty[index] = duty
+                self._start[index] = now
+        self._due = 0.0         # Show the change on the next update()
+
+    def solid(self, whichLight, color):
+        self._set(whichLight, SOLID, color, 1.0, 1.0)
+
+    def fade(self, whichLight, color, duration=1.0):
+        '''
+        Changes smoothly from the current color to color over duration seconds.
+        '''
+        self._set(whichLight, FADE, color, duration, 1.0)
+
+    def blink(self, whichLight, color, period=0.5, duty=0.5):
+        '''
+        period (float) = seconds for one on and off cycle
+        duty (float) = part of the period the light is on
+        '''
+        self._set(whichLight, BLINK, color, period, duty)
+
+    def pulse(self, whichLight, color, period=1.0):
+        '''
+        Fades up and down once per period seconds.
+        '''
+        self._set(whichLight, PULSE, color, period, 0.5)
+
+    def rainbow(self, whichLight, period=2.0, brightness=255):
+        '''
+        Goes around the color wheel once per period seconds. With both lights the
+        right one is half way around from the left one.
+        '''
+        self._set(whichLight, RAINBOW, (brightness, brightness, brightness), period, 0.5)
+        if whichLight == 3:
+            self._start[1] -= period / 2
+
+    def off(self, whichLight=3):
+        self._set(whichLight, OFF, 0, 1.0, 0.5)
+
+    def update(self):
+        '''
+        Sends the next frame if it is time. Call this every loop.
+        '''
+        now = self._clock()
+        if now < self._due:
+            return
+        self._due = now + self.period
+        self.frames += 1
+        left = self._frame(0, now)
+        right = self._frame(1, now)
+        self._shown[0] = left
+        self._shown[1] = right
+        self._write(left, right)
+
+    def nextDue(self):
+        return max(self._due - self._clock(), 0)
+
+    async def run(self):
+        '''
+        asyncio task that keeps the animation going.
+        '''
+        import asyncio
+        while True:
+            self.update()
+            await asyncio.sleep(self.nextDue())
+
+    def _frame(self, index, now):
+        mode = self._mode[index]
+        color = self._color[index]
+        if mode == SOLID:
+            return color
+        if mode == OFF:
+            return 0
+        period = self._effectPeriod[index]
+        if mode == FADE:
+            level = (now - self._start[index]) / period
+            if level >= 1:
+                self._mode[index] = SOLID
+                return color
+            return mixColors(self._from[index], color, int(level * 255))
+        phase = ((now - self._start[index]) % period) / period
+        if mode == BLINK:
+            return color if phase < self._duty[index] else 0
+        if mode == PULSE:
+            level = phase * 2 if phase < 0.5 else 2 - phase * 2
+            return scaleColor(color, int(level * 255))
+        return scaleColor(wheel(int(phase * 256)), color & 0xFF)
+
+
+class PixelAnimator(_Animator):
+    '''
+    Animates the two NeoPixels. Both pixels go out in one show(), only when one of
+    them changed.
+
+    bot = the Cutebot whose NeoPixels to animate
+    rate (float) = most frames per second
+    '''
+
+    def __init__(self, bot, rate=30):
+        _Animator.__init__(self, bot, rate)
+
+    def _write(self, left, right):
+        self.bot._writePixels(left, right)
+
+
+class HeadlightAnimator(_Animator):
+    '''
+    Animates the two headlights over the I2C bus. Colors are rounded to levels steps
+    per channel and a frame is only queued when a rounded color changes, so a slow
+    fade costs a few frames instead of one per update. Frames go through the
+    Cutebot's command pipeline behind any motor frame: while a motor frame is
+    waiting, the headlight frame is skipped and the next one is sent instead.
+
+    bot = the Cutebot whose headlights to animate
+    rate (float) = most frames per second
+    levels (integer) = brightness steps per channel (2 to 256)
+
+    whichLight 1 and 2 are the same lights as in cutebot.headlights().
+    '''
+
+    def __init__(self, bot, rate=20, levels=32):
+        _Animator.__init__(self, bot, rate)
+        self.levels = min(max(int(levels), 2), 256)
+        self._sent = array('l', [-1, -1])       # Rounded color last queued
+        self.deferred = 0                       # Frames skipped for a motor frame
+        self.skipped = 0                        # Frames that changed nothing visible
+
+    def _write(self, left, right):
+        bot = self.bot
+        if bot._motionPending():
+            self.deferred += 1
+            bot.update()
+            return
+        left = self._round(left)
+        right = self._round(right)
+        if left == self._sent[0] and right == self._sent[1]:
+            self.skipped += 1
+        else:
+            if left != self._sent[0]:
+                bot._stageHeadlights(1, left >> 16, (left >> 8) & 0xFF, left & 0xFF)
+                self._sent[0] = left
+            if right != self._sent[1]:
+                bot._stageHeadlights(2, right >> 16, (right >> 8) & 0xFF, right & 0xFF)
+                self._sent[1] = right
+        bot.update()
+
+    def _round(self, color):
+        steps = self.levels - 1
+        if steps == 255:
+            return color
+        r = (((color >> 16) & 0xFF) * steps + 127) // 255 * 255 // steps
+        g = (((color >> 8) & 0xFF) * steps + 127) // 255 * 255 // steps
+        b = ((color & 0xFF) * steps + 127) // 255 * 255 // steps
+        return (r << 16) | (g << 8) | b
@@ -0,0 +1,256 @@
+# CircuitPython Clue Cutebot - streaming sensor filters
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Small filters for noisy sensor readings. Each filter takes one reading at a time
+with update() and returns the filtered value. Windows are allocated once when the
+filter is made, so updating never allocates and every update costs the same.
+
+A reading of None means the sensor gave no answer (a sonar timeout). Filters skip
+it and return their last value, except RangeClamp, which treats it as "nothing in
+range".
+
+Attach a filter (or a FilterChain) to the Cutebot's sonar, p1 or p2:
+
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_filters import FilterChain, RangeClamp, HampelFilter, EMAFilter
+
+    cutebot.attachFilter('sonar', FilterChain(RangeClamp(2, 400), HampelFilter(5), EMAFilter(0.5)))
+    distance = cutebot.sonar        # one ping, filtered
+
+    More smoothing (bigger windows, smaller alpha) means less noise but more lag.
+'''
+
+######################################################
+#   Import
+######################################################
+from array import array
+
+
+######################################################
+#   Filters
+######################################################
+class MedianFilter:
+    '''
+    Median of the last size readings. Good at removing single bad readings.
+
+    size (integer) = how many readings to take the median of (odd numbers work best)
+    '''
+
+    def __init__(self, size=3):
+        self._size = max(int(size), 1)
+        self._ring = array('f', [0.0] * self._size)     # Readings in arrival order
+        self._sorted = array('f', [0.0] * self._size)   # The same readings, sorted
+        self.reset()
+
+    def reset(self):
+        self._index = 0
+        self._count = 0
+        self.value = None
+
+    def update(self, reading):
+        if reading is None:
+            return self.value
+        ring = self._ring
+        ordered = self._sorted
+        count = self._count
+        if count == self._size:
+            # Remove the oldest reading from the sorted window
+            old = ring[self._index]
+            i = 0
+            while ordered[i] != old:
+                i += 1
+            while i < count - 1:
+                ordered[i] = ordered[i + 1]
+                i += 1
+            count -= 1
+        # Insert the new reading into the sorted window
+        i = count
+        while i > 0 and ordered[i - 1] > reading:
+            ordered[i] = ordered[i - 1]
+            i -= 1
+        ordered[i] = reading
+        count += 1
+        ring[self._index] = reading
+        self._index = (self._index + 1) % self._size
+        self._count = count
+        if count & 1:
+            self.value = ordered[count // 2]
+        else:
+            self.value = (ordered[count // 2 - 1] + ordered[count // 2]) / 2
+        return self.value
+
+    @property
+    def count(self):
+        '''
+        Output: how many readings are in the window (up to size)
+        '''
+        return self._count
+
+    def sortedReadings(self):
+        '''
+        Output: the readings in the window, smallest first. The array is reused: only
+        the first count entries are readings, and the next update() changes it.
+        '''
+        return self._sorted
+
+
+class EMAFilter:
+    '''
+    Exponential moving average. Smooths noise with one multiply per reading.
+
+    alpha (float) = weight of the newest reading, between 0 and 1
+        1.0 = no smoothing, 0.1 = heavy smoothing
+    '''
+
+    def __init__(self, alpha=0.5):
+        self.alpha = min(max(alpha, 0.0), 1.0)
+        self.reset()
+
+    def reset(self):
+        self.value = None
+
+    def update(self, reading):
+        if reading is None:
+            return self.value
+        if self.value is None:
+            self.value = reading
+        else:
+            self.value += self.alpha * (reading - self.value)
+        return self.value
+
+
+class HampelFilter:
+    '''
+    Replaces readings that are far from the recent median with that median. Good at
+    removing spikes without smoothing real changes.
+
+    size (integer) = how many readings the median is taken over
+    threshold (float) = how many scaled median absolute deviations count as an outlier
+    '''
+
+    def __init__(self, size=5, threshold=3.0):
+        self.threshold = threshold
+        self._median = MedianFilter(size)
+        self.outliers = 0
+        self.reset()
+
+    def reset(self):
+        self._median.reset()
+        self.value = None
+
+    def update(self, reading):
+        if reading is None:
+            return self.value
+        median = self._median
+        center = median.value
+        count = median.count
+        if count >= 3:
+            mad = 1.4826 * self._medianDeviation(median.sortedReadings(), count, center)
+            if abs(reading - center) > self.threshold * mad:
+                self.outliers += 1
+                median.update(reading)
+                self.value = center
+                return center
+        self.value = reading
+        median.update(reading)
+        return reading
+
+    def _medianDeviation(self, ordered, count, center):
+        # The window is sorted and center is its median, so the distances from center
+        # grow walking outward from the middle: merge the two sides, smallest first,
+        # and stop at the middle one (index count // 2). For an even count the median
+        # is the average of that one and the one before it, like MedianFilter's.
+        below = (count - 1) // 2
+        above = below + 1
+        deviation = 0
+        for i in range(count // 2 + 1):
+            previous = deviation
+            if above >= count or (below >= 0
+                                  and center - ordered[below] <= ordered[above] - center):
+                deviation = center - ordered[below]
+                below -= 1
+            else:
+                deviation = ordered[above] - center
+                above += 1
+        if count & 1:
+            return deviation
+        return (previous + deviation) / 2
+
+
+class RangeClamp:
+    '''
+    Keeps readings inside the range the sensor can really measure.
+
+    minimum (float) = smallest believable reading
+    maximum (float) = largest believable reading
+
+    Readings above maximum, missing readings (None) and readings of 0 or less are
+    reported as maximum. For the sonar that means "nothing in range" instead of
+    "something touching the robot". Readings between 0 and minimum become minimum.
+    '''
+
+    def __init__(self, minimum=2.0, maximum=400.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.reset()
+
+    def reset(self):
+        self.value = None
+
+    def update(self, reading):
+        if reading is None or reading <= 0 or reading > self.maximum:
+            self.value = self.maximum
+        elif reading < self.minimum:
+            self.value = self.minimum
+        else:
+            self.value = reading
+        return self.value
+
+
+class FilterChain:
+    '''
+    Runs a reading through several filters in order.
+
+    example:
+        FilterChain(RangeClamp(2, 400), MedianFilter(5), EMAFilter(0.3))
+    '''
+
+    def __init__(self, *filters):
+        self.filters = filters
+        self.reset()
+
+    def reset(self):
+        for sensorFilter in self.filters:
+            sensorFilter.reset()
+        self.value = None
+
+    def update(self, reading):
+        for sensorFilter in self.filters:
+            reading = sensorFilter.update(reading)
+        self.value = reading
+        return reading
@@ -0,0 +1,259 @@
+# CircuitPython Clue Cutebot - non-blocking IR remote receiver
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Reads an NEC infrared remote (most TV and kit remotes) on the Cutebot's IR receiver
+(P16) without stopping the program. adafruit_irremote's read_pulses() waits until a
+whole signal has arrived; IRReceiver instead takes whatever pulses have come in
+since the last update() and decodes them a pulse at a time, so it can be called
+from a fast control loop.
+
+Button codes are looked up in a dictionary, so adding buttons costs nothing per
+update. The codes can be kept in a small JSON file on CIRCUITPY:
+
+    ir_keys.json:   {"UP": [255, 8, 79, 176], "DOWN": [255, 8, 87, 168]}
+
+Holding a button makes the remote send short repeat signals instead of the whole
+code again. These are recognized on their own, so a held button is cheap and
+ir.held stays set until the repeats stop.
+
+example:
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_ir import IRReceiver, loadKeys
+
+    ir = IRReceiver(cutebot, loadKeys('ir_keys.json'))
+    cutebot.blocking = False
+    while True:
+        pressed = ir.update()           # 'UP', 'DOWN', ... once per press, else None
+        if ir.held == 'UP':             # Drive only while the button is held
+            cutebot.motors(30, 30)
+        else:
+            cutebot.motorsOff()
+        if ir.unknown is not None:
+            print("I don't know:", ir.unknown)
+            ir.unknown = None
+        cutebot.update()
+
+A code is four numbers, in the same order adafruit_irremote's GenericDecode gives
+them (so codes written down with cutebot_IR_remote.py still work), or the same
+four bytes packed into one integer.
+'''
+
+######################################################
+#   Import
+######################################################
+from array import array
+
+
+######################################################
+#   Codes
+######################################################
+def packCode(code):
+    '''
+    code = four numbers such as (255, 8, 79, 176), or an integer
+
+    Output: the code as one integer, the way IRReceiver stores it
+    '''
+    if isinstance(code, int):
+        return code & 0xFFFFFFFF
+    a, b, c, d = code
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+def unpackCode(code):
+    '''
+    Output: the four numbers of a packed code
+    '''
+    return ((code >> 24) & 0xFF, (code >> 16) & 0xFF, (code >> 8) & 0xFF, code & 0xFF)
+
+
+def loadKeys(path):
+    '''
+    Reads button names and codes from a JSON file: {"NAME": [a, b, c, d], ...}
+
+    Output: dictionary of packed code -> name, for IRReceiver
+    '''
+    import json
+    with open(path) as file:
+        names = json.load(file)
+    keys = {}
+    for name in names:
+        keys[packCode(names[name])] = name
+    return keys
+
+
+######################################################
+#   Receiver
+######################################################
+# Decoder states
+_IDLE = 0           # Waiting for a 9 ms leader mark
+_LEADER = 1         # Leader mark seen, the space says code or repeat
+_MARK = 2           # Waiting for the mark before a bit
+_SPACE = 3          # The space length is the bit
+_REPEAT = 4         # Repeat leader seen, waiting for its closing mark
+
+
+class IRReceiver:
+
+    def __init__(self, bot, keys=None, pin='D16', maxlen=120, releaseTime=0.15):
+        '''
+        bot = the Cutebot (its backend makes the PulseIn, its clock times the repeats)
+        keys = dictionary of code -> action (anything: a name, a function, ...).
+            Codes may be four numbers or packed integers, see loadKeys().
+        pin (string) = the IR receiver pin
+        maxlen (integer) = pulses PulseIn keeps between updates (an NEC code is 68)
+        releaseTime (float) = a held button counts as released this long after its
+            last repeat (remotes repeat every 108 ms)
+        '''
+        self._clock = bot._clock
+        self.pulses = bot._backend.pulseIn(pin, maxlen)
+        self.keys = {}
+        if keys:
+            for code in keys:
+                self.keys[packCode(code)] = keys[code]
+        self.releaseTime = releaseTime
+        self.code = None            # Packed code of the last button received
+        self.unknown = None         # Last code that is not in keys (set it back to None)
+        self.repeats = 0            # Repeats of the held button so far
+        self.errors = 0             # Signals that did not decode
+        self._state = _IDLE
+        self._bits = 0
+        self._count = 0
+        self._action = None
+        self._heldUntil = -1.0
+        self._limits = array('H', [7000, 11000, 3500, 5500, 1700, 2800, 300, 900, 1200, 2200])
+
+    def addKey(self, code, action):
+        self.keys[packCode(code)] = action
+
+    @property
+    def held(self):
+        '''
+        Output: the action of the button being held down, None when none is
+        '''
+        if self._heldUntil < 0 or self._clock() > self._heldUntil:
+            return None
+        return self._action
+
+    def update(self):
+        '''
+        Decodes the pulses that have come in. Call this every loop.
+
+        Output: the action of a button that was just pressed (once per press),
+        otherwise None
+        '''
+        pulses = self.pulses
+        pressed = None
+        while len(pulses):
+            if self._pulse(pulses.popleft()):
+                pressed = self._action
+        return pressed
+
+    def clear(self):
+        '''
+        Throws away pulses not decoded yet and forgets the held button.
+        '''
+        self.pulses.clear()
+        self._state = _IDLE
+        self._heldUntil = -1.0
+
+    async def run(self, handler=None, period=0.02):
+        '''
+        asyncio task that keeps decoding. handler(action) is called for each press.
+        '''
+        import asyncio
+        while True:
+            pressed = self.update()
+            if pressed is not None and handler is not None:
+                handler(pressed)
+            await asyncio.sleep(period)
+
+    def _pulse(self, length):
+        # Moves the decoder along by one pulse. Returns True when a press completed.
+        limits = self._limits
+        state = self._state
+        if state == _MARK:
+            if limits[6] <= length <= limits[7]:
+                self._state = _SPACE
+                return False
+        elif state == _SPACE:
+            if limits[6] <= length <= limits[7]:
+                bit = 0
+            elif limits[8] <= length <= limits[9]:
+                bit = 1
+            else:
+                return self._error(length)
+            self._bits = (self._bits << 1) | bit
+            self._count += 1
+            if self._count < 32:
+                self._state = _MARK
+                return False
+            self._state = _IDLE
+            return self._received(self._bits)
+        elif state == _LEADER:
+            if limits[2] <= length <= limits[3]:
+                self._state = _MARK
+                self._bits = 0
+                self._count = 0
+                return False
+            if limits[4] <= length <= limits[5]:
+                self._state = _REPEAT
+                return False
+        elif state == _REPEAT:
+            if limits[6] <= length <= limits[7]:
+                self._state = _IDLE
+                self._repeat()
+                return False
+        else:
+            if limits[0] <= length <= limits[1]:
+                self._state = _LEADER
+            return False        # Gaps and noise between signals are ignored
+        return self._error(length)
+
+    def _error(self, length):
+        # A pulse that does not fit: start over, it may be the next leader
+        self.errors += 1
+        self._state = _IDLE
+        return self._pulse(length)
+
+    def _received(self, code):
+        self.code = code
+        self.repeats = 0
+        action = self.keys.get(code)
+        if action is None:
+            self.unknown = code
+            self._heldUntil = -1.0
+            return False
+        self._action = action
+        self._heldUntil = self._clock() + self.releaseTime
+        return True
+
+    def _repeat(self):
+        # Only counts if the button before it is still held
+        if self._heldUntil >= 0 and self._clock() <= self._heldUntil:
+            self.repeats += 1
+            self._heldUntil = self._clock() + self.releaseTime
@@ -0,0 +1,194 @@
+# CircuitPython Clue Cutebot - line following controller
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+A line following controller that runs at a fixed rate (100 times a second by
+default) with PD steering.
+
+The two line sensors give the error:
+     0 = both sensors see the line, go straight
+    -1 = only the left sensor sees it, steer left
+    +1 = only the right sensor sees it, steer right
+    -2/+2 = line lost, spin towards the side it was last seen on
+
+The motors get speed + steer on the left and speed - steer on the right, where
+steer = kp * error + kd * (change in error per second).
+
+example:
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_linefollower import LineFollower
+
+    follower = LineFollower(cutebot, speed=25)
+    follower.run(stop=lambda: clue.button_a)
+    print(follower.stats())
+'''
+
+
+class LineFollower:
+
+    def __init__(self, bot, speed=20, rate=100, kp=20, kd=0.5, lostGain=2,
+                 monitor=None, clock=None, sleep=None):
+        '''
+        bot = the Cutebot to drive (switched to its non-blocking pipeline)
+        speed (integer) = forward speed when the line is straight ahead (0 to 100)
+        rate (float) = control loop updates per second
+        kp (float) = steering per unit of error
+        kd (float) = steering per unit of error change per second
+        lostGain (float) = error used when the line is lost (spins harder than a turn)
+        monitor = optional TrackingMonitor to read the sensors from
+        clock, sleep = time functions (default to the Cutebot backend's)
+        '''
+        self.bot = bot
+        self.speed = speed
+        self.period = 1 / rate
+        self.kp = kp
+        self.kd = kd
+        self.lostGain = lostGain
+        self.monitor = monitor
+        self.clock = clock or bot._clock
+        self.sleep = sleep or bot._sleep
+        bot.blocking = False
+        self.reset()
+
+    def reset(self):
+        '''
+        Forgets the line's last position and clears the statistics.
+        '''
+        self.lastSide = -1          # -1 = line last seen on the left, +1 = right
+        self.lostSince = None       # clock() time the line was lost, None if on the line
+        self.lineLosses = 0
+        self._lastError = 0
+        self._lastTime = None
+        self.iterations = 0
+        self.overruns = 0           # Iterations that ran past the next deadline
+        self.jitterMax = 0.0        # Worst lateness of an iteration start, in seconds
+        self._jitterTotal = 0.0
+
+
+    ######################################################
+    #   Control
+    ######################################################
+    def error(self, left, right):
+        '''
+        Output: steering error for a sensor reading (see Information above)
+        '''
+        if left and right:
+            return 0
+        if right:
+            self.lastSide = 1
+            return 1
+        if left:
+            self.lastSide = -1
+            return -1
+        return self.lastSide * self.lostGain
+
+    def step(self):
+        '''
+        Runs one control update: read the sensors, compute the steering and set the
+        motors. run() calls this at the fixed rate; call it yourself for your own loop.
+
+        Output: the left and right motor speeds that were set
+        '''
+        now = self.clock()
+        if self.monitor:
+            self.monitor.poll()
+            left, right = self.monitor.tracking
+        else:
+            left, right = self.bot.tracking
+        error = self.error(left, right)
+        if not left and not right:
+            if self.lostSince is None:
+                self.lostSince = now
+                self.lineLosses += 1
+        else:
+            self.lostSince = None
+        if self._lastTime is None or now <= self._lastTime:
+            derivative = 0
+        else:
+            derivative = (error - self._lastError) / (now - self._lastTime)
+        self._lastError = error
+        self._lastTime = now
+        steer = self.kp * error + self.kd * derivative
+        speed = self.speed
+        if abs(error) > 1:
+            speed = 0               # Line lost: spin in place
+        leftSpeed = min(max(speed + steer, -100), 100)
+        rightSpeed = min(max(speed - steer, -100), 100)
+        self.bot.motors(leftSpeed, rightSpeed)
+        self.bot.update()
+        return leftSpeed, rightSpeed
+
+    def run(self, duration=None, stop=None):
+        '''
+        Follows the line at the fixed rate.
+
+        duration (float) = seconds to run, None to run until stop() returns True
+        stop = function called every iteration, return True to stop
+
+        Each iteration is scheduled from a deadline, not from the end of the last one,
+        so the rate does not drift. An iteration that runs past the next deadline is
+        an overrun; if a whole period was missed the schedule skips ahead.
+        '''
+        clock = self.clock
+        period = self.period
+        start = clock()
+        deadline = start
+        while True:
+            now = clock()
+            if duration is not None and now - start >= duration:
+                break
+            if stop is not None and stop():
+                break
+            late = now - deadline
+            if late > 0:
+                self._jitterTotal += late
+                self.jitterMax = max(self.jitterMax, late)
+            self.step()
+            self.iterations += 1
+            deadline += period
+            wait = deadline - clock()
+            if wait > 0:
+                self.sleep(wait)
+            elif wait < 0:
+                self.overruns += 1
+                if wait < -period:
+                    deadline = clock()      # Too far behind to catch up
+        self.bot.motorsOff()
+        self.bot.flush()
+
+    def stats(self):
+        '''
+        Output: dictionary with iterations, overruns, jitterMax and jitterMean (seconds)
+        and lineLosses
+        '''
+        return {
+            'iterations': self.iterations,
+            'overruns': self.overruns,
+            'jitterMax': self.jitterMax,
+            'jitterMean': self._jitterTotal / self.iterations if self.iterations else 0.0,
+            'lineLosses': self.lineLosses,
+        }
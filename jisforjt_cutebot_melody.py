@@ -0,0 +1,233 @@
+# CircuitPython Clue Cutebot - non-blocking melody player
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Plays tunes on the Cutebot's buzzer while the robot keeps driving. Unlike
+cutebot.playTone(), nothing waits: call update() in your loop (or run run() as an
+asyncio task) and it changes notes when it is time.
+
+Melodies are compiled once into a compact array of (frequency, milliseconds) pairs,
+so playing them never allocates.
+
+example:
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_melody import MelodyPlayer, compileMelody
+
+    countdown = compileMelody([('G6', 0.25), ('F6', 0.25), ('E6', 0.25), ('D6', 0.25),
+                               ('C6', 0.5)])
+    siren = compileMelody([(880, 0.3), (660, 0.3)])
+
+    player = MelodyPlayer(cutebot)
+    player.play(countdown)              # starts right away
+    player.queue(siren, loop=True)      # then the siren, over and over
+    while True:
+        player.update()
+        cutebot.motors(20, 20)
+        if cutebot.sonar < 10:
+            player.stop()
+
+A note is a frequency in Hz or a name from C0 to B8 ('C4', 'F#5', 'Bb3').
+0, None or 'R' is a rest.
+'''
+
+######################################################
+#   Import
+######################################################
+from array import array
+
+
+######################################################
+#   Melodies
+######################################################
+_SEMITONES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+
+
+def noteFrequency(note):
+    '''
+    note = frequency in Hz, or a note name such as 'A4', 'C#5' or 'Eb3'
+
+    Output: the frequency in Hz (integer), 0 for a rest
+    '''
+    if note is None or note == 'R':
+        return 0
+    if not isinstance(note, str):
+        return int(note + 0.5)
+    semitone = _SEMITONES[note[0].upper()]
+    octave = note[1:]
+    if octave[0] == '#':
+        semitone += 1
+        octave = octave[1:]
+    elif octave[0] == 'b':
+        semitone -= 1
+        octave = octave[1:]
+    midi = 12 * (int(octave) + 1) + semitone
+    return int(440 * 2 ** ((midi - 69) / 12) + 0.5)
+
+
+def compileMelody(notes):
+    '''
+    notes = list of (note, seconds)
+
+    Output: array of frequency, milliseconds pairs for MelodyPlayer
+    '''
+    melody = array('H')
+    for note, seconds in notes:
+        melody.append(noteFrequency(note))
+        melody.append(min(int(seconds * 1000 + 0.5), 65535))
+    return melody
+
+
+######################################################
+#   Player
+######################################################
+class MelodyPlayer:
+
+    def __init__(self, bot, gap=0.01, volume=2**15):
+        '''
+        bot = the Cutebot whose buzzer plays the notes
+        gap (float) = silence at the end of every note, so repeated notes are heard
+        volume (integer) = buzzer duty cycle while a note plays (0 to 65535)
+        '''
+        self.bot = bot
+        self.gap = gap
+        self.volume = volume
+        self._clock = bot._clock
+        self._queue = []            # (melody, loop) waiting to play after this one
+        self._melody = None
+        self._loop = False
+        self._index = 0             # Next pair to play
+        self._noteEnd = 0.0         # clock() time the current note (and gap) ends
+        self._soundEnd = 0.0        # clock() time the current note goes quiet
+        self._sounding = False
+
+    def play(self, melody, loop=False):
+        '''
+        Stops whatever is playing, clears the queue and starts melody now.
+
+        loop (boolean) = start again from the beginning when it ends
+        '''
+        self._queue = []
+        self._start(melody, loop)
+
+    def queue(self, melody, loop=False):
+        '''
+        Plays melody after the current one (and anything already queued). A looping
+        melody keeps playing until stop() or play().
+        '''
+        if self._melody is None:
+            self._start(melody, loop)
+        else:
+            self._queue.append((melody, loop))
+
+    def stop(self):
+        '''
+        Silences the buzzer and forgets the current melody and the queue.
+        '''
+        self._queue = []
+        self._melody = None
+        self._quiet()
+
+    @property
+    def playing(self):
+        '''
+        Output: True while a melody is playing
+        '''
+        return self._melody is not None
+
+    def update(self):
+        '''
+        Changes the note when it is time. Call this every loop.
+
+        Output: True while a melody is playing
+        '''
+        if self._melody is None:
+            return False
+        now = self._clock()
+        if self._sounding and now >= self._soundEnd:
+            self._quiet()
+        if now >= self._noteEnd:
+            self._next(now)
+        return self._melody is not None
+
+    def nextDue(self):
+        '''
+        Output: seconds until update() has something to do
+        '''
+        if self._melody is None:
+            return 1.0
+        due = self._soundEnd if self._sounding else self._noteEnd
+        return max(due - self._clock(), 0)
+
+    async def run(self):
+        '''
+        asyncio task that plays the notes on time.
+        '''
+        import asyncio
+        while True:
+            self.update()
+            await asyncio.sleep(min(self.nextDue(), 0.05))
+
+    def _start(self, melody, loop):
+        self._melody = melody
+        self._loop = loop
+        self._index = 0
+        self._noteEnd = self._clock()
+        self._next(self._noteEnd)
+
+    def _next(self, now):
+        melody = self._melody
+        while self._index >= len(melody):
+            if self._loop and len(melody):
+                self._index = 0
+            elif self._queue:
+                melody, self._loop = self._queue.pop(0)
+                self._melody = melody
+                self._index = 0
+            else:
+                self._melody = None
+                self._quiet()
+                return
+        frequency = melody[self._index]
+        seconds = melody[self._index + 1] / 1000
+        self._index += 2
+        # Notes follow each other from the planned end time, so the tempo does not
+        # drift when update() is called late
+        start = max(self._noteEnd, now - 0.05)
+        self._noteEnd = start + seconds
+        self._soundEnd = self._noteEnd - min(self.gap, seconds / 2)
+        if frequency:
+            buzzer = self.bot._buzzer
+            buzzer.frequency = frequency
+            buzzer.duty_cycle = self.volume
+            self._sounding = True
+        else:
+            self._quiet()
+
+    def _quiet(self):
+        if self._sounding:
+            self.bot._buzzer.duty_cycle = 0
+            self._sounding = False
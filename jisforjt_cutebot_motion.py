@@ -0,0 +1,362 @@
+# CircuitPython Clue Cutebot - smooth motor and servo motion
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Smooth starts and stops for the motors, and smooth servo moves. cutebot.motors()
+jumps straight to the new speed; MotorRamp gets there gradually, with limited
+acceleration, while the rest of the program keeps running.
+
+    acceleration only           trapezoid: speed changes at a steady rate
+    acceleration and jerk       S-curve: the acceleration itself builds up and
+                                dies down, for the gentlest ride
+
+Give it a target with motors() and call update() in your loop (or run run() as
+an asyncio task). At most rate updates a second are sent, and only when the whole
+number speed of a wheel changes, so a ramp costs a few frames instead of a loop of
+blocking motors() calls.
+
+example:
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_motion import MotorRamp
+
+    ramp = MotorRamp(cutebot, acceleration=100)     # 0 to 50 in half a second
+    ramp.motors(50, 50)
+    while not ramp.settled:
+        ramp.update()
+    ramp.motors(0, 0)                               # slows down just as smoothly
+
+ServoMotion moves the servos to a new angle over a set time with an easing
+curve, both servos in step, also without blocking:
+
+    arm = ServoMotion(cutebot)
+    arm.move(0, 180, duration=1.5)                  # S1 to 0 and S2 to 180 together
+    arm.moveTo(3, 90, duration=0.5)                 # then both back to the middle
+    while arm.moving:
+        arm.update()
+
+A frame is only sent when the whole number angle of a servo changes.
+
+The Cutebot is switched to its non-blocking pipeline.
+'''
+
+######################################################
+#   Import
+######################################################
+from array import array
+
+
+######################################################
+#   Motors
+######################################################
+class MotorRamp:
+
+    def __init__(self, bot, acceleration=200, jerk=None, rate=50):
+        '''
+        bot = the Cutebot to drive (switched to its non-blocking pipeline)
+        acceleration (float) = most speed change per second (speed is -100 to 100)
+        jerk (float) = most acceleration change per second, None for a trapezoid
+        rate (float) = most updates per second
+        '''
+        self.bot = bot
+        self.acceleration = acceleration
+        self.jerk = jerk
+        self.period = 1 / rate
+        self._clock = bot._clock
+        self._target = array('f', [0.0, 0.0])
+        self._speed = array('f', [0.0, 0.0])
+        self._accel = array('f', [0.0, 0.0])
+        self._last = self._clock()
+        self._due = 0.0
+        self.setpoints = 0          # Updates that changed a wheel's whole number speed
+        bot.blocking = False
+
+    def motors(self, leftSpeed, rightSpeed):
+        '''
+        Sets the speeds to ramp to (-100 to 100).
+        '''
+        if self.settled:
+            # Starting from rest: the first step happens on the next update()
+            self._last = self._clock() - self.period
+            self._due = 0.0
+        self._target[0] = min(max(leftSpeed, -100), 100)
+        self._target[1] = min(max(rightSpeed, -100), 100)
+
+    def stop(self):
+        '''
+        Ramps both wheels down to 0.
+        '''
+        self.motors(0, 0)
+
+    def stopNow(self):
+        '''
+        Stops both wheels right away, without a ramp.
+        '''
+        for i in (0, 1):
+            self._target[i] = 0.0
+            self._speed[i] = 0.0
+            self._accel[i] = 0.0
+        self.bot.motorsOff()
+        self.bot.flush()
+
+    @property
+    def speeds(self):
+        '''
+        Output: the left and right speeds the ramp is at now
+        '''
+        return self._speed[0], self._speed[1]
+
+    @property
+    def settled(self):
+        '''
+        Output: True when both wheels are at their target speed
+        '''
+        return (self._speed[0] == self._target[0] and self._speed[1] == self._target[1]
+                and self._accel[0] == 0 and self._accel[1] == 0)
+
+    def update(self):
+        '''
+        Moves the speeds towards their targets and sends them if it is time. Call
+        this every loop.
+
+        Output: True while still ramping
+        '''
+        now = self._clock()
+        if now < self._due:
+            self.bot.update()
+            return not self.settled
+        dt = min(now - self._last, 0.1)     # A long pause does not mean a jump
+        self._last = now
+        self._due = now + self.period
+        before0 = int(self._speed[0])
+        before1 = int(self._speed[1])
+        self._step(0, dt)
+        self._step(1, dt)
+        left = int(self._speed[0])
+        right = int(self._speed[1])
+        if left != before0 or right != before1:
+            self.setpoints += 1
+            self.bot._stageMotors(left, right)
+        self.bot.update()
+        return not self.settled
+
+    def nextDue(self):
+        return max(self._due - self._clock(), 0)
+
+    async def run(self):
+        '''
+        asyncio task that keeps ramping.
+        '''
+        import asyncio
+        while True:
+            self.update()
+            await asyncio.sleep(self.nextDue() if not self.settled else 0.02)
+
+    def _step(self, i, dt):
+        error = self._target[i] - self._speed[i]
+        if error == 0 and self._accel[i] == 0:
+            return
+        limit = self.acceleration
+        if self.jerk is None:
+            change = min(max(error, -limit * dt), limit * dt)
+            self._speed[i] += change
+            if change == error:
+                self._speed[i] = self._target[i]
+            return
+        # S-curve: the most acceleration that can still be brought back to 0 by the
+        # time the speed reaches the target is sqrt(2 * jerk * distance left)
+        jerk = self.jerk
+        wanted = (2 * jerk * abs(error)) ** 0.5
+        wanted = min(wanted, limit)
+        if error < 0:
+            wanted = -wanted
+        accel = self._accel[i]
+        accel += min(max(wanted - accel, -jerk * dt), jerk * dt)
+        step = accel * dt
+        if abs(step) >= abs(error) or abs(error) < 0.05:
+            self._speed[i] = self._target[i]
+            self._accel[i] = 0.0
+            return
+        self._speed[i] += step
+        self._accel[i] = accel
+
+
+######################################################
+#   Servos
+######################################################
+LINEAR = 0
+SMOOTH = 1      # Slow at both ends
+EASE_IN = 2     # Slow at the start
+EASE_OUT = 3    # Slow at the end
+
+
+def ease(easing, t):
+    '''
+    t (float) = how far through the move, 0 to 1
+
+    Output: how far through the angle change, 0 to 1
+    '''
+    if easing == SMOOTH:
+        return t * t * (3 - 2 * t)
+    if easing == EASE_IN:
+        return t * t
+    if easing == EASE_OUT:
+        return t * (2 - t)
+    return t
+
+
+class ServoMotion:
+
+    def __init__(self, bot, rate=50):
+        '''
+        bot = the Cutebot whose servos to move (switched to its non-blocking pipeline)
+        rate (float) = most updates per second (the servos refresh every 20 ms)
+        '''
+        self.bot = bot
+        self.period = 1 / rate
+        self._clock = bot._clock
+        self._from = array('f', [0.0, 0.0])
+        self._to = array('f', [0.0, 0.0])
+        self._sent = array('h', [-1, -1])       # Whole number angle last queued
+        self._active = bytearray(2)             # 1 = the servo takes part in this move
+        self._start = 0.0
+        self._duration = 0.0
+        self._easing = SMOOTH
+        self._moving = False
+        self._queue = []                        # (angle1, angle2, duration, easing)
+        self._due = 0.0
+        self.setpoints = 0                      # Frames queued for the servos
+        bot.blocking = False
+        for i in (0, 1):
+            shadow = bot._shadow[bot._SERVO_S1 + i]
+            if shadow[0]:
+                self._sent[i] = shadow[1]       # Where the Cutebot last put it
+                self._to[i] = shadow[1]
+
+    def move(self, angle1, angle2, duration=1.0, easing=SMOOTH):
+        '''
+        Moves S1 to angle1 and S2 to angle2, starting and finishing together.
+        None leaves a servo where it is. If a move is already going, this one waits
+        for it (and anything else queued) to finish.
+
+        duration (float) = seconds the move takes
+        easing = LINEAR, SMOOTH, EASE_IN or EASE_OUT
+        '''
+        if self._moving:
+            self._queue.append((angle1, angle2, duration, easing))
+        else:
+            self._begin(angle1, angle2, duration, easing)
+
+    def moveTo(self, whichServo, angle, duration=1.0, easing=SMOOTH):
+        '''
+        whichServo = 1 (S1), 2 (S2) or 3 (both), like cutebot.servos()
+        '''
+        self.move(angle if whichServo != 2 else None, angle if whichServo != 1 else None,
+                  duration, easing)
+
+    def stop(self):
+        '''
+        Stops where the servos are now and forgets queued moves.
+        '''
+        self._queue = []
+        self._moving = False
+
+    @property
+    def moving(self):
+        '''
+        Output: True while a move is going or queued
+        '''
+        return self._moving
+
+    @property
+    def angles(self):
+        '''
+        Output: the whole number angles last sent to S1 and S2 (-1 if never sent)
+        '''
+        return self._sent[0], self._sent[1]
+
+    def update(self):
+        '''
+        Moves the servos along if it is time. Call this every loop.
+
+        Output: True while a move is going or queued
+        '''
+        now = self._clock()
+        if not self._moving or now < self._due:
+            self.bot.update()
+            return self._moving
+        self._due = now + self.period
+        t = (now - self._start) / self._duration if self._duration > 0 else 1.0
+        if t >= 1:
+            t = 1.0
+        progress = ease(self._easing, t)
+        for i in (0, 1):
+            if not self._active[i]:
+                continue                        # Left alone by this move
+            angle = int(self._from[i] + (self._to[i] - self._from[i]) * progress + 0.5)
+            if angle != self._sent[i]:
+                self._sent[i] = angle
+                self.setpoints += 1
+                self.bot._stageServos(i + 1, angle)
+        self.bot.update()
+        if t >= 1:
+            self._moving = False
+            if self._queue:
+                self._begin(*self._queue.pop(0))
+        return self._moving
+
+    def nextDue(self):
+        return max(self._due - self._clock(), 0)
+
+    async def run(self):
+        '''
+        asyncio task that keeps the servos moving.
+        '''
+        import asyncio
+        while True:
+            self.update()
+            await asyncio.sleep(self.nextDue() if self._moving else 0.02)
+
+    def _begin(self, angle1, angle2, duration, easing):
+        limit = self.bot._servoMaxAngleInDegrees
+        for i, angle in ((0, angle1), (1, angle2)):
+            if angle is None:
+                # Not part of this move: nothing is sent, and a servo that was never
+                # moved keeps an unknown position
+                self._active[i] = 0
+                continue
+            self._active[i] = 1
+            start = self._sent[i] if self._sent[i] >= 0 else self._to[i]
+            angle = min(max(angle, 0), limit)
+            if self._sent[i] < 0:
+                start = angle               # Position unknown: go straight there
+            self._from[i] = start
+            self._to[i] = angle
+        self._start = self._clock()
+        self._duration = duration
+        self._easing = easing
+        self._moving = True
+        self._due = 0.0
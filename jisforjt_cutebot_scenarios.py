@@ -0,0 +1,134 @@
+# CircuitPython Clue Cutebot - simulator scenarios
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Worlds and control loops for the simulator (jisforjt_cutebot_sim), shared by
+tools/sweep.py and the benchmarks so they drive the same robot in the same places.
+Runs under CPython.
+
+example:
+    from jisforjt_cutebot_clue import Cutebot
+    from jisforjt_cutebot_sim import SimBackend
+    from jisforjt_cutebot_scenarios import lineWorld, bangBang
+
+    world = lineWorld()
+    cutebot = Cutebot(backend=SimBackend(world))
+    lineLosses = bangBang(cutebot, 60, maxSpeed=40)
+    print(world.laps, lineLosses)
+
+Each control loop drives a Cutebot until its clock reaches seconds, with the
+given settings, and returns how many times both line sensors lost the line
+(0 for loops that do not follow a line).
+'''
+
+######################################################
+#   Import
+######################################################
+import math
+import random
+
+from jisforjt_cutebot_linefollower import LineFollower
+from jisforjt_cutebot_sim import World, Track, Robot
+
+
+######################################################
+#   Worlds
+######################################################
+def lineWorld(seed=0):
+    # On the line at the middle of the bottom straight, driving along it
+    return World(track=Track.oval(), robot=Robot(x=0, y=-25), seed=seed)
+
+
+def room(seed=0):
+    # A 2.5 m square room with five round obstacles placed by the seed
+    size = 125
+    walls = [(-size, -size, size, -size), (size, -size, size, size),
+             (size, size, -size, size), (-size, size, -size, -size)]
+    place = random.Random(seed)
+    obstacles = []
+    while len(obstacles) < 5:
+        x = place.uniform(-size + 20, size - 20)
+        y = place.uniform(-size + 20, size - 20)
+        if math.hypot(x, y) > 40:                           # Keep the start clear
+            obstacles.append((x, y, place.uniform(5, 15)))
+    return World(obstacles=obstacles, walls=walls, robot=Robot(), seed=seed)
+
+
+######################################################
+#   Control Loops
+######################################################
+def lineFollower(cutebot, seconds, speed=20, kp=20, kd=0.5, lostGain=2, rate=100):
+    # LineFollower from jisforjt_cutebot_linefollower
+    follower = LineFollower(cutebot, speed=speed, kp=kp, kd=kd, lostGain=lostGain,
+                            rate=rate)
+    follower.run(duration=seconds)
+    return follower.lineLosses
+
+
+def bangBang(cutebot, seconds, maxSpeed=40, loopTime=0.001):
+    # The loop from examples/cutebot_line_following__better__.py. loopTime stands for
+    # the loop's own time (printing, the button check).
+    last_turn_was_left = True
+    lost = False
+    lineLosses = 0
+    while cutebot._clock() < seconds:
+        leftSide, rightSide = cutebot.tracking
+        if leftSide and rightSide:
+            cutebot.motors(maxSpeed, maxSpeed)
+        elif rightSide:
+            cutebot.motors(maxSpeed, 0)
+            last_turn_was_left = False
+        elif leftSide:
+            cutebot.motors(0, maxSpeed)
+            last_turn_was_left = True
+        elif last_turn_was_left:
+            cutebot.motors(-maxSpeed, maxSpeed)
+        else:
+            cutebot.motors(maxSpeed, -maxSpeed)
+        if not leftSide and not rightSide:
+            lineLosses += not lost
+            lost = True
+        else:
+            lost = False
+        cutebot._sleep(loopTime)
+    return lineLosses
+
+
+def avoidance(cutebot, seconds, maxSpeed=50, near=20, far=50, alphaScale=200):
+    # The loop from examples/cutebot_simple_avoidance.py, without the CLUE's
+    # proximity check
+    while cutebot._clock() < seconds:
+        distance = cutebot.sonar
+        if distance >= far:                                 # All clear
+            cutebot.motors(maxSpeed, maxSpeed)
+        elif distance > near:                               # Steer away
+            alpha = 1 - distance / alphaScale
+            cutebot.motors((maxSpeed / 2 * alpha), maxSpeed)
+        else:                                               # Back away
+            alpha = -1 + distance / alphaScale
+            cutebot.motors(((maxSpeed / 2) * alpha), (maxSpeed / 2))
+    return 0
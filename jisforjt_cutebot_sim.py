@@ -0,0 +1,756 @@
+# CircuitPython Clue Cutebot - simulated hardware
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+A simulated Cutebot for regular Python (CPython), so the library and your control
+code can run and be timed on a computer without the robot.
+
+    from jisforjt_cutebot_clue import Cutebot
+    from jisforjt_cutebot_sim import SimBackend, World, Track, Robot
+
+    world = World(track=Track.oval(), robot=Robot(x=0, y=-30))
+    backend = SimBackend(world)
+    cutebot = Cutebot(backend=backend)
+
+    cutebot.motors(30, 30)
+    cutebot._sleep(2.0)                 # two simulated seconds, no real waiting
+    print(world.robot.x, world.robot.y, backend.bus.writes)
+
+The simulation is deterministic: the same program and seed always give the same
+result. Time only moves when the program sleeps or talks to the hardware
+(an I2C write or a sonar ping takes as long as it would on the robot), so a run is
+usually much faster than real time. Use RealTimeClock to run at wall-clock speed,
+for example together with asyncio.
+
+Units are centimeters, seconds and radians. The robot starts at (x, y) facing
+along heading (0 = +x, counter-clockwise positive).
+'''
+
+######################################################
+#   Import
+######################################################
+import math
+import random
+import time
+
+
+######################################################
+#   Clocks
+######################################################
+class VirtualClock:
+    '''
+    Simulated time. sleep() and advance() move it forward and step every attached
+    World in increments of at most step seconds.
+    '''
+
+    def __init__(self, step=0.001):
+        self.now = 0.0
+        self.step = step
+        self._worlds = []
+
+    def attach(self, world):
+        self._worlds.append(world)
+
+    def detach(self, world):
+        # Time still passes, but the world stands still
+        self._worlds.remove(world)
+
+    def monotonic(self):
+        return self.now
+
+    def monotonic_ns(self):
+        return int(round(self.now * 1000000000))
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        remaining = seconds
+        while remaining > 0:
+            dt = min(self.step, remaining)
+            for world in self._worlds:
+                world.step(dt)
+            # Time must move, or a program waiting for it would spin forever
+            self.now = max(self.now + dt, math.nextafter(self.now, math.inf))
+            remaining -= dt
+
+
+class RealTimeClock(VirtualClock):
+    '''
+    Follows the wall clock. Hardware delays really wait, and the world is stepped
+    up to the current time whenever the time is read.
+    '''
+
+    def __init__(self, step=0.001):
+        VirtualClock.__init__(self, step)
+        self._start = time.monotonic()
+
+    def _catchUp(self):
+        behind = time.monotonic() - self._start - self.now
+        if behind > 0:
+            VirtualClock.advance(self, behind)
+
+    def monotonic(self):
+        self._catchUp()
+        return self.now
+
+    def monotonic_ns(self):
+        self._catchUp()
+        return VirtualClock.monotonic_ns(self)
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+        self._catchUp()
+
+    def advance(self, seconds):
+        self.sleep(seconds)
+
+
+######################################################
+#   World
+######################################################
+class Track:
+    '''
+    A black line drawn as a polyline.
+
+    points = list of (x, y) corners
+    width (float) = line width in cm
+    closed (boolean) = True if the last point joins back to the first
+    '''
+
+    def __init__(self, points, width=2.0, closed=True):
+        self.points = list(points)
+        self.width = width
+        self.closed = closed
+        self._segments = []
+        self.length = 0.0
+        corners = self.points + (self.points[:1] if closed else [])
+        for (x1, y1), (x2, y2) in zip(corners, corners[1:]):
+            length = math.hypot(x2 - x1, y2 - y1)
+            if length:
+                # Start, direction, 1 / length squared (for projecting onto it), length
+                # and how far along the line it starts
+                self._segments.append((x1, y1, x2 - x1, y2 - y1, 1 / (length * length),
+                                       length, self.length))
+            self.length += length
+
+    @classmethod
+    def oval(cls, straight=60.0, radius=25.0, width=2.0, corners=24):
+        '''
+        A running-track shape centered on (0, 0): two straights joined by half
+        circles. The start is the middle of the bottom straight, at (0, -radius),
+        driving towards +x.
+        '''
+        points = []
+        half = straight / 2
+        for i in range(corners + 1):
+            angle = -math.pi / 2 + math.pi * i / corners
+            points.append((half + radius * math.cos(angle), radius * math.sin(angle)))
+        for i in range(corners + 1):
+            angle = math.pi / 2 + math.pi * i / corners
+            points.append((-half + radius * math.cos(angle), radius * math.sin(angle)))
+        # Start the polyline at the middle of the bottom straight
+        points.insert(0, (0.0, -radius))
+        return cls(points, width)
+
+    def nearest(self, x, y):
+        '''
+        Output: distance from (x, y) to the line, and how far along the line the
+        closest point is (0 to length)
+        '''
+        # Compares squared distances; this runs every simulated millisecond
+        best = math.inf
+        along = 0.0
+        for x1, y1, ex, ey, inverse, length, start in self._segments:
+            fx = x - x1
+            fy = y - y1
+            t = (fx * ex + fy * ey) * inverse
+            if t < 0.0:
+                t = 0.0
+            elif t > 1.0:
+                t = 1.0
+            fx -= t * ex
+            fy -= t * ey
+            squared = fx * fx + fy * fy
+            if squared < best:
+                best = squared
+                along = start + t * length
+        return math.sqrt(best), along
+
+    def under(self, x, y):
+        '''
+        Output: True if (x, y) is on the black line
+        '''
+        limit = self.width * self.width / 4
+        for x1, y1, ex, ey, inverse, length, start in self._segments:
+            fx = x - x1
+            fy = y - y1
+            t = (fx * ex + fy * ey) * inverse
+            if t < 0.0:
+                t = 0.0
+            elif t > 1.0:
+                t = 1.0
+            fx -= t * ex
+            fy -= t * ey
+            if fx * fx + fy * fy <= limit:
+                return True
+        return False
+
+
+class Robot:
+    '''
+    Differential drive model of the Cutebot.
+
+    topSpeed (float) = wheel speed in cm/s at motor speed 100
+    wheelBase (float) = distance between the wheels in cm
+    lag (float) = time constant of the motors in seconds
+    radius (float) = size of the robot for collisions, in cm
+    '''
+
+    def __init__(self, x=0.0, y=0.0, heading=0.0, topSpeed=30.0, wheelBase=9.0,
+                 lag=0.05, radius=5.0):
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.topSpeed = topSpeed
+        self.wheelBase = wheelBase
+        self.lag = lag
+        self.radius = radius
+        self.leftSpeed = 0.0            # Actual wheel speeds in cm/s
+        self.rightSpeed = 0.0
+        self.sensorAhead = 4.0          # Line sensors: distance in front of the axle
+        self.sensorSpread = 0.7         # and distance left/right of the center line
+        self.sonarAhead = 5.0
+        self.distance = 0.0             # Total distance driven
+
+    def position(self, ahead, left):
+        '''
+        Output: world (x, y) of a point given relative to the robot
+        '''
+        c = math.cos(self.heading)
+        s = math.sin(self.heading)
+        return self.x + ahead * c - left * s, self.y + ahead * s + left * c
+
+    def step(self, dt, leftTarget, rightTarget):
+        follow = min(dt / self.lag, 1.0) if self.lag > 0 else 1.0
+        self.leftSpeed += (leftTarget - self.leftSpeed) * follow
+        self.rightSpeed += (rightTarget - self.rightSpeed) * follow
+        speed = (self.leftSpeed + self.rightSpeed) / 2
+        turn = (self.rightSpeed - self.leftSpeed) / self.wheelBase
+        self.heading += turn * dt
+        self.x += speed * math.cos(self.heading) * dt
+        self.y += speed * math.sin(self.heading) * dt
+        self.distance += abs(speed) * dt
+
+
+class World:
+    '''
+    The robot and everything around it.
+
+    track = Track the line sensors see, or None for plain white floor
+    obstacles = list of (x, y, radius) round obstacles
+    walls = list of (x1, y1, x2, y2) straight walls
+    robot = Robot, or None for one at (0, 0) facing +x
+    seed (integer) = seed for the sonar noise
+    sonarNoise (float) = standard deviation of the sonar reading in cm
+    maxRange (float) = farthest the sonar can see in cm
+    '''
+
+    def __init__(self, track=None, obstacles=(), walls=(), robot=None, seed=0,
+                 sonarNoise=0.3, maxRange=400.0):
+        self.track = track
+        self.obstacles = list(obstacles)
+        self.walls = list(walls)
+        self.robot = robot if robot is not None else Robot()
+        self.random = random.Random(seed)
+        self.sonarNoise = sonarNoise
+        self.maxRange = maxRange
+        self.time = 0.0
+        self.bus = None
+        self.collisions = 0             # Times the robot ran into something
+        self.laps = []                  # Time each completed lap took
+        self._colliding = False
+        self._lapStart = 0.0
+        self._lastAlong = None
+        self._halfway = False
+        self._lapCheck = 0.0
+
+    def attach(self, clock, bus):
+        clock.attach(self)
+        self.bus = bus
+
+    def motorTargets(self):
+        '''
+        Output: left and right wheel speeds in cm/s, from the Cutebot's motor registers
+        '''
+        if self.bus is None:
+            return 0.0, 0.0
+        return self._wheel(self.bus.register(0x01)), self._wheel(self.bus.register(0x02))
+
+    def _wheel(self, frame):
+        speed = min(frame[2], 100) * self.robot.topSpeed / 100
+        return -speed if frame[1] == 0x01 else speed
+
+    def step(self, dt):
+        robot = self.robot
+        x, y, heading = robot.x, robot.y, robot.heading
+        left, right = self.motorTargets()
+        robot.step(dt, left, right)
+        if self._collides():
+            robot.x, robot.y, robot.heading = x, y, heading
+            robot.leftSpeed = robot.rightSpeed = 0.0
+            if not self._colliding:
+                self.collisions += 1
+            self._colliding = True
+        else:
+            self._colliding = False
+        self.time += dt
+        self._lapCheck += dt
+        if self.track is not None and self._lapCheck >= 0.01:
+            self._lapCheck = 0.0
+            self._checkLap()
+
+    def _collides(self):
+        robot = self.robot
+        for ox, oy, radius in self.obstacles:
+            if math.hypot(robot.x - ox, robot.y - oy) < radius + robot.radius:
+                return True
+        for x1, y1, x2, y2 in self.walls:
+            if _segmentDistance(robot.x, robot.y, x1, y1, x2, y2) < robot.radius:
+                return True
+        return False
+
+    def _checkLap(self):
+        distance, along = self.track.nearest(self.robot.x, self.robot.y)
+        if distance > 10:
+            return                      # Too far from the line to count progress
+        fraction = along / self.track.length
+        if 0.4 < fraction < 0.6:
+            self._halfway = True
+        last = self._lastAlong
+        self._lastAlong = fraction
+        if last is not None and last > 0.75 and fraction < 0.25 and self._halfway:
+            self.laps.append(self.time - self._lapStart)
+            self._lapStart = self.time
+            self._halfway = False
+
+    def lineUnder(self, side):
+        '''
+        side = -1 for the left sensor, 1 for the right
+
+        Output: True if that line sensor is over the black line
+        '''
+        if self.track is None:
+            return False
+        x, y = self.robot.position(self.robot.sensorAhead, -side * self.robot.sensorSpread)
+        return self.track.under(x, y)
+
+    def sonarDistance(self):
+        '''
+        Output: distance in cm from the sonar to the nearest thing straight ahead,
+        or None if nothing is in range
+        '''
+        robot = self.robot
+        ox, oy = robot.position(robot.sonarAhead, 0)
+        dx = math.cos(robot.heading)
+        dy = math.sin(robot.heading)
+        best = None
+        for cx, cy, radius in self.obstacles:
+            # Ray / circle intersection
+            fx, fy = ox - cx, oy - cy
+            b = fx * dx + fy * dy
+            c = fx * fx + fy * fy - radius * radius
+            disc = b * b - c
+            if disc >= 0:
+                t = -b - math.sqrt(disc)
+                if t >= 0 and (best is None or t < best):
+                    best = t
+        for x1, y1, x2, y2 in self.walls:
+            # Ray / segment intersection
+            ex, ey = x2 - x1, y2 - y1
+            denom = dx * ey - dy * ex
+            if denom == 0:
+                continue
+            t = ((x1 - ox) * ey - (y1 - oy) * ex) / denom
+            u = ((x1 - ox) * dy - (y1 - oy) * dx) / denom
+            if t >= 0 and 0 <= u <= 1 and (best is None or t < best):
+                best = t
+        if best is None or best > self.maxRange:
+            return None
+        if self.sonarNoise:
+            best = max(best + self.random.gauss(0, self.sonarNoise), 0.0)
+        return best
+
+
+def _segmentDistance(px, py, x1, y1, x2, y2):
+    ex, ey = x2 - x1, y2 - y1
+    length = ex * ex + ey * ey
+    t = 0.0 if length == 0 else min(max(((px - x1) * ex + (py - y1) * ey) / length, 0.0), 1.0)
+    return math.hypot(px - (x1 + t * ex), py - (y1 + t * ey))
+
+
+######################################################
+#   Simulated Peripherals
+######################################################
+class SimI2C:
+    '''
+    The I2C bus with the Cutebot's coprocessor on it. Every write takes as long as
+    it would on a real bus and lands in a register file that the World reads the
+    motor speeds from.
+
+    frequency (integer) = bus speed in Hz
+    failRate (float) = chance that a write fails with OSError, to test retries
+    '''
+
+    def __init__(self, clock, address=0x10, frequency=100000, failRate=0.0, seed=0):
+        self.clock = clock
+        self.address = address
+        self.frequency = frequency
+        self.failRate = failRate
+        self.random = random.Random(seed)
+        self.registers = bytearray(16 * 4)      # 4 bytes per register, frame included
+        self.locked = False
+        self.heldUntil = 0.0                    # Locked by "another driver" until then, see hold()
+        self.record = False                     # Keep (time, frame) of every write in frames
+        self.frames = []
+        self.writes = 0
+        self.bytesWritten = 0
+        self.failures = 0
+
+    def hold(self, seconds):
+        '''
+        Keeps the bus locked for seconds, like another driver in the middle of a read.
+        '''
+        self.heldUntil = self.clock.now + seconds
+
+    def try_lock(self):
+        if self.locked or self.clock.now < self.heldUntil:
+            return False
+        self.locked = True
+        return True
+
+    def unlock(self):
+        self.locked = False
+
+    def writeto(self, address, buffer, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        # Address byte plus data, 9 clocks per byte
+        self.clock.advance((end - start + 1) * 9 / self.frequency)
+        if address != self.address:
+            raise OSError(19)           # No device at that address
+        if self.failRate and self.random.random() < self.failRate:
+            self.failures += 1
+            raise OSError(5)            # I/O error
+        data = bytes(buffer[start:end])
+        register = data[0] & 0x0F
+        self.registers[register * 4:register * 4 + len(data)] = data
+        self.writes += 1
+        self.bytesWritten += len(data)
+        if self.record:
+            self.frames.append((self.clock.now, data))
+
+    def register(self, register):
+        '''
+        Output: the last frame written to a register (4 bytes, zeros if never written)
+        '''
+        return bytes(self.registers[register * 4:register * 4 + 4])
+
+
+class SimPWM:
+    '''
+    The buzzer. log holds (time, frequency, duty_cycle) for every change.
+    '''
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._frequency = 500
+        self._duty_cycle = 0
+        self.log = []
+
+    @property
+    def frequency(self):
+        return self._frequency
+
+    @frequency.setter
+    def frequency(self, value):
+        self._frequency = value
+        self.log.append((self.clock.now, self._frequency, self._duty_cycle))
+
+    @property
+    def duty_cycle(self):
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        self._duty_cycle = value
+        self.log.append((self.clock.now, self._frequency, self._duty_cycle))
+
+    def deinit(self):
+        pass
+
+
+class SimPixels:
+    '''
+    The two NeoPixels. shows counts how many times the strip was sent.
+    '''
+
+    def __init__(self, n, auto_write=True):
+        self._pixels = [(0, 0, 0)] * n
+        self.auto_write = auto_write
+        self.brightness = 1.0
+        self.shows = 0
+
+    def __len__(self):
+        return len(self._pixels)
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, color):
+        self._pixels[index] = _rgb(color)
+        if self.auto_write:
+            self.show()
+
+    def fill(self, color):
+        for i in range(len(self._pixels)):
+            self._pixels[i] = _rgb(color)
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        self.shows += 1
+
+    def deinit(self):
+        pass
+
+
+def _rgb(color):
+    # NeoPixel accepts a packed 0xRRGGBB integer or an (r, g, b) tuple
+    if isinstance(color, int):
+        return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+    return tuple(color)
+
+
+class SimAnalogIn:
+    '''
+    P1 or P2. Set value to whatever the sensor should read (0 to 65535).
+    '''
+
+    def __init__(self, value=0):
+        self.value = value
+
+    def deinit(self):
+        pass
+
+
+class SimLineSensor:
+    '''
+    A line tracking sensor. Reads low (False) over black, like the real one.
+    '''
+
+    def __init__(self, world, side):
+        self.world = world
+        self.side = side
+
+    @property
+    def value(self):
+        return not self.world.lineUnder(self.side)
+
+    def deinit(self):
+        pass
+
+
+class SimRangeSensor:
+    '''
+    The HC-SR04. A ping takes the echo's round trip time; when nothing is in range
+    it waits for the timeout and raises RuntimeError, like adafruit_hcsr04.
+    '''
+
+    def __init__(self, world, clock, timeout=0.03):      # BoardBackend's timeout
+        self.world = world
+        self.clock = clock
+        self.timeout = timeout
+        self.pings = 0
+        self.timeouts = 0
+
+    @property
+    def distance(self):
+        self.pings += 1
+        distance = self.world.sonarDistance()
+        if distance is None:
+            self.timeouts += 1
+            self.clock.advance(self.timeout)
+            raise RuntimeError("Timed out")
+        self.clock.advance(0.00001 + 2 * distance / 34300)     # Trigger pulse and echo
+        return distance
+
+    def deinit(self):
+        pass
+
+
+class SimPulseIn:
+    '''
+    The IR receiver. press() and hold() queue the pulses an NEC remote would send,
+    so they are all there at the next update(), like a PulseIn read late.
+    '''
+
+    def __init__(self, maxlen=120):
+        self.maxlen = maxlen
+        self._pulses = []
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._pulses)
+
+    def popleft(self):
+        return self._pulses.pop(0)
+
+    def clear(self):
+        self._pulses = []
+
+    def feed(self, pulses):
+        '''
+        Adds raw pulse lengths (microseconds), dropping any that do not fit.
+        '''
+        for length in pulses:
+            if len(self._pulses) < self.maxlen:
+                self._pulses.append(length)
+            else:
+                self.dropped += 1
+
+    def press(self, code):
+        '''
+        code = four numbers such as (255, 8, 79, 176), or a packed integer
+        '''
+        if not isinstance(code, int):
+            a, b, c, d = code
+            code = (a << 24) | (b << 16) | (c << 8) | d
+        pulses = [65535, 9000, 4500]            # Gap since the last signal, leader
+        for bit in range(31, -1, -1):
+            pulses.append(560)
+            pulses.append(1690 if (code >> bit) & 1 else 560)
+        pulses.append(560)                      # Stop mark
+        self.feed(pulses)
+
+    def hold(self, repeats=1):
+        '''
+        Adds the repeat signals a held button sends.
+        '''
+        for i in range(repeats):
+            self.feed([40000, 9000, 2250, 560])
+
+    def deinit(self):
+        pass
+
+
+class SimUART:
+    '''
+    A Bluetooth UARTService. send() puts bytes where the next read finds them, like
+    a phone sending packets.
+    '''
+
+    def __init__(self):
+        self._data = bytearray()
+
+    def send(self, data):
+        self._data.extend(data)
+
+    @property
+    def in_waiting(self):
+        return len(self._data)
+
+    def readinto(self, buffer, nbytes=None):
+        n = min(len(buffer), len(self._data) if nbytes is None else nbytes)
+        buffer[0:n] = self._data[0:n]
+        del self._data[0:n]
+        return n
+
+    def read(self, nbytes=None):
+        n = len(self._data) if nbytes is None else min(nbytes, len(self._data))
+        data = bytes(self._data[0:n])
+        del self._data[0:n]
+        return data
+
+    def write(self, data):
+        pass
+
+
+######################################################
+#   Backend
+######################################################
+class SimBackend:
+    '''
+    Backend for Cutebot(backend=...) that uses the simulation instead of hardware.
+
+    world = the World to drive around in (an empty one if None)
+    clock = VirtualClock (default) or RealTimeClock
+    failRate (float) = chance of each I2C write failing
+
+    After the Cutebot first uses them, the simulated parts are available as
+    bus, buzzerOut, pixelStrip, analog['P1'], analog['P2'], sonar and ir.
+    '''
+
+    def __init__(self, world=None, clock=None, failRate=0.0, seed=0):
+        self.clock = clock if clock is not None else VirtualClock()
+        self.world = world if world is not None else World(seed=seed)
+        self.monotonic = self.clock.monotonic
+        self.monotonic_ns = self.clock.monotonic_ns
+        self.sleep = self.clock.sleep
+        self.bus = SimI2C(self.clock, failRate=failRate, seed=seed)
+        self.world.attach(self.clock, self.bus)
+        self.analog = {'P1': SimAnalogIn(), 'P2': SimAnalogIn()}
+        self.buzzerOut = None
+        self.pixelStrip = None
+        self.sonar = None
+        self.ir = None
+
+    def i2c(self):
+        return self.bus
+
+    def buzzer(self, pin):
+        self.buzzerOut = SimPWM(self.clock)
+        return self.buzzerOut
+
+    def pixels(self, pin, n):
+        self.pixelStrip = SimPixels(n, auto_write=False)
+        return self.pixelStrip
+
+    def analogIn(self, pin):
+        return self.analog[pin]
+
+    def digitalIn(self, pin):
+        return SimLineSensor(self.world, -1 if pin == 'D13' else 1)
+
+    def rangeSensor(self, trigger, echo):
+        self.sonar = SimRangeSensor(self.world, self.clock)
+        return self.sonar
+
+    def pulseIn(self, pin, maxlen):
+        self.ir = SimPulseIn(maxlen)
+        return self.ir
@@ -0,0 +1,276 @@
+# CircuitPython Clue Cutebot - instrumentation counters
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Finds out where a slow loop spends its time. CutebotStats counts, with the time
+spent in each:
+    lock waits      the bus was busy and the Cutebot had to wait for it
+    retries         I2C writes that failed and were tried again
+    failures        batches given up on: too many retries, or the bus stayed busy
+    sonar timeouts  pings that got no echo
+and keeps a histogram of how long each call to motors(), servos(), headlights(),
+pixels(), playTone(), update(), flush() and each sonar ping took.
+
+Nothing is measured until a CutebotStats is attached, and detach() takes it away
+again, so a Cutebot without one runs at full speed.
+
+example:
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_stats import CutebotStats
+
+    stats = CutebotStats(cutebot)
+    ...
+    print(stats.report())
+    uart.write(stats.pack())        # Fixed size binary snapshot (see FORMAT)
+
+Histogram bucket 0 counts calls under 32 microseconds; each bucket after that
+doubles the limit, and the last one (15) counts everything from 0.5 s up.
+
+The packed snapshot is little-endian:
+    header      version (B), number of histograms (B), snapshot number (H)
+    counters    lockWaits, lockSpins, retries, failures, sonarTimeouts, pings (6 x I)
+    times       lockWaitTime, retryTime, failureTime, sonarTimeoutTime (4 x f, seconds)
+    histograms  one per name in HISTOGRAMS: calls (I), longest (f, seconds),
+                buckets (16 x H, stop counting at 65535)
+Use CutebotStats.unpack() on a computer to turn it back into a dictionary.
+'''
+
+######################################################
+#   Import
+######################################################
+import struct
+from array import array
+
+
+######################################################
+#   Variables
+######################################################
+VERSION = 1
+HISTOGRAMS = ('motors', 'servos', 'headlights', 'pixels', 'playTone', 'update',
+              'flush', 'ping')
+BUCKETS = 16
+FORMAT = '<BBH6I4f'
+HISTOGRAM_FORMAT = '<If' + 'H' * BUCKETS
+
+
+class CutebotStats:
+
+    def __init__(self, bot):
+        '''
+        bot = the Cutebot to measure. The statistics start right away.
+        '''
+        self.bot = bot
+        self._clock = bot._clock
+        self._calls = array('L', [0] * len(HISTOGRAMS))
+        self._longest = array('f', [0.0] * len(HISTOGRAMS))
+        self._buckets = array('H', [0] * (len(HISTOGRAMS) * BUCKETS))
+        self._buffer = bytearray(struct.calcsize(FORMAT)
+                                 + len(HISTOGRAMS) * struct.calcsize(HISTOGRAM_FORMAT))
+        self.snapshots = 0
+        self.clear()
+        self.attach()
+
+    def attach(self):
+        '''
+        Starts measuring. Timed methods are wrapped on this Cutebot only.
+        '''
+        bot = self.bot
+        bot._stats = self
+        for index in range(len(HISTOGRAMS) - 1):        # All but 'ping'
+            name = HISTOGRAMS[index]
+            setattr(bot, name, self._timed(index, getattr(bot.__class__, name), bot))
+
+    def detach(self):
+        '''
+        Stops measuring. The numbers so far are kept.
+        '''
+        bot = self.bot
+        bot._stats = None
+        for index in range(len(HISTOGRAMS) - 1):
+            try:
+                delattr(bot, HISTOGRAMS[index])
+            except AttributeError:
+                pass
+
+    def clear(self):
+        '''
+        Sets every counter, time and histogram back to zero.
+        '''
+        self.lockWaits = 0
+        self.lockSpins = 0
+        self.lockWaitTime = 0.0
+        self.retries = 0
+        self.retryTime = 0.0
+        self.failures = 0
+        self.failureTime = 0.0
+        self.sonarTimeouts = 0
+        self.sonarTimeoutTime = 0.0
+        self.pings = 0
+        for i in range(len(self._calls)):
+            self._calls[i] = 0
+            self._longest[i] = 0.0
+        for i in range(len(self._buckets)):
+            self._buckets[i] = 0
+
+
+    ######################################################
+    #   Hooks (called by the Cutebot)
+    ######################################################
+    def lockWait(self, spins, seconds):
+        self.lockWaits += 1
+        self.lockSpins += spins
+        self.lockWaitTime += seconds
+
+    def retry(self):
+        self.retries += 1
+
+    def retried(self, seconds):
+        self.retryTime += seconds
+
+    def failure(self, seconds):
+        self.failures += 1
+        self.failureTime += seconds
+
+    def ping(self, seconds, echoed):
+        self.pings += 1
+        if not echoed:
+            self.sonarTimeouts += 1
+            self.sonarTimeoutTime += seconds
+        self._record(len(HISTOGRAMS) - 1, seconds)
+
+    def _timed(self, index, method, bot):
+        clock = self._clock
+        record = self._record
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(bot, *args, **kwargs)
+            finally:
+                record(index, clock() - start)
+        return timed
+
+    def _record(self, index, seconds):
+        self._calls[index] += 1
+        if seconds > self._longest[index]:
+            self._longest[index] = seconds
+        limit = 0.000032
+        bucket = 0
+        while seconds >= limit and bucket < BUCKETS - 1:
+            limit *= 2
+            bucket += 1
+        i = index * BUCKETS + bucket
+        if self._buckets[i] < 65535:
+            self._buckets[i] += 1
+
+
+    ######################################################
+    #   Reading the Statistics
+    ######################################################
+    def histogram(self, name):
+        '''
+        name (string) = one of HISTOGRAMS
+
+        Output: calls, longest call in seconds, list of the 16 bucket counts
+        '''
+        index = HISTOGRAMS.index(name)
+        start = index * BUCKETS
+        return self._calls[index], self._longest[index], list(self._buckets[start:start + BUCKETS])
+
+    def report(self):
+        '''
+        Output: the statistics as readable text
+        '''
+        lines = [
+            "lock waits  {} ({} spins, {:.3f} s)".format(self.lockWaits, self.lockSpins, self.lockWaitTime),
+            "retries     {} ({:.3f} s)".format(self.retries, self.retryTime),
+            "failures    {} ({:.3f} s)".format(self.failures, self.failureTime),
+            "sonar       {} pings, {} timeouts ({:.3f} s)".format(self.pings, self.sonarTimeouts,
+                                                                 self.sonarTimeoutTime),
+        ]
+        for index in range(len(HISTOGRAMS)):
+            if self._calls[index]:
+                lines.append("{:<11} {} calls, longest {:.1f} ms".format(
+                    HISTOGRAMS[index], self._calls[index], self._longest[index] * 1000))
+        return "\n".join(lines)
+
+    def pack(self):
+        '''
+        Output: the statistics packed into a bytearray (see Information above). The
+        same bytearray is reused every time, so send it before calling pack() again.
+        '''
+        self.snapshots = (self.snapshots + 1) & 0xFFFF
+        buffer = self._buffer
+        struct.pack_into(FORMAT, buffer, 0, VERSION, len(HISTOGRAMS), self.snapshots,
+                         self.lockWaits, self.lockSpins, self.retries, self.failures, self.sonarTimeouts,
+                         self.pings, self.lockWaitTime, self.retryTime, self.failureTime,
+                         self.sonarTimeoutTime)
+        offset = struct.calcsize(FORMAT)
+        size = struct.calcsize(HISTOGRAM_FORMAT)
+        for index in range(len(HISTOGRAMS)):
+            b = self._buckets
+            i = index * BUCKETS
+            struct.pack_into(HISTOGRAM_FORMAT, buffer, offset, self._calls[index],
+                             self._longest[index], b[i], b[i + 1], b[i + 2], b[i + 3],
+                             b[i + 4], b[i + 5], b[i + 6], b[i + 7], b[i + 8], b[i + 9],
+                             b[i + 10], b[i + 11], b[i + 12], b[i + 13], b[i + 14], b[i + 15])
+            offset += size
+        return buffer
+
+    @staticmethod
+    def unpack(data):
+        '''
+        Turns a packed snapshot back into a dictionary (for the computer receiving it).
+        '''
+        fields = struct.unpack_from(FORMAT, data, 0)
+        if fields[0] != VERSION:
+            raise ValueError("unknown stats version {}".format(fields[0]))
+        stats = {
+            'snapshot': fields[2],
+            'lockWaits': fields[3],
+            'lockSpins': fields[4],
+            'retries': fields[5],
+            'failures': fields[6],
+            'sonarTimeouts': fields[7],
+            'pings': fields[8],
+            'lockWaitTime': fields[9],
+            'retryTime': fields[10],
+            'failureTime': fields[11],
+            'sonarTimeoutTime': fields[12],
+            'histograms': {},
+        }
+        offset = struct.calcsize(FORMAT)
+        size = struct.calcsize(HISTOGRAM_FORMAT)
+        for index in range(fields[1]):
+            values = struct.unpack_from(HISTOGRAM_FORMAT, data, offset)
+            stats['histograms'][HISTOGRAMS[index]] = {
+                'calls': values[0],
+                'longest': values[1],
+                'buckets': list(values[2:]),
+            }
+            offset += size
+        return stats
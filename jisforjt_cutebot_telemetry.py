@@ -0,0 +1,221 @@
+# CircuitPython Clue Cutebot - binary telemetry frames
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Sends what the Cutebot is doing to a computer as small fixed size binary frames
+instead of print(). Printing in the control loop formats text on every loop and
+floods the console; a Telemetry frame is 29 bytes, packed into the same buffer
+every time, and only sent rate times a second.
+
+Call update() once per loop. It times the loop and, when a frame is due, writes
+one to stream (usb_cdc.data, a busio.UART or adafruit_ble's UARTService).
+
+example:
+    import usb_cdc
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_telemetry import Telemetry
+
+    telemetry = Telemetry(cutebot, usb_cdc.data, rate=20)
+    cutebot.startSonar()                # The sonar is only reported when sampled
+    while True:
+        ...
+        telemetry.update()
+
+On the computer, tools/decode_telemetry.py turns the received bytes into CSV or
+NumPy arrays.
+
+A frame is little-endian (see FORMAT):
+    magic       b'CT' (2s)
+    version     (B)
+    tracking    bit 0 = left sensor sees black, bit 1 = right (B)
+    sequence    frame number, wraps at 65536 (H)
+    time        milliseconds since the Telemetry was made (I)
+    left, right motor speeds last set, -100 to 100 (b, b)
+    sonar       latest background sample in millimeters, 65535 = none (H)
+    p1, p2      raw analog readings (H, H)
+    loops       loops since the last frame (H)
+    loopMean    average loop time in microseconds (I)
+    loopMax     longest loop time in microseconds (I)
+    checksum    sum of the bytes before it, & 0xFF (B)
+Nothing in a frame touches the I2C bus or pings the sonar.
+'''
+
+######################################################
+#   Import
+######################################################
+import struct
+
+
+######################################################
+#   Variables
+######################################################
+VERSION = 1
+MAGIC = b'CT'
+FORMAT = '<2sBBHIbbHHHHIIB'
+SIZE = struct.calcsize(FORMAT)
+FIELDS = ('version', 'tracking', 'sequence', 'time', 'left', 'right', 'sonar', 'p1',
+          'p2', 'loops', 'loopMean', 'loopMax')
+NO_SONAR = 65535
+
+
+######################################################
+#   Telemetry
+######################################################
+class Telemetry:
+
+    def __init__(self, bot, stream=None, rate=10, analog=True):
+        '''
+        bot = the Cutebot to report on
+        stream = where frames are written (anything with write()), None to only
+            get them from update()
+        rate (float) = frames per second
+        analog (boolean) = read P1 and P2 (False leaves those pins alone)
+        '''
+        self.bot = bot
+        self.stream = stream
+        self.period = 1 / rate
+        self.analog = analog
+        self._clock = bot._clock
+        self._buffer = bytearray(SIZE)
+        self._epoch = self._clock()
+        self._due = 0.0
+        self._lastLoop = -1.0
+        self._loops = 0
+        self._loopTotal = 0.0
+        self._loopMax = 0.0
+        self.sequence = 0
+        self.frames = 0
+
+    def update(self):
+        '''
+        Times this loop and sends a frame if one is due. Call this once per loop.
+
+        Output: the frame sent (reused every time), or None
+        '''
+        now = self._clock()
+        if self._lastLoop >= 0:
+            loop = now - self._lastLoop
+            self._loops += 1
+            self._loopTotal += loop
+            if loop > self._loopMax:
+                self._loopMax = loop
+        self._lastLoop = now
+        if now < self._due:
+            return None
+        self._due = now + self.period
+        frame = self.pack(now)
+        if self.stream is not None:
+            self.stream.write(frame)
+        return frame
+
+    def nextDue(self):
+        return max(self._due - self._clock(), 0)
+
+    def pack(self, now=None):
+        '''
+        Packs a frame now and starts timing the loop again.
+
+        Output: the frame (a bytearray that is reused, so send it before packing again)
+        '''
+        bot = self.bot
+        if now is None:
+            now = self._clock()
+        if bot._trackingMonitor:
+            left, right = bot._trackingMonitor.tracking
+        else:
+            left = not bot._leftLineTracking.value
+            right = not bot._rightLineTracking.value
+        sonar = NO_SONAR
+        if bot._sonarInterval and bot._sonarCount:
+            sonar = min(int(bot._sonarLatest() * 10 + 0.5), NO_SONAR - 1)
+        p1 = p2 = 0
+        if self.analog:
+            p1 = bot._p1.value
+            p2 = bot._p2.value
+        loops = self._loops
+        mean = self._loopTotal / loops if loops else 0.0
+        struct.pack_into(FORMAT, self._buffer, 0, MAGIC, VERSION, left | (right << 1),
+                         self.sequence, int((now - self._epoch) * 1000) & 0xFFFFFFFF,
+                         self._speed(bot._LEFT_MOTOR), self._speed(bot._RIGHT_MOTOR),
+                         sonar, p1, p2, min(loops, 65535), int(mean * 1000000),
+                         int(self._loopMax * 1000000), 0)
+        buffer = self._buffer
+        total = 0
+        for i in range(SIZE - 1):
+            total += buffer[i]
+        buffer[SIZE - 1] = total & 0xFF
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        self.frames += 1
+        self._loops = 0
+        self._loopTotal = 0.0
+        self._loopMax = 0.0
+        return buffer
+
+    def _speed(self, register):
+        # Speed in the newest motor frame, queued or sent
+        frame = self.bot._frames[register]
+        if frame[1] == self.bot._BACKWARDS:
+            return -frame[2]
+        return frame[2]
+
+
+######################################################
+#   Decoding (on the computer)
+######################################################
+def unpackFrame(data, offset=0):
+    '''
+    Output: dictionary of FIELDS for the frame at offset, with time in seconds,
+    sonar in centimeters (None when not sampled) and loop times in seconds
+    '''
+    values = struct.unpack_from(FORMAT, data, offset)
+    if values[0] != MAGIC:
+        raise ValueError("not a telemetry frame")
+    if values[1] != VERSION:
+        raise ValueError("unknown telemetry version {}".format(values[1]))
+    frame = dict(zip(FIELDS, values[1:-1]))
+    frame['time'] /= 1000
+    frame['sonar'] = None if frame['sonar'] == NO_SONAR else frame['sonar'] / 10
+    frame['loopMean'] /= 1000000
+    frame['loopMax'] /= 1000000
+    return frame
+
+
+def frames(data):
+    '''
+    Finds the frames in a stream of bytes, skipping anything else (console text,
+    frames cut short or damaged).
+
+    Output: generator of the raw field tuples of FORMAT, without magic and checksum
+    '''
+    start = data.find(MAGIC)
+    while 0 <= start <= len(data) - SIZE:
+        end = start + SIZE
+        if sum(data[start:end - 1]) & 0xFF == data[end - 1]:
+            yield struct.unpack_from(FORMAT, data, start)[1:-1]
+            start = data.find(MAGIC, end)
+        else:
+            start = data.find(MAGIC, start + 1)
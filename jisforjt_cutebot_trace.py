@@ -0,0 +1,440 @@
+# CircuitPython Clue Cutebot - trace recording and replay
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Records everything the Cutebot reads and every command it sends, so a run that
+went wrong can be played back on a computer as often as needed.
+
+TraceRecorder is a backend that wraps the real one. Every line tracking, P1, P2
+and sonar reading, and every frame written to the Cutebot (motors, servos,
+headlights), is added to a log with the time it happened:
+
+    from jisforjt_cutebot_clue import Cutebot, BoardBackend
+    from jisforjt_cutebot_trace import TraceRecorder
+
+    recorder = TraceRecorder(BoardBackend(), open('/trace.bin', 'ab'))
+    cutebot = Cutebot(backend=recorder)
+    ...
+    recorder.flush()
+
+Records are gathered in a preallocated buffer and written out when it is full (or
+on flush()), so recording does not allocate. The stream can be a file on CIRCUITPY
+(which boot.py must make writable with storage.remount('/', False)) or a UART
+sending the log off the robot. Records are only ever added, so a run cut short by a
+crash or a flat battery still leaves everything up to the last write.
+
+ReplayBackend plays a log back under CPython. Sensor reads return the recorded
+values, and time jumps to when they were recorded instead of waiting, so a run
+replays much faster than real time. The frames the control code sends are kept,
+and compare() finds the first one that differs from the recording:
+
+    from jisforjt_cutebot_trace import ReplayBackend, ReplayEnd
+
+    replay = ReplayBackend(open('trace.bin', 'rb').read())
+    cutebot = Cutebot(backend=replay)
+    try:
+        while True:
+            ...                         # the control loop being tested
+    except ReplayEnd:
+        pass
+    print(replay.compare())             # None when the commands match
+
+follow='sequence' (the default) hands out each sensor's readings in the order they
+were recorded, which replays the same program exactly. follow='time' returns the
+reading that was current at the replay's time instead, for control code that
+reads more or less often than the recorded one.
+
+A record is 10 bytes, little-endian (see FORMAT): kind (B), channel (B), value (i),
+time in microseconds since recording started (I). The time wraps every 2**32 us
+(about 71.6 minutes); readTrace() counts the wraps, so longer recordings read back
+correctly as long as something is recorded at least once per wrap.
+    kind        channel             value
+    HEADER      0                   VERSION
+    ANALOG      1 (P1), 2 (P2)      the reading
+    DIGITAL     13, 14 (line)       the reading, 0 or 1
+    SONAR       8                   distance in 1/100 cm, -1 = timed out
+    FRAME       register            the three data bytes, b1 << 16 | b2 << 8 | b3
+'''
+
+######################################################
+#   Import
+######################################################
+import struct
+
+
+######################################################
+#   Variables
+######################################################
+VERSION = 1
+FORMAT = '<BBiI'
+SIZE = struct.calcsize(FORMAT)
+HEADER = 0
+ANALOG = 1
+DIGITAL = 2
+SONAR = 3
+FRAME = 4
+SONAR_CHANNEL = 8
+
+
+class ReplayEnd(Exception):
+    '''
+    The replay ran out of recorded readings.
+    '''
+    pass
+
+
+def readTrace(data):
+    '''
+    Output: generator of (kind, channel, value, seconds) for every record in a log.
+    A record cut short at the end is ignored.
+
+    Records are written in time order, so a time smaller than the one before means
+    the 32-bit microsecond count wrapped.
+    '''
+    wraps = 0
+    last = 0
+    for offset in range(0, len(data) - SIZE + 1, SIZE):
+        kind, channel, value, micros = struct.unpack_from(FORMAT, data, offset)
+        if micros < last:
+            wraps += 1
+        last = micros
+        yield kind, channel, value, (wraps * 0x100000000 + micros) / 1000000
+
+
+######################################################
+#   Recording
+######################################################
+class TraceRecorder:
+    '''
+    Backend that records what passes through another backend.
+
+    backend = the backend to record (BoardBackend() on the robot)
+    stream = where the log goes (anything with write()), None to keep only the
+        newest records in the buffer
+    records (integer) = records gathered before they are written out
+    '''
+
+    def __init__(self, backend, stream=None, records=64):
+        self.backend = backend
+        self.stream = stream
+        self.monotonic = backend.monotonic
+        self.monotonic_ns = backend.monotonic_ns
+        self.sleep = backend.sleep
+        self._buffer = bytearray(records * SIZE)
+        self._view = memoryview(self._buffer)
+        self._length = 0
+        self._epoch = backend.monotonic()
+        self.recorded = 0
+        self.add(HEADER, 0, VERSION)
+
+    def add(self, kind, channel, value):
+        '''
+        Adds one record, stamped with the time now.
+        '''
+        if self._length == len(self._buffer):
+            self.flush()
+        micros = int((self.monotonic() - self._epoch) * 1000000) & 0xFFFFFFFF
+        struct.pack_into(FORMAT, self._buffer, self._length, kind, channel, value, micros)
+        self._length += SIZE
+        self.recorded += 1
+
+    def flush(self):
+        '''
+        Writes the gathered records to the stream.
+        '''
+        if self.stream is not None and self._length:
+            self.stream.write(self._view[0:self._length])
+            if hasattr(self.stream, 'flush'):
+                self.stream.flush()
+        self._length = 0
+
+    def i2c(self):
+        return _RecordedI2C(self.backend.i2c(), self)
+
+    def analogIn(self, pin):
+        return _RecordedInput(self.backend.analogIn(pin), self, ANALOG, int(pin[1:]))
+
+    def digitalIn(self, pin):
+        return _RecordedInput(self.backend.digitalIn(pin), self, DIGITAL, int(pin[1:]))
+
+    def rangeSensor(self, trigger, echo):
+        return _RecordedRangeSensor(self.backend.rangeSensor(trigger, echo), self)
+
+    def buzzer(self, pin):
+        return self.backend.buzzer(pin)
+
+    def pixels(self, pin, n):
+        return self.backend.pixels(pin, n)
+
+    def pulseIn(self, pin, maxlen):
+        return self.backend.pulseIn(pin, maxlen)
+
+
+class _RecordedI2C:
+
+    def __init__(self, bus, recorder):
+        self.bus = bus
+        self.recorder = recorder
+
+    def try_lock(self):
+        return self.bus.try_lock()
+
+    def unlock(self):
+        self.bus.unlock()
+
+    def writeto(self, address, buffer, *args, **kwargs):
+        self.bus.writeto(address, buffer, *args, **kwargs)
+        # Only frames that really went out are recorded
+        self.recorder.add(FRAME, buffer[0], (buffer[1] << 16) | (buffer[2] << 8) | buffer[3])
+
+    def __getattr__(self, name):
+        return getattr(self.bus, name)
+
+
+class _RecordedInput:
+
+    def __init__(self, sensor, recorder, kind, channel):
+        self.sensor = sensor
+        self.recorder = recorder
+        self.kind = kind
+        self.channel = channel
+
+    @property
+    def value(self):
+        value = self.sensor.value
+        self.recorder.add(self.kind, self.channel, int(value))
+        return value
+
+    def deinit(self):
+        self.sensor.deinit()
+
+
+class _RecordedRangeSensor:
+
+    def __init__(self, sensor, recorder):
+        self.sensor = sensor
+        self.recorder = recorder
+
+    @property
+    def distance(self):
+        try:
+            distance = self.sensor.distance
+        except RuntimeError:
+            self.recorder.add(SONAR, SONAR_CHANNEL, -1)
+            raise
+        self.recorder.add(SONAR, SONAR_CHANNEL, int(distance * 100 + 0.5))
+        return distance
+
+    def deinit(self):
+        self.sensor.deinit()
+
+
+######################################################
+#   Replay (on the computer)
+######################################################
+class ReplayBackend:
+    '''
+    Backend for Cutebot(backend=...) that plays back a TraceRecorder log.
+
+    data = the bytes of the log
+    follow = 'sequence' or 'time' (see Information above)
+    readTime (float) = seconds each reading takes in follow='time', so a loop that
+        never sleeps still moves through the recording
+
+    The frames sent during the replay are in commands, as (seconds, register, b1,
+    b2, b3). Buzzer and NeoPixels are accepted and ignored.
+    '''
+
+    def __init__(self, data, follow='sequence', readTime=0.0001):
+        if follow not in ('sequence', 'time'):
+            raise ValueError("follow must be 'sequence' or 'time'")
+        self.follow = follow
+        self.readTime = readTime
+        self.now = 0.0
+        self.readings = {}          # (kind, channel) -> list of (seconds, value)
+        self.recorded = []          # Recorded frames, like commands
+        self.commands = []
+        self.end = 0.0
+        self._cursor = {}
+        for kind, channel, value, seconds in readTrace(data):
+            if kind == HEADER:
+                if value != VERSION:
+                    raise ValueError("unknown trace version {}".format(value))
+            elif kind == FRAME:
+                self.recorded.append((seconds, channel, value >> 16, (value >> 8) & 0xFF,
+                                      value & 0xFF))
+            else:
+                self.readings.setdefault((kind, channel), []).append((seconds, value))
+            self.end = max(self.end, seconds)
+
+    def monotonic(self):
+        return self.now
+
+    def monotonic_ns(self):
+        return int(round(self.now * 1000000000))
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.follow == 'time' and self.now > self.end:
+            raise ReplayEnd("the recording ended at {:.3f} s".format(self.end))
+
+    def read(self, kind, channel):
+        '''
+        Output: the next (or current) recorded value of a sensor
+        '''
+        samples = self.readings.get((kind, channel))
+        if not samples:
+            raise ReplayEnd("nothing recorded for {} {}".format(kind, channel))
+        if self.follow == 'sequence':
+            i = self._cursor.get((kind, channel), 0)
+            if i >= len(samples):
+                raise ReplayEnd("the recording ended at {:.3f} s".format(self.end))
+            self._cursor[(kind, channel)] = i + 1
+            seconds, value = samples[i]
+            if seconds > self.now:
+                self.now = seconds          # Skip the wait
+            return value
+        self.now += self.readTime
+        if self.now > self.end:
+            raise ReplayEnd("the recording ended at {:.3f} s".format(self.end))
+        # The newest reading taken at or before now
+        low, high = 0, len(samples)
+        while low < high:
+            middle = (low + high) // 2
+            if samples[middle][0] <= self.now:
+                low = middle + 1
+            else:
+                high = middle
+        return samples[max(low - 1, 0)][1]
+
+    def compare(self):
+        '''
+        Output: None if the replay sent the same frames as the recording (times are
+        not compared), otherwise (index, recorded frame, replayed frame) of the
+        first difference. A missing frame is None.
+        '''
+        recorded = self.recorded
+        replayed = self.commands
+        for i in range(max(len(recorded), len(replayed))):
+            a = recorded[i][1:] if i < len(recorded) else None
+            b = replayed[i][1:] if i < len(replayed) else None
+            if a != b:
+                return (i, recorded[i] if a else None, replayed[i] if b else None)
+        return None
+
+    def i2c(self):
+        return _ReplayI2C(self)
+
+    def analogIn(self, pin):
+        return _ReplayInput(self, ANALOG, int(pin[1:]))
+
+    def digitalIn(self, pin):
+        return _ReplayInput(self, DIGITAL, int(pin[1:]))
+
+    def rangeSensor(self, trigger, echo):
+        return _ReplayRangeSensor(self)
+
+    def buzzer(self, pin):
+        return _Ignored()
+
+    def pixels(self, pin, n):
+        return _Ignored()
+
+    def pulseIn(self, pin, maxlen):
+        return _Ignored()
+
+
+class _ReplayI2C:
+
+    def __init__(self, replay):
+        self.replay = replay
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def writeto(self, address, buffer, *args, **kwargs):
+        self.replay.commands.append((self.replay.now, buffer[0], buffer[1], buffer[2],
+                                     buffer[3]))
+
+
+class _ReplayInput:
+
+    def __init__(self, replay, kind, channel):
+        self.replay = replay
+        self.kind = kind
+        self.channel = channel
+
+    @property
+    def value(self):
+        value = self.replay.read(self.kind, self.channel)
+        return bool(value) if self.kind == DIGITAL else value
+
+    def deinit(self):
+        pass
+
+
+class _ReplayRangeSensor:
+
+    def __init__(self, replay):
+        self.replay = replay
+
+    @property
+    def distance(self):
+        value = self.replay.read(SONAR, SONAR_CHANNEL)
+        if value < 0:
+            raise RuntimeError("Timed out")
+        return value / 100
+
+    def deinit(self):
+        pass
+
+
+class _Ignored:
+    # Buzzer, NeoPixels and IR receiver during a replay: takes anything, does nothing
+    duty_cycle = 0
+    frequency = 440
+
+    def __setitem__(self, index, value):
+        pass
+
+    def __len__(self):
+        return 0
+
+    def fill(self, color):
+        pass
+
+    def show(self):
+        pass
+
+    def clear(self):
+        pass
+
+    def deinit(self):
+        pass
@@ -0,0 +1,222 @@
+# CircuitPython Clue Cutebot - line tracking events
+# Author(s): James Tobin
+
+######################################################
+#   MIT License
+######################################################
+'''
+Copyright (c) 2020 James Tobin
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to the following
+conditions:
+The above copyright notice and this permission notice shall be included in all copies
+or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+######################################################
+#   Information
+######################################################
+'''
+Watches the two line tracking sensors and records every change as an event with a
+time.monotonic_ns() timestamp, so your code can react to the edge of the line as
+soon as it is seen instead of whenever the loop gets around to checking.
+
+With useKeypad=True the keypad module scans D13 and D14 in the background, so no
+change is missed even while your code is busy. Otherwise call poll() as often as
+you can (or run run() as an asyncio task).
+
+example:
+    from jisforjt_cutebot_clue import cutebot
+    from jisforjt_cutebot_tracking import TrackingMonitor
+
+    monitor = TrackingMonitor(cutebot, useKeypad=True)
+    while True:
+        monitor.poll()
+        event = monitor.get()
+        if event:
+            timestamp, left, right = event
+            print(left, right, monitor.onLineTime())
+'''
+
+######################################################
+#   Import
+######################################################
+from array import array
+
+
+class TrackingMonitor:
+
+    def __init__(self, bot, interval=0.001, size=32, useKeypad=False):
+        '''
+        bot = the Cutebot whose line sensors to watch
+        interval (float) = seconds between samples
+        size (integer) = how many events to keep before the oldest are dropped
+        useKeypad (boolean) = scan the sensors in the background with keypad (CircuitPython 7.1+)
+        '''
+        self.bot = bot
+        self._clock = bot._clock
+        self._clock_ns = bot._backend.monotonic_ns
+        self.interval = interval
+        self.dropped = 0                    # Events lost because nobody called get() in time
+        self._size = max(int(size), 1)
+        self._times = array('q', [0] * self._size)     # monotonic_ns of each event
+        self._states = bytearray(self._size)           # bit 1 = left sees black, bit 0 = right
+        self._head = 0                      # Oldest event
+        self._count = 0
+        self._due = 0.0
+        self._leftSince = 0                 # monotonic_ns when each side last found the line
+        self._rightSince = 0
+        self._keys = None
+        if useKeypad:
+            import board
+            import keypad
+            import supervisor
+            self._ticks_ms = supervisor.ticks_ms
+            # The Cutebot cannot read the pins while keypad owns them. Getting a pin
+            # makes it if it was not used yet; once deleted, the Cutebot makes it
+            # again the next time it reads it.
+            for name in ('_leftLineTracking', '_rightLineTracking'):
+                getattr(bot, name).deinit()
+                delattr(bot, name)
+            # Sensors pull low over black, which keypad reports as pressed
+            self._keys = keypad.Keys((board.D13, board.D14), value_when_pressed=False,
+                                     pull=False, interval=interval)
+            self._state = 0
+        else:
+            left, right = bot.tracking
+            self._state = (left << 1) | right
+        now = self._clock_ns()
+        if self._state & 2:
+            self._leftSince = now
+        if self._state & 1:
+            self._rightSince = now
+        bot._trackingMonitor = self
+
+
+    ######################################################
+    #   Sampling
+    ######################################################
+    def poll(self):
+        '''
+        Samples the sensors if a sample is due and records any change.
+
+        Output: the number of events waiting to be read
+        '''
+        if self._keys:
+            self._drainKeys()
+            return self._count
+        now = self._clock()
+        if now < self._due:
+            return self._count
+        self._due = now + self.interval
+        bot = self.bot
+        state = (not bot._leftLineTracking.value) << 1 | (not bot._rightLineTracking.value)
+        if state != self._state:
+            self._record(self._clock_ns(), state)
+        return self._count
+
+    async def run(self):
+        '''
+        asyncio task that polls at the configured interval.
+        '''
+        import asyncio
+        while True:
+            self.poll()
+            await asyncio.sleep(self.interval)
+
+    def deinit(self):
+        '''
+        Stops watching. The Cutebot reads its line sensors directly again.
+        '''
+        if self._keys:
+            self._keys.deinit()
+            self._keys = None
+        if self.bot._trackingMonitor is self:
+            self.bot._trackingMonitor = None
+
+    def _drainKeys(self):
+        events = self._keys.events
+        event = events.get()
+        while event:
+            # Convert the keypad's millisecond tick to monotonic_ns. ticks_ms wraps
+            # at 2**29, so the difference is taken modulo that (like ticks_diff)
+            age = (self._ticks_ms() - event.timestamp) & 0x1FFFFFFF
+            mask = 2 if event.key_number == 0 else 1
+            if event.pressed:
+                state = self._state | mask
+            else:
+                state = self._state & ~mask
+            self._record(self._clock_ns() - age * 1000000, state)
+            event = events.get()
+
+    def _record(self, timestamp, state):
+        changed = state ^ self._state
+        if changed & 2 and state & 2:
+            self._leftSince = timestamp
+        if changed & 1 and state & 1:
+            self._rightSince = timestamp
+        self._state = state
+        if self._count == self._size:
+            self._head = (self._head + 1) % self._size     # Drop the oldest event
+            self._count -= 1
+            self.dropped += 1
+        i = (self._head + self._count) % self._size
+        self._times[i] = timestamp
+        self._states[i] = state
+        self._count += 1
+
+
+    ######################################################
+    #   Events
+    ######################################################
+    @property
+    def events(self):
+        '''
+        Output: the number of events waiting to be read
+        '''
+        return self._count
+
+    def get(self):
+        '''
+        Output: the oldest event as (monotonic_ns timestamp, left, right), or None
+
+        left and right are True when that sensor sees black.
+        '''
+        if not self._count:
+            return None
+        i = self._head
+        self._head = (i + 1) % self._size
+        self._count -= 1
+        state = self._states[i]
+        return self._times[i], bool(state & 2), bool(state & 1)
+
+    def clear(self):
+        '''
+        Throws away every waiting event.
+        '''
+        self._count = 0
+
+    @property
+    def tracking(self):
+        '''
+        Output: left sensor, right sensor as of the latest sample (True = I see black)
+        '''
+        return bool(self._state & 2), bool(self._state & 1)
+
+    def onLineTime(self):
+        '''
+        Output: seconds the left and right sensors have been on the line (0 when off it)
+        '''
+        now = self._clock_ns()
+        left = (now - self._leftSince) / 1e9 if self._state & 2 else 0.0
+        right = (now - self._rightSince) / 1e9 if self._state & 1 else 0.0
+        return left, right
@@ -0,0 +1,6 @@
+# Tests run under CPython on the simulator (jisforjt_cutebot_sim), from the
+# repository folder: python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+from jisforjt_cutebot_asyncio import AsyncCutebot
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_sim import RealTimeClock, Robot, SimBackend, World
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                                'benchmarks'))
+import async_avoidance
+
+
+def test_async_avoidance_is_at_least_3x_faster():
+    # Real time, so the sonar's echo and settle delays really wait, as on the robot
+    size = 100                                  # A walled room, so every ping echoes
+    walls = [(-size, -size, size, -size), (size, -size, size, size),
+             (size, size, -size, size), (-size, size, -size, -size)]
+    world = World(walls=walls, robot=Robot())
+    cutebot = Cutebot(backend=SimBackend(world, clock=RealTimeClock()))
+    sync_rate, async_rate = async_avoidance.measure(cutebot, 0.5)
+    assert async_rate >= 3 * sync_rate
+
+
+def test_no_shared_cutebot_off_the_clue():
+    with pytest.raises(RuntimeError, match='Cutebot\\(backend=...\\)'):
+        AsyncCutebot()
@@ -0,0 +1,34 @@
+import asyncio
+
+from jisforjt_cutebot_asyncio import AsyncCutebot
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_filters import RangeClamp
+from jisforjt_cutebot_sim import SimBackend, World, Robot
+
+
+def makeCutebot(obstacles=()):
+    world = World(obstacles=obstacles, robot=Robot())
+    return Cutebot(backend=SimBackend(world))
+
+
+def test_async_sonar_matches_sync_sonar():
+    cutebot = makeCutebot(obstacles=[(50, 0, 5)])
+    expected = cutebot.sonar
+    assert 35 < expected < 45
+    distance = asyncio.run(AsyncCutebot(cutebot).sonar())
+    assert abs(distance - expected) < 0.5
+
+
+def test_async_sonar_uses_filter_and_counts_timeouts():
+    cutebot = makeCutebot()                     # Nothing in range: every ping times out
+    cutebot.attachFilter('sonar', RangeClamp(2, 400))
+    assert cutebot.sonar == 400
+    assert cutebot.sonarTimeouts == 1
+    assert asyncio.run(AsyncCutebot(cutebot).sonar()) == 400
+    assert cutebot.sonarTimeouts == 2
+
+
+def test_async_sonar_gives_up_like_sync_sonar():
+    cutebot = makeCutebot()
+    assert asyncio.run(AsyncCutebot(cutebot).sonar()) == 0.00
+    assert cutebot.sonarTimeouts == 9
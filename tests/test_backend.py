@@ -0,0 +1,24 @@
+import sys
+import types
+
+from jisforjt_cutebot_clue import BoardBackend
+
+
+def test_clock_counts_ticks_ms_across_the_wrap(monkeypatch):
+    ticks = [(1 << 29) - 5]                     # Just before ticks_ms wraps
+    supervisor = types.ModuleType('supervisor')
+    supervisor.ticks_ms = lambda: ticks[0]
+    monkeypatch.setitem(sys.modules, 'supervisor', supervisor)
+    backend = BoardBackend()
+    assert backend.monotonic() == 0.0
+    ticks[0] = 5
+    assert backend.monotonic() == 0.010
+    ticks[0] = 15
+    assert backend.monotonic() == 0.020         # Whole milliseconds, not float steps
+
+
+def test_clock_without_supervisor_starts_at_zero():
+    backend = BoardBackend()
+    first = backend.monotonic()
+    assert 0 <= first < 0.1
+    assert backend.monotonic() >= first
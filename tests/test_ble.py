@@ -0,0 +1,97 @@
+from jisforjt_cutebot_ble import BLEDrive, buttonPacket
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_sim import SimBackend
+
+
+class FakeUART:
+    # The part of adafruit_ble's UARTService that BLEDrive uses
+    def __init__(self):
+        self.data = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def readinto(self, buffer):
+        count = min(len(buffer), len(self.data))
+        buffer[:count] = self.data[:count]
+        del self.data[:count]
+        return count
+
+
+def makeDrive(**kwargs):
+    backend = SimBackend()
+    backend.bus.record = True
+    cutebot = Cutebot(backend=backend)
+    uart = FakeUART()
+    return BLEDrive(cutebot, uart, **kwargs), cutebot, uart, backend.bus
+
+
+def drive(cutebot, ble, seconds):
+    end = cutebot._clock() + seconds
+    while cutebot._clock() < end:
+        ble.update()
+        cutebot._sleep(0.005)
+
+
+def motorFrames(bus, start):
+    return [data for time, data in bus.frames if time >= start and data[0] in (1, 2)]
+
+
+def test_long_hold_keeps_driving():
+    ble, cutebot, uart, bus = makeDrive(maxSpeed=35, deadline=1.0)
+    uart.data += buttonPacket('5')
+    start = cutebot._clock()
+    drive(cutebot, ble, 5.0)
+    frames = motorFrames(bus, start)
+    assert frames
+    assert all(data[2] == 35 for data in frames)
+    assert ble.deadlineStops == 0
+    assert ble.button == '5'
+
+    uart.data += buttonPacket('5', pressed=False)
+    drive(cutebot, ble, 0.1)
+    assert bus.register(1)[2] == 0 and bus.register(2)[2] == 0
+    assert ble.stopped
+
+
+def test_disconnect_stops_held_button():
+    link = [True]
+    ble, cutebot, uart, bus = makeDrive(connected=lambda: link[0])
+    uart.data += buttonPacket('5')
+    drive(cutebot, ble, 1.0)
+    assert bus.register(1)[2] == 35
+    link[0] = False
+    drive(cutebot, ble, 0.1)
+    assert bus.register(1)[2] == 0 and bus.register(2)[2] == 0
+    assert ble.disconnectStops == 1
+    assert ble.button is None
+
+
+def test_deadline_stops_latched_drive():
+    ble, cutebot, uart, bus = makeDrive(deadline=1.0, holdToDrive=False)
+    uart.data += buttonPacket('5') + buttonPacket('5', pressed=False)
+    drive(cutebot, ble, 0.5)
+    assert bus.register(1)[2] == 35
+    drive(cutebot, ble, 1.0)
+    assert bus.register(1)[2] == 0
+    assert ble.deadlineStops == 1
+
+
+def test_lost_release_stops_after_hold_deadline():
+    ble, cutebot, uart, bus = makeDrive()          # Default arguments
+    uart.data += buttonPacket('5')                  # The release never arrives
+    drive(cutebot, ble, 7.5)
+    assert bus.register(1)[2] == 35
+    drive(cutebot, ble, 2.5)
+    assert bus.register(1)[2] == 0 and bus.register(2)[2] == 0
+    assert ble.deadlineStops == 1
+    assert ble.button is None
+
+
+def test_hold_without_backstop_needs_connected():
+    ble, cutebot, uart, bus = makeDrive(holdDeadline=None, connected=lambda: True)
+    uart.data += buttonPacket('5')
+    drive(cutebot, ble, 20.0)
+    assert bus.register(1)[2] == 35
+    assert ble.deadlineStops == 0
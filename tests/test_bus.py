@@ -0,0 +1,40 @@
+from jisforjt_cutebot_bus import BusArbiter
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_sim import SimBackend
+
+
+def makeArbiter(failRate=0.0):
+    cutebot = Cutebot(backend=SimBackend(failRate=failRate), reset=False)
+    arbiter = BusArbiter(cutebot)
+
+    def read():
+        cutebot._sleep(0.002)           # A CLUE sensor read takes bus time too
+        return 1
+
+    arbiter.addSensor('proximity', interval=0.0, read=read)
+    return arbiter, cutebot
+
+
+def test_failing_bus_does_not_starve_sensors():
+    arbiter, cutebot = makeArbiter(failRate=1.0)
+    cutebot.motors(30, 30)
+    for i in range(300):
+        arbiter.update()
+        cutebot._sleep(0.001)
+    assert cutebot.pending
+    assert cutebot.lastError is not None
+    reads = arbiter.usage()['proximity'][0]
+    assert reads >= 290
+    assert arbiter.deferred <= 3 * reads
+
+
+def test_read_is_deferred_for_a_frame_about_to_go():
+    arbiter, cutebot = makeArbiter()
+    arbiter.update()                    # Learn how long a read takes (2 ms)
+    cutebot.motors(30, 30)              # Sent now
+    cutebot._sleep(0.009)
+    cutebot.motors(40, 40)              # Due 1 ms from now: the read waits for it
+    reads = arbiter.usage()['proximity'][0]
+    arbiter.update()
+    assert arbiter.deferred == 1
+    assert arbiter.usage()['proximity'][0] == reads
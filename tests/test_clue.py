@@ -0,0 +1,27 @@
+import pytest
+
+import jisforjt_cutebot_clue
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_sim import SimBackend
+
+
+def test_getCutebot_without_board_raises(monkeypatch):
+    # On a computer there is no board module: the real error, not a None cutebot
+    monkeypatch.setattr(jisforjt_cutebot_clue, '_shared', None)
+    with pytest.raises(ImportError):
+        jisforjt_cutebot_clue.getCutebot()
+
+
+def test_cutebot_alias_is_made_once_on_first_use(monkeypatch):
+    made = []
+
+    def makeCutebot():
+        made.append(Cutebot(backend=SimBackend()))
+        return made[-1]
+
+    monkeypatch.setattr(jisforjt_cutebot_clue, '_shared', None)
+    monkeypatch.setattr(jisforjt_cutebot_clue, 'Cutebot', makeCutebot)
+    assert not made                             # Importing made nothing
+    from jisforjt_cutebot_clue import cutebot
+    assert cutebot is jisforjt_cutebot_clue.getCutebot()
+    assert made == [cutebot]
@@ -0,0 +1,38 @@
+import random
+
+from jisforjt_cutebot_filters import HampelFilter, MedianFilter
+
+
+def test_median_filter_sorted_readings():
+    median = MedianFilter(5)
+    for reading in (7, 3, 9, 1, 5, 8):
+        median.update(reading)
+    assert median.count == 5
+    assert list(median.sortedReadings()[:median.count]) == [1, 3, 5, 8, 9]
+    assert median.value == 5
+
+
+def test_hampel_deviation_matches_sorting():
+    pick = random.Random(1)
+    hampel = HampelFilter(size=9)
+    for trial in range(500):
+        count = pick.randint(3, 9)
+        ordered = sorted(float(pick.randint(0, 50)) for i in range(count))
+        if count & 1:
+            center = ordered[count // 2]
+        else:
+            center = (ordered[count // 2 - 1] + ordered[count // 2]) / 2
+        deviations = sorted(abs(value - center) for value in ordered)
+        if count & 1:
+            mad = deviations[count // 2]
+        else:
+            mad = (deviations[count // 2 - 1] + deviations[count // 2]) / 2
+        assert hampel._medianDeviation(ordered, count, center) == mad
+
+
+def test_hampel_replaces_spikes():
+    hampel = HampelFilter(size=5, threshold=3.0)
+    readings = [50, 51, 49, 50, 52, 300, 51, 50, 0, 49]
+    values = [hampel.update(reading) for reading in readings]
+    assert hampel.outliers == 2
+    assert max(values) < 60 and min(values) > 40
@@ -0,0 +1,37 @@
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_motion import ServoMotion
+from jisforjt_cutebot_sim import SimBackend
+
+
+def makeArm():
+    backend = SimBackend()
+    cutebot = Cutebot(backend=backend)
+    backend.bus.record = True
+    return ServoMotion(cutebot), cutebot, backend.bus
+
+
+def finish(arm, cutebot):
+    while arm.update():
+        cutebot._sleep(arm.nextDue())
+    cutebot.flush()
+
+
+def test_moving_one_servo_leaves_the_other_alone():
+    arm, cutebot, bus = makeArm()
+    arm.moveTo(1, 90, duration=0.5)
+    finish(arm, cutebot)
+    registers = set(data[0] for time, data in bus.frames)
+    assert registers == {5}
+    assert bus.register(5) == bytes([5, 90, 0, 0])
+    assert arm.angles == (90, -1)
+
+
+def test_held_servo_is_not_resent():
+    arm, cutebot, bus = makeArm()
+    arm.move(30, 60, duration=0.2)
+    finish(arm, cutebot)
+    del bus.frames[:]
+    arm.moveTo(2, 120, duration=0.2)
+    finish(arm, cutebot)
+    assert set(data[0] for time, data in bus.frames) == {6}
+    assert arm.angles == (30, 120)
@@ -0,0 +1,35 @@
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_sim import Robot, SimBackend, World
+
+
+def run(cutebot, seconds):
+    end = cutebot._clock() + seconds
+    while cutebot._clock() < end:
+        cutebot.update()
+        cutebot._sleep(0.005)
+
+
+def test_background_sonar_drops_an_object_that_is_gone():
+    world = World(obstacles=[(25, 0, 5)], robot=Robot())
+    cutebot = Cutebot(backend=SimBackend(world))
+    cutebot.startSonar()
+    run(cutebot, 1.0)
+    assert 13 < cutebot.sonar < 17            # 5 cm past the sonar, 5 cm radius
+
+    del world.obstacles[:]
+    run(cutebot, 1.0)
+    assert cutebot.sonar == 0.00                # Like the sync read giving up
+    assert cutebot.sonarHistory() == []
+
+    world.obstacles.append((40, 0, 5))
+    run(cutebot, 0.5)
+    assert 28 < cutebot.sonar < 32
+
+
+def test_background_ping_timeout_is_short():
+    cutebot = Cutebot(backend=SimBackend(World(robot=Robot())))
+    cutebot.startSonar()
+    start = cutebot._clock()
+    cutebot.update()                            # Nothing in range: the ping times out
+    assert cutebot._clock() - start <= 0.031
+    assert cutebot.sonar == 0.00
@@ -0,0 +1,26 @@
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_sim import SimBackend
+from jisforjt_cutebot_stats import CutebotStats
+
+
+def test_timed_methods_take_keyword_arguments():
+    backend = SimBackend()
+    backend.bus.record = True
+    cutebot = Cutebot(backend=backend)
+    stats = CutebotStats(cutebot)
+    cutebot.motors(leftSpeed=30, rightSpeed=-30)
+    cutebot.playTone(440, duration=0.1)
+    assert backend.bus.register(1) == bytearray([1, 2, 30, 0])
+    assert backend.bus.register(2) == bytearray([2, 1, 30, 0])
+    assert stats.histogram('motors')[0] == 1
+    assert stats.histogram('playTone')[0] == 1
+    assert stats.histogram('playTone')[1] >= 0.1
+
+
+def test_detach_puts_the_methods_back():
+    cutebot = Cutebot(backend=SimBackend())
+    stats = CutebotStats(cutebot)
+    stats.detach()
+    cutebot.motors(leftSpeed=30, rightSpeed=30)
+    assert stats.histogram('motors')[0] == 0
+    assert 'motors' not in cutebot.__dict__
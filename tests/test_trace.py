@@ -0,0 +1,18 @@
+import io
+
+from jisforjt_cutebot_sim import SimBackend, VirtualClock
+from jisforjt_cutebot_trace import ANALOG, HEADER, TraceRecorder, readTrace
+
+
+def test_times_after_the_32_bit_microsecond_wrap():
+    backend = SimBackend(clock=VirtualClock(step=60))    # Nothing moves, big steps are fine
+    stream = io.BytesIO()
+    recorder = TraceRecorder(backend, stream)
+    for minute in range(0, 200, 20):            # Past 71.6 minutes, twice
+        recorder.add(ANALOG, 1, minute)
+        backend.sleep(20 * 60)
+    recorder.flush()
+    records = list(readTrace(stream.getvalue()))
+    assert records[0][0] == HEADER
+    for kind, channel, value, seconds in records[1:]:
+        assert abs(seconds - value * 60) < 0.001
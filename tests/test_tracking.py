@@ -0,0 +1,60 @@
+import sys
+import types
+
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_sim import SimBackend
+from jisforjt_cutebot_tracking import TrackingMonitor
+
+
+class FakeEvents:
+    def __init__(self):
+        self.queue = []
+
+    def get(self):
+        return self.queue.pop(0) if self.queue else None
+
+
+class FakeKeys:
+    def __init__(self, pins, value_when_pressed, pull, interval):
+        self.events = FakeEvents()
+
+    def deinit(self):
+        pass
+
+
+def useFakeKeypad(monkeypatch, ticks):
+    # The CircuitPython modules the keypad path imports
+    board = types.ModuleType('board')
+    board.D13 = 'D13'
+    board.D14 = 'D14'
+    keypad = types.ModuleType('keypad')
+    keypad.Keys = FakeKeys
+    supervisor = types.ModuleType('supervisor')
+    supervisor.ticks_ms = lambda: ticks[0]
+    for module in (board, keypad, supervisor):
+        monkeypatch.setitem(sys.modules, module.__name__, module)
+
+
+def test_keypad_event_time_across_ticks_wrap(monkeypatch):
+    ticks = [5]                                 # Just after ticks_ms wrapped at 2**29
+    useFakeKeypad(monkeypatch, ticks)
+    cutebot = Cutebot(backend=SimBackend())
+    monitor = TrackingMonitor(cutebot, useKeypad=True)
+    event = types.SimpleNamespace(key_number=0, pressed=True,
+                                  timestamp=(1 << 29) - 5)
+    monitor._keys.events.queue.append(event)
+    now = cutebot._backend.monotonic_ns()
+    monitor.poll()
+    timestamp, left, right = monitor.get()
+    assert left and not right
+    assert now - timestamp == 10 * 1000000      # 10 ms ago, not 2**29 ms in the future
+
+
+def test_keypad_releases_and_restores_line_pins(monkeypatch):
+    useFakeKeypad(monkeypatch, [0])
+    cutebot = Cutebot(backend=SimBackend())
+    monitor = TrackingMonitor(cutebot, useKeypad=True)
+    assert '_leftLineTracking' not in cutebot.__dict__
+    assert '_rightLineTracking' not in cutebot.__dict__
+    monitor.deinit()
+    assert cutebot.tracking == (False, False)
@@ -0,0 +1,53 @@
+import pytest
+
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_sim import SimBackend
+
+
+def makeCutebot(blocking=True):
+    backend = SimBackend()
+    backend.bus.record = True
+    return Cutebot(blocking=blocking, backend=backend), backend
+
+
+def test_transaction_sends_everything_together():
+    cutebot, backend = makeCutebot()
+    with cutebot.transaction():
+        cutebot.motors(50, 50)
+        cutebot.headlights(3, [255, 255, 255])
+    assert backend.bus.register(1) == bytearray([1, 2, 50, 0])
+    assert backend.bus.register(8) == bytearray([8, 255, 255, 255])
+
+
+def test_aborted_transaction_sends_nothing():
+    cutebot, backend = makeCutebot()
+    cutebot.pixels(3, [0, 0, 255])
+    writes = backend.bus.writes
+    with pytest.raises(ValueError):
+        with cutebot.transaction():
+            cutebot.motors(50, 50)
+            cutebot.pixels(1, [255, 0, 0])
+            raise ValueError("abort")
+    assert cutebot.pending == 0
+    assert backend.bus.writes == writes
+    assert backend.pixelStrip[0] == (0, 0, 255)
+
+    # The next unrelated call sends only itself
+    cutebot.headlights(3, [10, 10, 10])
+    assert backend.bus.register(1) == bytearray([1, 2, 0, 0])
+    assert [frame[0] for time, frame in backend.bus.frames[-2:]] == [8, 4]
+
+
+def test_aborted_transaction_keeps_frames_queued_before_it():
+    cutebot, backend = makeCutebot(blocking=False)
+    cutebot.servos(1, 45)
+    queued = cutebot.pending
+    with pytest.raises(RuntimeError):
+        with cutebot.transaction():
+            cutebot.servos(1, 90)
+            cutebot.motors(20, 20)
+            raise RuntimeError("abort")
+    assert cutebot.pending == queued
+    cutebot.flush()
+    assert backend.bus.register(5) == bytearray([5, 45, 0, 0])
+    assert backend.bus.register(1) == bytearray([1, 2, 0, 0])
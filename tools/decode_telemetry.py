@@ -0,0 +1,125 @@
+# decode_telemetry.py
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE
+######################################################
+'''
+Turns the binary frames sent by jisforjt_cutebot_telemetry into a CSV file or a
+NumPy array, on the computer (CPython), from the repository folder:
+
+    python tools/decode_telemetry.py capture.bin [-o telemetry.csv]
+    python tools/decode_telemetry.py capture.bin -o telemetry.npy
+    python tools/decode_telemetry.py --port /dev/ttyACM1 --seconds 30 -o run.csv
+
+capture.bin is everything received from the stream, saved as it came (for
+example with `cat /dev/ttyACM1 > capture.bin`). Console text and damaged frames
+in between are skipped. --port reads a serial port directly and needs pyserial;
+.npy output needs NumPy. Without -o the CSV goes to the screen.
+
+In Python:
+    from decode_telemetry import toArray
+    data = toArray(open('capture.bin', 'rb').read())
+    print(data['loopMax'].max())
+
+Times are in seconds, sonar in centimeters (NaN when not sampled).
+'''
+
+######################################################
+#   Import
+######################################################
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from jisforjt_cutebot_telemetry import FIELDS, NO_SONAR, frames
+
+
+######################################################
+#   Decoding
+######################################################
+def rows(data):
+    '''
+    Output: generator of one list per frame, in FIELDS order, in seconds and
+    centimeters
+    '''
+    for values in frames(data):
+        row = list(values)
+        row[3] /= 1000                                      # time
+        row[6] = float('nan') if row[6] == NO_SONAR else row[6] / 10
+        row[10] /= 1000000                                  # loopMean
+        row[11] /= 1000000                                  # loopMax
+        yield row
+
+
+def toArray(data):
+    '''
+    Output: NumPy structured array with one record per frame, named by FIELDS
+    '''
+    import numpy
+    types = {'version': 'u1', 'tracking': 'u1', 'sequence': 'u2', 'time': 'f8',
+             'left': 'i1', 'right': 'i1', 'sonar': 'f4', 'p1': 'u2', 'p2': 'u2',
+             'loops': 'u2', 'loopMean': 'f4', 'loopMax': 'f4'}
+    dtype = numpy.dtype([(name, types[name]) for name in FIELDS])
+    return numpy.array([tuple(row) for row in rows(data)], dtype=dtype)
+
+
+def writeCSV(data, file):
+    writer = csv.writer(file)
+    writer.writerow(FIELDS)
+    count = 0
+    for row in rows(data):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def readPort(port, seconds, baudrate=115200):
+    import serial
+    data = bytearray()
+    end = time.monotonic() + seconds
+    with serial.Serial(port, baudrate, timeout=0.1) as stream:
+        while time.monotonic() < end:
+            data.extend(stream.read(4096))
+    return bytes(data)
+
+
+######################################################
+#   Main Code
+######################################################
+def main(args):
+    parser = argparse.ArgumentParser(description="Decode Cutebot telemetry frames")
+    parser.add_argument('capture', nargs='?', help="file of received bytes")
+    parser.add_argument('-o', '--output', help=".csv or .npy file (default: CSV to the screen)")
+    parser.add_argument('--port', help="serial port to read instead of a file")
+    parser.add_argument('--seconds', type=float, default=10.0, help="how long to read --port")
+    options = parser.parse_args(args)
+    if options.port:
+        data = readPort(options.port, options.seconds)
+    elif options.capture:
+        with open(options.capture, 'rb') as file:
+            data = file.read()
+    else:
+        parser.error("give a capture file or --port")
+    if options.output and options.output.endswith('.npy'):
+        try:
+            import numpy
+        except ImportError:
+            raise SystemExit(".npy output needs NumPy (pip install numpy)")
+        array = toArray(data)
+        numpy.save(options.output, array)
+        count = len(array)
+    elif options.output:
+        with open(options.output, 'w', newline='') as file:
+            count = writeCSV(data, file)
+    else:
+        count = writeCSV(data, sys.stdout)
+    print("{} frames".format(count), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
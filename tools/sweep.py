@@ -0,0 +1,282 @@
+# sweep.py
+# Author(s): James Tobin
+
+######################################################
+#   HOW TO USE
+######################################################
+'''
+Tries many settings of a control loop on the simulator (jisforjt_cutebot_sim) and
+reports how well each one did, so tuning does not take a run on the floor per
+setting. Time is simulated, so sleeps cost nothing and a minute of driving takes
+well under a second; the runs are spread over every processor core. Runs under
+CPython, from the repository folder:
+
+    python tools/sweep.py linefollower --grid speed=20:60:10 kp=10,20,40
+    python tools/sweep.py avoidance --random 2000 maxSpeed=30:80 near=10:30 far=40:80
+    python tools/sweep.py bangbang --grid maxSpeed=20:60:5 --seconds 120 -o laps.csv
+
+Controllers (and the settings they take, with their defaults):
+    linefollower    LineFollower on an oval track: speed=20, kp=20, kd=0.5,
+                    lostGain=2, rate=100
+    bangbang        the loop from cutebot_line_following__better__.py: maxSpeed=40,
+                    loopTime=0.001 (the loop's own time, printing etc.)
+    avoidance       the loop from cutebot_simple_avoidance.py in a walled room with
+                    obstacles: maxSpeed=50, near=20, far=50, alphaScale=200
+
+Settings:
+    --grid name=a,b,c       every combination of the listed values
+           name=low:high:step
+    --random N name=low:high    N settings picked at random (whole numbers if low
+                                and high are)
+    --seeds N               run every setting on N worlds (sonar noise, obstacles)
+    --seconds S             simulated seconds per run (default 60)
+    --workers N             processes (default: one per core)
+    --step S                simulated physics step (default 0.001; 0.002 is ~2x faster)
+    --sort name             metric to rank by, --sort=-name for largest first
+                            (default: meanLap, or collisions for avoidance)
+    --top N                 rows to print (default 10)
+    -o file.csv             write every run to a CSV file
+    --help                  list the options
+
+The control loops and worlds are in jisforjt_cutebot_scenarios, shared with
+benchmarks/line_follow_laps.py.
+
+Metrics: laps, bestLap and meanLap (seconds, line followers), lineLosses (times
+both sensors lost the line), collisions, distance (cm driven) and wall (real
+seconds the run took).
+'''
+
+######################################################
+#   Import
+######################################################
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from jisforjt_cutebot_clue import Cutebot
+from jisforjt_cutebot_scenarios import lineFollower, bangBang, avoidance, lineWorld, room
+from jisforjt_cutebot_sim import SimBackend, VirtualClock
+
+
+######################################################
+#   Controllers
+######################################################
+# Control loop, world and default sort metric. The loops and worlds are in
+# jisforjt_cutebot_scenarios, shared with the benchmarks.
+CONTROLLERS = {
+    'linefollower': (lineFollower, lineWorld, 'meanLap'),
+    'bangbang': (bangBang, lineWorld, 'meanLap'),
+    'avoidance': (avoidance, room, 'collisions'),
+}
+
+
+######################################################
+#   Running
+######################################################
+def runOne(job):
+    '''
+    Output: dictionary of the settings, seed and metrics of one simulated run
+    '''
+    name, settings, seed, seconds, step = job
+    control, makeWorld, _ = CONTROLLERS[name]
+    world = makeWorld(seed)
+    backend = SimBackend(world, clock=VirtualClock(step), seed=seed)
+    cutebot = Cutebot(backend=backend)
+    start = time.perf_counter()
+    result = dict(settings)
+    result['seed'] = seed
+    try:
+        lineLosses = control(cutebot, seconds, **settings)
+        error = ''
+    except Exception as e:                  # A bad setting should not stop the sweep
+        lineLosses = None
+        error = repr(e)
+    laps = world.laps
+    result.update({
+        'laps': len(laps),
+        'bestLap': min(laps) if laps else math.nan,
+        'meanLap': sum(laps) / len(laps) if laps else math.nan,
+        'lineLosses': lineLosses,
+        'collisions': world.collisions,
+        'distance': world.robot.distance,
+        'wall': time.perf_counter() - start,
+        'error': error,
+    })
+    return result
+
+
+def sweep(name, settings, seeds=1, seconds=60, workers=None, step=0.001):
+    '''
+    Runs every setting (a list of dictionaries) on seeds worlds.
+
+    Output: list of result dictionaries (see runOne), in no particular order
+    '''
+    jobs = [(name, s, seed, seconds, step) for s in settings for seed in range(seeds)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [runOne(job) for job in jobs]
+    chunk = max(1, len(jobs) // (workers * 8))
+    with multiprocessing.Pool(workers) as pool:
+        return list(pool.imap_unordered(runOne, jobs, chunk))
+
+
+######################################################
+#   Settings
+######################################################
+def number(text):
+    value = float(text)
+    return int(value) if value.is_integer() and '.' not in text else value
+
+
+def gridValues(spec):
+    # 'a,b,c' or 'low:high:step' (high included)
+    if ':' in spec:
+        low, high, step = (number(part) for part in spec.split(':'))
+        values = []
+        value = low
+        while value <= high + step * 1e-9:
+            values.append(value)
+            value = value + step
+        return values
+    return [number(part) for part in spec.split(',')]
+
+
+def grid(specs):
+    '''
+    specs = list of 'name=values' strings
+
+    Output: list of settings dictionaries, every combination
+    '''
+    names = []
+    choices = []
+    for spec in specs:
+        name, values = spec.split('=', 1)
+        names.append(name)
+        choices.append(gridValues(values))
+    return [dict(zip(names, values)) for values in itertools.product(*choices)]
+
+
+def randomSettings(count, specs, seed=0):
+    '''
+    Output: list of count settings dictionaries picked uniformly from 'name=low:high'
+    '''
+    pick = random.Random(seed)
+    ranges = []
+    for spec in specs:
+        name, values = spec.split('=', 1)
+        low, high = (number(part) for part in values.split(':')[:2])
+        ranges.append((name, low, high))
+    settings = []
+    for i in range(count):
+        setting = {}
+        for name, low, high in ranges:
+            if isinstance(low, int) and isinstance(high, int):
+                setting[name] = pick.randint(low, high)
+            else:
+                setting[name] = pick.uniform(low, high)
+        settings.append(setting)
+    return settings
+
+
+######################################################
+#   Main Code
+######################################################
+def report(results, sortBy, top):
+    descending = sortBy.startswith('-')
+    key = sortBy.lstrip('-')
+
+    def rank(result):
+        value = result.get(key)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return math.inf             # Runs without the metric go last
+        return -value if descending else value
+
+    ranked = sorted(results, key=rank)
+    metrics = ('laps', 'bestLap', 'meanLap', 'lineLosses', 'collisions', 'distance')
+    names = [name for name in ranked[0] if name not in metrics + ('wall', 'error')]
+    print('  '.join('%10s' % name for name in names + list(metrics)))
+    for result in ranked[:top]:
+        cells = []
+        for name in names + list(metrics):
+            value = result[name]
+            cells.append('%10.2f' % value if isinstance(value, float) else '%10s' % value)
+        print('  '.join(cells))
+    errors = [result for result in results if result['error']]
+    if errors:
+        print('%d run(s) failed, first: %s' % (len(errors), errors[0]['error']))
+
+
+def setting(text):
+    # A 'name=values' argument
+    if '=' not in text or text.startswith('='):
+        raise argparse.ArgumentTypeError("settings look like name=values, not " + text)
+    return text
+
+
+def parseArgs(args):
+    parser = argparse.ArgumentParser(
+        description="Tries many settings of a control loop on the simulator.",
+        epilog="The controllers and their settings are listed at the top of this file.")
+    parser.add_argument('controller', choices=list(CONTROLLERS))
+    parser.add_argument('settings', nargs='*', type=setting, metavar='name=values',
+                        help="a,b,c or low:high:step with --grid, low:high with --random")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--grid', action='store_true',
+                      help="every combination of the listed values (the default)")
+    mode.add_argument('--random', type=int, metavar='N',
+                      help="N settings picked at random from each low:high range")
+    parser.add_argument('--seeds', type=int, default=1, metavar='N',
+                        help="run every setting on N worlds (default 1)")
+    parser.add_argument('--seconds', type=float, default=60.0, metavar='S',
+                        help="simulated seconds per run (default 60)")
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help="processes (default: one per core)")
+    parser.add_argument('--step', type=float, default=0.001, metavar='S',
+                        help="simulated physics step (default 0.001)")
+    parser.add_argument('--sort', metavar='name',
+                        help="metric to rank by, --sort=-name for largest first")
+    parser.add_argument('--top', type=int, default=10, metavar='N',
+                        help="rows to print (default 10)")
+    parser.add_argument('-o', '--output', metavar='file.csv',
+                        help="write every run to a CSV file")
+    # Settings may come before or after the options
+    return parser.parse_intermixed_args(args)
+
+
+def main(args):
+    options = parseArgs(args)
+    name = options.controller
+    sortBy = options.sort or CONTROLLERS[name][2]
+    seeds = options.seeds
+    seconds = options.seconds
+    workers = options.workers
+    if options.random is not None:
+        settings = randomSettings(options.random, options.settings)
+    else:
+        settings = grid(options.settings)
+    runs = len(settings) * seeds
+    print('%s: %d setting(s) x %d seed(s), %g simulated seconds each, %d worker(s)'
+          % (name, len(settings), seeds, seconds, workers or os.cpu_count() or 1))
+    start = time.perf_counter()
+    results = sweep(name, settings, seeds, seconds, workers, options.step)
+    elapsed = time.perf_counter() - start
+    print('%d runs in %.1f s (%.1f runs/s, %.0fx real time)\n'
+          % (runs, elapsed, runs / elapsed, runs * seconds / elapsed))
+    report(results, sortBy, options.top)
+    if options.output:
+        with open(options.output, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))